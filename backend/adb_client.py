@@ -0,0 +1,268 @@
+"""Direct connection to the adb server for the phone routes.
+
+Running `adb devices` or `adb shell ...` starts a new adb client process
+every time, and that process then talks to the adb server on
+localhost:5037. This module talks to the server itself, using its small
+text protocol:
+
+    request:  4 hex digits of length + service name ("host:devices")
+    reply:    "OKAY", or "FAIL" + 4 hex digits of length + message
+
+Device state comes from one long-lived `host:track-devices` connection. The
+server pushes a new device list whenever a phone connects, disconnects or
+changes state, so a status check is a dictionary lookup. Shell commands use
+`host:transport:<serial>` and then `shell:<command>` on a local socket. No
+process is spawned for either.
+"""
+import socket
+import subprocess
+import threading
+import time
+
+import config
+
+# Appended to every shell command so the exit status comes back with the output
+EXIT_MARKER = '__adb_exit='
+
+
+class AdbError(RuntimeError):
+    """Raised when the adb server refuses a request or can't be reached"""
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise AdbError("adb server closed the connection")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _read_block(sock):
+    length = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, length).decode('utf-8', errors='replace')
+
+
+def _send_request(sock, service):
+    payload = service.encode('utf-8')
+    sock.sendall(b'%04x' % len(payload) + payload)
+    status = _recv_exact(sock, 4)
+    if status == b'OKAY':
+        return
+    if status == b'FAIL':
+        raise AdbError(_read_block(sock))
+    raise AdbError(f"Unexpected adb server reply {status!r}")
+
+
+def parse_device_list(text):
+    """{serial: state} from the "serial<TAB>state" lines adb sends"""
+    devices = {}
+    for line in text.splitlines():
+        parts = line.split('\t')
+        if len(parts) >= 2 and parts[0]:
+            devices[parts[0]] = parts[1].strip()
+    return devices
+
+
+class AdbServer:
+    """Client for one adb server (one TCP connection per request, like the adb CLI)"""
+
+    def __init__(self, host='127.0.0.1', port=5037, timeout=5.0):
+        self.host = host
+        self.port = int(port)
+        self.timeout = float(timeout)
+
+    def open(self, service, serial=None, timeout=None):
+        """Socket connected to `service`, optionally on one device's transport"""
+        sock = socket.create_connection((self.host, self.port), timeout=timeout or self.timeout)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if serial is not None:
+                _send_request(sock, f'host:transport:{serial}')
+            _send_request(sock, service)
+            return sock
+        except BaseException:
+            sock.close()
+            raise
+
+    def devices(self):
+        with self.open('host:devices') as sock:
+            return parse_device_list(_read_block(sock))
+
+    def host_command(self, service):
+        """One-shot host service that answers with a text block (host:connect:..., host:version)"""
+        with self.open(service) as sock:
+            return _read_block(sock)
+
+    def track_devices(self):
+        """Yield {serial: state} now and after every change (blocks between updates)"""
+        with self.open('host:track-devices', timeout=None) as sock:
+            sock.settimeout(None)
+            while True:
+                yield parse_device_list(_read_block(sock))
+
+    def shell(self, serial, command, timeout=None):
+        """Run one command on the device; returns (exit code, output)"""
+        with self.open(f'shell:{command}; echo {EXIT_MARKER}$?', serial, timeout) as sock:
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        output = b''.join(chunks).decode('utf-8', errors='replace').replace('\r\n', '\n')
+        body, marker, status = output.rpartition(EXIT_MARKER)
+        if not marker:
+            return None, output
+        try:
+            return int(status.strip()), body
+        except ValueError:
+            return None, body
+
+
+class AdbConnectionManager:
+    """Keeps the device list up to date in the background and runs shell commands"""
+
+    def __init__(self, server, sync_timeout=1.0, command_timeout=5.0):
+        self.server = server
+        self.sync_timeout = float(sync_timeout)
+        self.command_timeout = float(command_timeout)
+
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._synced = threading.Event()
+        self._tracker = None
+        self._tracking = False
+        self._last_server_start = 0.0
+        self._updates = 0
+        self._commands = 0
+        self._command_errors = 0
+        self._total_command_s = 0.0
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(devices, tracking) whenever the device list or tracker state changes"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _notify(self, devices, tracking):
+        for callback in list(self._listeners):
+            try:
+                callback(dict(devices), tracking)
+            except Exception as e:
+                print(f"⚠️ Device listener error: {e}")
+
+    def start(self):
+        """Start tracking devices (only the first call does anything)"""
+        with self._lock:
+            if self._tracker is not None:
+                return
+            self._tracker = threading.Thread(target=self._track, name='adb-tracker', daemon=True)
+            self._tracker.start()
+
+    def _start_server(self):
+        # The adb CLI starts the server on demand; do the same, at most every 10 s
+        now = time.monotonic()
+        if now - self._last_server_start < 10:
+            return
+        self._last_server_start = now
+        try:
+            print("⏳ Starting adb server...")
+            subprocess.run(['adb', 'start-server'], capture_output=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"⚠️ Could not start adb server: {e}")
+
+    def _track(self):
+        delay = 0.5
+        while True:
+            try:
+                for devices in self.server.track_devices():
+                    with self._lock:
+                        changed = devices != self._devices or not self._tracking
+                        self._devices = devices
+                        self._tracking = True
+                        self._updates += 1
+                    self._synced.set()
+                    delay = 0.5
+                    if changed:
+                        print(f"📱 ADB devices: {devices or 'none'}")
+                        self._notify(devices, True)
+            except (OSError, AdbError) as e:
+                with self._lock:
+                    was_tracking = self._tracking
+                    self._tracking = False
+                    self._devices = {}
+                if was_tracking:
+                    print(f"⚠️ Lost connection to adb server: {e}")
+                    self._notify({}, False)
+                if isinstance(e, ConnectionRefusedError):
+                    self._start_server()
+            # Requests shouldn't wait for a server that isn't there
+            self._synced.set()
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    def devices(self):
+        """{serial: state} for every device the adb server knows about"""
+        self.start()
+        self._synced.wait(self.sync_timeout)
+        with self._lock:
+            return dict(self._devices)
+
+    def get_connected_device(self):
+        """Serial of the first device that is online, or None"""
+        for serial, state in self.devices().items():
+            if state == 'device':
+                return serial
+        return None
+
+    def shell(self, serial, command, timeout=None):
+        """Run a shell command on a device; returns (success, stdout, stderr)"""
+        started = time.perf_counter()
+        try:
+            code, output = self.server.shell(serial, command, timeout or self.command_timeout)
+            success, stdout, stderr = code == 0, output, ''
+        except (OSError, AdbError) as e:
+            success, stdout, stderr = False, '', str(e)
+        with self._lock:
+            self._commands += 1
+            self._total_command_s += time.perf_counter() - started
+            if not success:
+                self._command_errors += 1
+        return success, stdout, stderr
+
+    def connect(self, address):
+        """Connect to a wireless-debugging device (like `adb connect`); returns (success, message)"""
+        try:
+            message = self.server.host_command(f'host:connect:{address}')
+        except (OSError, AdbError) as e:
+            return False, str(e)
+        return 'connected to' in message, message
+
+    def disconnect(self, address):
+        """Drop a wireless-debugging device (like `adb disconnect`); returns (success, message)"""
+        try:
+            message = self.server.host_command(f'host:disconnect:{address}')
+        except (OSError, AdbError) as e:
+            return False, str(e)
+        return True, message
+
+    def stats(self):
+        with self._lock:
+            return {
+                "server": f"{self.server.host}:{self.server.port}",
+                "tracking": self._tracking,
+                "devices": dict(self._devices),
+                "device_updates": self._updates,
+                "commands": self._commands,
+                "command_errors": self._command_errors,
+                "avg_command_ms": self._total_command_s * 1000.0 / self._commands if self._commands else 0.0
+            }
+
+
+adb = AdbConnectionManager(
+    AdbServer(config.ADB_SERVER_HOST, config.ADB_SERVER_PORT, config.ADB_COMMAND_TIMEOUT_S),
+    sync_timeout=config.ADB_SYNC_TIMEOUT_S,
+    command_timeout=config.ADB_COMMAND_TIMEOUT_S
+)
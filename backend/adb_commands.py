@@ -0,0 +1,92 @@
+"""Pre-built adb command templates for phone actions.
+
+Phone actions used to be f-string command lines run with shell=True. That
+costs an extra /bin/sh fork per command, and the hand-written escaping broke
+on quotes and `$` in messages. Each action is now a fixed argument list with
+named slots that are filled with already-validated values:
+
+  * argv(serial, ...)       - full `adb -s <serial> shell ...` list for
+                              subprocess (no local shell; the per-device
+                              prefix is built once)
+  * shell_command(...)      - the same arguments, each quoted, for the adb
+                              server socket (adb_client) where the device's
+                              shell parses the line
+"""
+import re
+import shlex
+import subprocess
+from functools import lru_cache
+
+# Digits with an optional leading +, after dropping spaces, dashes, dots and brackets
+PHONE_NUMBER_PATTERN = re.compile(r'^\+?[0-9]{3,15}$')
+PHONE_NUMBER_SEPARATORS = re.compile(r'[\s\-().]')
+
+
+class InvalidPhoneNumberError(ValueError):
+    """Raised when a phone number can't be passed to the dialer safely"""
+
+
+def normalize_phone_number(raw):
+    """Validated phone number ("+91 98765-43210" -> "+919876543210")"""
+    number = PHONE_NUMBER_SEPARATORS.sub('', str(raw or ''))
+    if not PHONE_NUMBER_PATTERN.match(number):
+        raise InvalidPhoneNumberError(f"Invalid phone number: {raw!r}")
+    return number
+
+
+@lru_cache(maxsize=64)
+def device_prefix(serial):
+    """argv prefix that runs a shell command on one device (built once per serial)"""
+    return ('adb', '-s', serial, 'shell')
+
+
+class CommandTemplate:
+    """A device shell command with {named} slots in some of its arguments"""
+
+    def __init__(self, name, *args):
+        self.name = name
+        self.args = args
+        # Indexes of the arguments that need filling in; the rest are used as-is
+        self._slots = tuple(i for i, arg in enumerate(args) if '{' in arg)
+
+    def fill(self, **params):
+        args = list(self.args)
+        for i in self._slots:
+            args[i] = args[i].format(**params)
+        return args
+
+    def argv(self, serial, **params):
+        return [*device_prefix(serial), *self.fill(**params)]
+
+    def shell_command(self, **params):
+        return ' '.join(shlex.quote(arg) for arg in self.fill(**params))
+
+
+CALL = CommandTemplate('call', 'am', 'start', '-a', 'android.intent.action.CALL', '-d', 'tel:{number}')
+OPEN_SMS = CommandTemplate('open_sms', 'am', 'start', '-a', 'android.intent.action.SENDTO', '-d', 'sms:{number}')
+# -W returns once the activity has launched instead of immediately
+OPEN_SMS_AND_WAIT = CommandTemplate('open_sms_and_wait', 'am', 'start', '-W', '-a', 'android.intent.action.SENDTO',
+                                    '-d', 'sms:{number}')
+OPEN_SMS_WITH_BODY = CommandTemplate('open_sms_with_body', 'am', 'start', '-a', 'android.intent.action.SENDTO',
+                                     '-d', 'sms:{number}', '--es', 'sms_body', '{body}')
+KEYEVENT = CommandTemplate('keyevent', 'input', 'keyevent', '{code}')
+INPUT_TEXT = CommandTemplate('input_text', 'input', 'text', '{text}')
+
+# Key codes used by the SMS sequence
+KEY_TAB = 9
+KEY_ENTER = 66
+KEY_DEL = 67
+
+
+def input_text(message):
+    # `input text` splits on spaces on older Android; %s is its escape for a space
+    return message.replace(' ', '%s')
+
+
+def run_argv(serial, template, timeout=5, **params):
+    """Run a template through the adb CLI without a local shell; returns (success, stdout, stderr)"""
+    try:
+        result = subprocess.run(template.argv(serial, **params), capture_output=True, text=True, timeout=timeout)
+        return result.returncode == 0, result.stdout, result.stderr
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, "", str(e)
@@ -0,0 +1,200 @@
+"""Persistent adb shell sessions for multi-step phone actions.
+
+Sending an SMS used to start five separate `adb shell` processes with fixed
+sleeps between them (more than 3 s per message). Here each device gets a
+small pool of long-lived `exec:sh` sessions on the adb server. Commands are
+written to the shell's stdin, and each one's output is read back up to an
+exit-status marker, so a whole key sequence costs one round trip.
+
+Fixed sleeps are replaced by polling the foreground window (`dumpsys window`)
+until the SMS app's compose screen has focus.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import adb_commands
+import config
+from adb_client import EXIT_MARKER, AdbError, adb
+
+SMS_INTENT = 'android.intent.action.SENDTO'
+
+
+class ShellSession:
+    """One `sh` process on the device, fed commands over an adb server socket"""
+
+    def __init__(self, server, serial, timeout=5.0):
+        self.serial = serial
+        self.timeout = float(timeout)
+        # exec: gives a raw stdin/stdout stream (no pty, so no echo or prompt)
+        self.sock = server.open('exec:sh', serial)
+        self.sock.settimeout(self.timeout)
+        self.last_used = time.monotonic()
+        self.commands = 0
+
+    def run(self, command, timeout=None):
+        """Run a command; returns (exit code, combined stdout/stderr)"""
+        self.sock.settimeout(timeout or self.timeout)
+        self.sock.sendall(f'{{ {command}\n}} 2>&1; echo {EXIT_MARKER}$?\n'.encode('utf-8'))
+        buffer = bytearray()
+        marker = EXIT_MARKER.encode()
+        while True:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise AdbError(f"Shell session on {self.serial} closed")
+            buffer.extend(chunk)
+            position = buffer.rfind(marker)
+            if position >= 0 and buffer.find(b'\n', position) >= 0:
+                break
+        self.last_used = time.monotonic()
+        self.commands += 1
+        output = buffer.decode('utf-8', errors='replace').replace('\r\n', '\n')
+        body, _, status = output.rpartition(EXIT_MARKER)
+        try:
+            return int(status.strip()), body
+        except ValueError:
+            return None, body
+
+    def close(self):
+        try:
+            self.sock.sendall(b'exit\n')
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class ShellSessionPool:
+    """Up to `per_device` idle shell sessions per device, reused across requests"""
+
+    def __init__(self, manager, per_device=2, idle_s=60.0, timeout=5.0):
+        self.manager = manager
+        self.per_device = max(1, int(per_device))
+        self.idle_s = float(idle_s)
+        self.timeout = float(timeout)
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._sms_packages = {}
+        self._opened = 0
+        self._reused = 0
+        self._broken = 0
+
+    def _idle_queue(self, serial):
+        with self._lock:
+            return self._idle.setdefault(serial, queue.LifoQueue())
+
+    def _acquire(self, serial):
+        idle = self._idle_queue(serial)
+        while True:
+            try:
+                session = idle.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - session.last_used < self.idle_s:
+                with self._lock:
+                    self._reused += 1
+                return session
+            session.close()
+        session = ShellSession(self.manager.server, serial, self.timeout)
+        with self._lock:
+            self._opened += 1
+        return session
+
+    @contextmanager
+    def session(self, serial):
+        """Borrow a session for a sequence of commands on one device"""
+        session = self._acquire(serial)
+        try:
+            yield session
+        except (OSError, AdbError):
+            # A timed-out or dropped session may still have output in flight
+            with self._lock:
+                self._broken += 1
+            session.close()
+            raise
+        idle = self._idle_queue(serial)
+        if idle.qsize() < self.per_device:
+            idle.put(session)
+        else:
+            session.close()
+
+    def sms_package(self, serial, session):
+        """Package of the device's default SMS app (cached per device)"""
+        with self._lock:
+            if serial in self._sms_packages:
+                return self._sms_packages[serial]
+        code, output = session.run(f'cmd package resolve-activity --brief -a {SMS_INTENT} -d sms:0')
+        package = None
+        if code == 0:
+            for line in reversed(output.splitlines()):
+                if '/' in line:
+                    package = line.strip().split('/')[0]
+                    break
+        with self._lock:
+            self._sms_packages[serial] = package
+        return package
+
+    def stats(self):
+        with self._lock:
+            return {
+                "per_device": self.per_device,
+                "idle": {serial: idle.qsize() for serial, idle in self._idle.items()},
+                "opened": self._opened,
+                "reused": self._reused,
+                "broken": self._broken
+            }
+
+
+def focused_window(session):
+    code, output = session.run("dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'")
+    return output if code == 0 else ''
+
+
+def wait_for_focus(session, package, timeout, interval):
+    """Poll the foreground window until `package` (or any messaging app) has focus"""
+    deadline = time.monotonic() + timeout
+    while True:
+        focus = focused_window(session)
+        if package:
+            if package in focus:
+                return True
+        elif any(word in focus.lower() for word in ('sms', 'mms', 'messag')):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def send_sms(serial, phone_number, message, ready_timeout=None):
+    """Open the compose screen, wait for it, type the message and press send
+
+    Returns True when every step ran; False if the compose screen never took
+    focus or a command failed.
+    """
+    ready_timeout = config.ADB_SMS_READY_TIMEOUT_S if ready_timeout is None else ready_timeout
+    with session_pool.session(serial) as session:
+        package = session_pool.sms_package(serial, session)
+        command = adb_commands.OPEN_SMS_AND_WAIT.shell_command(number=phone_number)
+        code, output = session.run(command, timeout=ready_timeout)
+        if code != 0 or 'Error' in output:
+            print(f"⚠️ Could not open SMS app: {output.strip()}")
+            return False
+        if not wait_for_focus(session, package, ready_timeout, config.ADB_POLL_INTERVAL_S):
+            print(f"⚠️ SMS compose screen did not take focus within {ready_timeout:.1f}s")
+            return False
+        # Clear field, type, Tab to the send button, Enter - one round trip
+        code, output = session.run('; '.join([
+            adb_commands.KEYEVENT.shell_command(code=adb_commands.KEY_DEL),
+            adb_commands.INPUT_TEXT.shell_command(text=adb_commands.input_text(message)),
+            adb_commands.KEYEVENT.shell_command(code=adb_commands.KEY_TAB),
+            adb_commands.KEYEVENT.shell_command(code=adb_commands.KEY_ENTER)
+        ]))
+        return code == 0
+
+
+session_pool = ShellSessionPool(
+    adb,
+    per_device=config.ADB_SESSIONS_PER_DEVICE,
+    idle_s=config.ADB_SESSION_IDLE_S,
+    timeout=config.ADB_COMMAND_TIMEOUT_S
+)
@@ -1,67 +1,63 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
 from flask_cors import CORS
-from ultralytics import YOLO
-import cv2
-import numpy as np
-import base64
 import os
-import subprocess
-import json
 from datetime import datetime
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), '..'), static_url_path='')
+import adb_commands
+import config
+from adb_client import adb
+from detect_stream import stream_blueprint, stream_hub
+from device_status import phone_status_response, status_blueprint, status_watcher, voice_status_response
+from devices import DeviceNotFoundError, registry
+from phone_jobs import fan_out_response, job_queue, jobs_blueprint
+from static_assets import static_assets, static_blueprint
+from model_loader import ModelLoader
+
+app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for all routes
+app.register_blueprint(jobs_blueprint)  # /api/phone/jobs/<id>
+app.register_blueprint(status_blueprint)  # /api/phone/status/events
+app.register_blueprint(stream_blueprint)  # /ws/detect live camera stream
+app.register_blueprint(static_blueprint)  # pages, css/ and js/ from memory
 
 # ===== PHONE CONNECTION UTILITIES =====
 class PhoneController:
     @staticmethod
-    def get_connected_device():
-        """Get connected Android device via ADB"""
+    def get_connected_device(target=None):
+        """Serial of the requested device, else the default / first connected one (None if not connected)"""
         try:
-            result = subprocess.run(['adb', 'devices'], capture_output=True, text=True)
-            lines = result.stdout.strip().split('\n')
-            if len(lines) > 1:
-                device = lines[1].split('\t')[0]
-                if device and 'device' in lines[1]:
-                    return device
-            return None
-        except Exception as e:
-            print(f"Error getting device: {e}")
+            return registry.resolve(target)
+        except DeviceNotFoundError:
             return None
     
     @staticmethod
-    def execute_adb_command(command):
-        """Execute ADB command"""
-        try:
-            result = subprocess.run(command, capture_output=True, text=True, shell=True)
-            return result.returncode == 0, result.stdout, result.stderr
-        except Exception as e:
-            print(f"ADB Command Error: {e}")
-            return False, "", str(e)
+    def shell(command, device=None):
+        """Run a shell command on a device (default: the connected one) through the adb server"""
+        device = device or PhoneController.get_connected_device()
+        if not device:
+            return False, "", "Phone not connected"
+        return adb.shell(device, command)
     
     @staticmethod
-    def make_call(phone_number):
+    def make_call(phone_number, device=None):
         """Make a call using ADB"""
-        command = f'adb shell am start -a android.intent.action.CALL -d tel:{phone_number}'
-        success, stdout, stderr = PhoneController.execute_adb_command(command)
+        command = adb_commands.CALL.shell_command(number=phone_number)
+        success, stdout, stderr = PhoneController.shell(command, device)
         return success
     
     @staticmethod
-    def open_sms_app(phone_number):
+    def open_sms_app(phone_number, device=None):
         """Open SMS app with contact"""
-        command = f'adb shell am start -a android.intent.action.SENDTO -d sms:{phone_number}'
-        success, stdout, stderr = PhoneController.execute_adb_command(command)
+        command = adb_commands.OPEN_SMS.shell_command(number=phone_number)
+        success, stdout, stderr = PhoneController.shell(command, device)
         return success
     
     @staticmethod
-    def send_sms(phone_number, message):
+    def send_sms(phone_number, message, device=None):
         """Send SMS via ADB"""
-        # Escape quotes and special characters
-        message = message.replace('"', '\\"').replace("'", "\\'")
-        
-        # Method 1: Using am start with intent extras
-        command = f'adb shell am start -a android.intent.action.SENDTO -d sms:{phone_number} --es sms_body "{message}"'
-        success, stdout, stderr = PhoneController.execute_adb_command(command)
+        # Method 1: Using am start with intent extras (quoted for the device shell)
+        command = adb_commands.OPEN_SMS_WITH_BODY.shell_command(number=phone_number, body=message)
+        success, stdout, stderr = PhoneController.shell(command, device)
         
         if success:
             return True
@@ -72,98 +68,103 @@ class PhoneController:
 
 phone_controller = PhoneController()
 
-# Load YOLOv8 model (pretrained on COCO)
-try:
-    print("⏳ Loading YOLOv8 model...")
-    model = YOLO("yolov8n.pt")  # small model for speed
-    print("✅ YOLOv8 model loaded")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    model = None
+# Load YOLOv8 model (pretrained on COCO) in the background so the server
+# (and the phone routes) come up without waiting for ultralytics
+def build_detection_pipeline(report):
+    report('importing', 0.05)
+    from detection import DetectionPipeline
+    return DetectionPipeline(progress=report)
+
+model_loader = ModelLoader(build_detection_pipeline)
+stream_hub.attach(model_loader)
+
+
+def model_not_ready_response():
+    """503 while the model is still loading, 500 if loading failed"""
+    status = model_loader.status()
+    if model_loader.failed:
+        return jsonify({"error": "Model not loaded", "loader": status}), 500
+    response = jsonify({
+        "success": False,
+        "status": "warming_up",
+        "error": "Model is still loading, try again shortly",
+        "loader": status
+    })
+    response.headers['Retry-After'] = str(config.DETECT_RETRY_AFTER_S)
+    return response, 503
+
 
 @app.route('/detect', methods=['POST'])
 def detect_object():
-    if not model:
-        return jsonify({"error": "Model not loaded"}), 500
+    model_loader.start()
+    pipeline = model_loader.get()
+    if pipeline is None:
+        return model_not_ready_response()
 
+    from detection import DetectOptionsError, ImageInputError, QueueFullError, WorkerError, read_request_image_bytes
+    from detect_options import request_option_values
     try:
-        data = request.json
-        image_data = data.get('image')
-
-        if not image_data:
-            return jsonify({"error": "No image provided"}), 400
-
-        print("📥 Received image, decoding...")
-        # Decode base64 image
-        encoded_data = image_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        print("🔍 Running YOLO detection...")
-        # Run inference
-        results = model(img, verbose=False)
-        
-        # Process results
-        detections = []
-        for result in results:
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                label = model.names[class_id]
-                
-                detections.append({
-                    "class": label,
-                    "confidence": confidence
-                })
-
-        # Sort by confidence
-        detections.sort(key=lambda x: x['confidence'], reverse=True)
-
-        print(f"✅ Found {len(detections)} objects")
-        return jsonify({
-            "success": True,
-            "predictions": detections
-        })
-
+        # conf, iou, classes, max_det, top_k from the query string, form or JSON body
+        options = pipeline.parse_options(request_option_values(request))
+        # Raw JPEG / multipart bodies are decoded in place, JSON data URLs are base64-decoded first
+        image_bytes = read_request_image_bytes(request)
+        # Scanners send X-Client-Id; fall back to the caller's address
+        client_id = request.headers.get('X-Client-Id') or request.remote_addr
+
+        # Columns instead of one object per box: smaller and faster to encode for crowded scenes
+        columns = request.args.get('format') == 'arrays'
+        result = pipeline.detect(image_bytes, client_id, options, columns=columns)
+        if columns:
+            result = dict(result, format="arrays")
+        return jsonify({"success": True, **result})
+
+    except (ImageInputError, DetectOptionsError) as e:
+        return jsonify({"error": str(e)}), 400
+    except (QueueFullError, WorkerError) as e:
+        print(f"⚠️ {e}")
+        response = jsonify({"error": "Server busy, try again"})
+        response.headers['Retry-After'] = str(config.DETECT_RETRY_AFTER_S)
+        return response, 503
+    except TimeoutError as e:
+        print(f"⚠️ {e}")
+        return jsonify({"error": "Detection timed out"}), 504
     except Exception as e:
         print(f"❌ Server Error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+
+@app.route('/api/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 once the model is loaded, 503 with load progress before that"""
+    model_loader.start()
+    status = model_loader.status()
+    return jsonify({"ready": model_loader.ready, **status}), 200 if model_loader.ready else 503
+
 # ===== VOICE COMMAND & PHONE CONTROL ENDPOINTS =====
 
 @app.route('/api/phone/status', methods=['GET'])
 def phone_status():
-    """Check if phone is connected"""
-    device = phone_controller.get_connected_device()
-    if device:
-        return jsonify({
-            "status": "connected",
-            "device": device,
-            "connection": "Bluetooth/USB"
-        })
-    else:
-        return jsonify({
-            "status": "disconnected",
-            "message": "No Android device found. Make sure phone is connected and ADB debugging is enabled."
-        }), 500
+    """Check if phone is connected (?device=<serial> checks one handset); served from memory"""
+    return phone_status_response(request.args.get('device'))
 
 
 @app.route('/api/phone/call', methods=['POST'])
 def make_call():
-    """Make a call from connected phone"""
+    """Queue a call on one or more phones (202 with job IDs, see /api/phone/jobs/<id>)"""
     try:
-        # Check if device is connected
-        device = phone_controller.get_connected_device()
-        if not device:
+        data = request.json
+        # "device": serial, list of serials or "all"; omitted = default / first connected phone
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
             return jsonify({
                 "success": False,
-                "error": "Phone not connected",
+                "error": str(e),
                 "message": "Make sure phone is connected via Bluetooth/USB and ADB debugging is enabled"
             }), 400
         
-        data = request.json
         contact = data.get('contact', 'Unknown')
         phone_number = data.get('phoneNumber')
         
@@ -172,28 +173,26 @@ def make_call():
                 "success": False,
                 "error": "Phone number not provided"
             }), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        print(f"📞 Initiating call to {contact} ({phone_number}) on device: {device}")
-        
-        # Execute call
-        success = phone_controller.make_call(phone_number)
-        
-        if success:
-            print(f"✅ Call initiated successfully")
-            return jsonify({
+        def run(device):
+            print(f"📞 Initiating call to {contact} ({phone_number}) on device: {device}")
+            if not phone_controller.make_call(phone_number, device):
+                return {"success": False, "error": "Failed to execute call command"}
+            return {
                 "success": True,
                 "message": f"Calling {contact}",
                 "contact": contact,
                 "phone_number": phone_number,
                 "device": device,
                 "timestamp": datetime.now().isoformat()
-            })
-        else:
-            print(f"❌ Failed to initiate call")
-            return jsonify({
-                "success": False,
-                "error": "Failed to execute call command"
-            }), 500
+            }
+        
+        # One job per target device; several devices run in parallel
+        return fan_out_response(devices, 'call', run, {"contact": contact})
             
     except Exception as e:
         print(f"❌ Call Error: {e}")
@@ -204,16 +203,18 @@ def make_call():
 
 @app.route('/api/phone/message', methods=['POST'])
 def open_message():
-    """Open messaging app with contact"""
+    """Queue opening the messaging app with a contact"""
     try:
-        device = phone_controller.get_connected_device()
-        if not device:
+        data = request.json
+        # "device": serial, list of serials or "all"; omitted = default / first connected phone
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
             return jsonify({
                 "success": False,
-                "error": "Phone not connected"
+                "error": str(e)
             }), 400
         
-        data = request.json
         contact = data.get('contact', 'Unknown')
         phone_number = data.get('phoneNumber')
         
@@ -222,26 +223,26 @@ def open_message():
                 "success": False,
                 "error": "Phone number not provided"
             }), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        print(f"💬 Opening message app for {contact} ({phone_number})")
-        
-        success = phone_controller.open_sms_app(phone_number)
-        
-        if success:
-            print(f"✅ Message app opened")
-            return jsonify({
+        def run(device):
+            print(f"💬 Opening message app for {contact} ({phone_number}) on device: {device}")
+            if not phone_controller.open_sms_app(phone_number, device):
+                return {"success": False, "error": "Failed to open message app"}
+            return {
                 "success": True,
                 "message": f"Message app opened for {contact}",
                 "contact": contact,
                 "phone_number": phone_number,
                 "device": device,
                 "timestamp": datetime.now().isoformat()
-            })
-        else:
-            return jsonify({
-                "success": False,
-                "error": "Failed to open message app"
-            }), 500
+            }
+        
+        # One job per target device; several devices run in parallel
+        return fan_out_response(devices, 'message', run, {"contact": contact})
             
     except Exception as e:
         print(f"❌ Message Error: {e}")
@@ -252,16 +253,18 @@ def open_message():
 
 @app.route('/api/phone/send-message', methods=['POST'])
 def send_message():
-    """Send a text message"""
+    """Queue sending a text message"""
     try:
-        device = phone_controller.get_connected_device()
-        if not device:
+        data = request.json
+        # "device": serial, list of serials or "all"; omitted = default / first connected phone
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
             return jsonify({
                 "success": False,
-                "error": "Phone not connected"
+                "error": str(e)
             }), 400
         
-        data = request.json
         contact = data.get('contact', 'Unknown')
         phone_number = data.get('phoneNumber')
         message = data.get('message')
@@ -271,35 +274,38 @@ def send_message():
                 "success": False,
                 "error": "Phone number or message not provided"
             }), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        print(f"📨 Sending message to {contact}: '{message}'")
-        
-        success = phone_controller.send_sms(phone_number, message)
-        
-        if success:
-            print(f"✅ Message sent successfully")
-            return jsonify({
-                "success": True,
-                "message": "Message sent successfully",
-                "contact": contact,
-                "text": message,
-                "phone_number": phone_number,
-                "device": device,
-                "timestamp": datetime.now().isoformat()
-            })
-        else:
+        def run(device):
+            print(f"📨 Sending message to {contact}: '{message}' on device: {device}")
+            if phone_controller.send_sms(phone_number, message, device):
+                return {
+                    "success": True,
+                    "message": "Message sent successfully",
+                    "contact": contact,
+                    "text": message,
+                    "phone_number": phone_number,
+                    "device": device,
+                    "timestamp": datetime.now().isoformat()
+                }
             # Even if SMS sending fails via ADB, we open the app
             # User can manually send it or use a different method
             print(f"⚠️ SMS command executed, opening app for manual send")
-            phone_controller.open_sms_app(phone_number)
-            return jsonify({
+            phone_controller.open_sms_app(phone_number, device)
+            return {
                 "success": True,
                 "message": "Message app opened - please send manually",
                 "contact": contact,
                 "phone_number": phone_number,
                 "device": device,
                 "info": "SMS app opened with message ready to send"
-            })
+            }
+        
+        # One job per target device; several devices run in parallel
+        return fan_out_response(devices, 'send_message', run, {"contact": contact})
             
     except Exception as e:
         print(f"❌ Send Message Error: {e}")
@@ -308,32 +314,52 @@ def send_message():
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/api/voice/status', methods=['GET'])
-def voice_status():
-    """Check voice command system status"""
-    device = phone_controller.get_connected_device()
+@app.route('/api/phone/devices', methods=['GET'])
+def list_devices():
+    """Every handset the adb server knows about, keyed by serial"""
     return jsonify({
-        "status": "ready" if device else "disconnected",
-        "phone_connected": device is not None,
-        "device": device,
-        "features": ["call", "message", "send_message"],
-        "language": "en-IN",
-        "connection_type": "Bluetooth/USB via ADB"
+        "devices": registry.list(),
+        "default": registry.default_device or None,
+        "queued_jobs": job_queue.stats()["queued"]
     })
 
 
+@app.route('/api/voice/status', methods=['GET'])
+def voice_status():
+    """Check voice command system status (served from memory)"""
+    return voice_status_response()
+
+
 @app.route('/api/debug/adb-devices', methods=['GET'])
 def debug_adb_devices():
     """Debug endpoint to check ADB devices"""
-    success, stdout, stderr = phone_controller.execute_adb_command('adb devices')
+    devices = adb.devices()
+    stats = adb.stats()
     return jsonify({
-        "adb_available": success,
-        "output": stdout,
-        "error": stderr,
+        "adb_available": stats["tracking"],
+        "output": "List of devices attached\n" + "".join(f"{serial}\t{state}\n" for serial, state in devices.items()),
+        "devices": devices,
+        "server": stats,
         "device_connected": phone_controller.get_connected_device() is not None
     })
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Runtime metrics for the detection pipeline and the adb connection"""
+    pipeline = model_loader.get()
+    return jsonify({
+        "model_loaded": pipeline is not None,
+        "loader": model_loader.status(),
+        "adb": adb.stats(),
+        "phone_jobs": job_queue.stats(),
+        "phone_status": status_watcher.stats(),
+        "static": static_assets.stats(),
+        "stream": stream_hub.stats(),
+        **(pipeline.stats() if pipeline else {})
+    })
+
+
 @app.route('/', methods=['GET'])
 def index():
     """Home endpoint"""
@@ -341,40 +367,29 @@ def index():
         "message": "Smart Object AI Backend Running",
         "endpoints": {
             "/voice-control.html": "GET - Voice control page",
-            "/detect": "POST - Object detection",
-            "/api/phone/call": "POST - Make a call",
-            "/api/phone/message": "POST - Open message app",
-            "/api/phone/send-message": "POST - Send SMS",
+            "/detect": "POST - Object detection (image/jpeg body, multipart or JSON data URL; "
+                       "optional conf, iou, classes, max_det, top_k; ?format=arrays for columns)",
+            "/ws/detect": "WebSocket - Live camera: binary JPEG frames in, JSON detections out",
+            "/api/phone/call": "POST - Make a call (queued, returns a job ID)",
+            "/api/phone/message": "POST - Open message app (queued)",
+            "/api/phone/send-message": "POST - Send SMS (queued; add ?wait=1 to wait for the result)",
+            "/api/phone/jobs/<id>": "GET - Phone action job state (/events for a server-sent event stream)",
             "/api/phone/status": "GET - Check phone connection",
+            "/api/phone/status/events": "GET - Phone status as server-sent events (pushed on every change)",
+            "/api/phone/devices": "GET - Connected handsets (pass \"device\": serial, list or \"all\" to phone actions)",
             "/api/voice/status": "GET - Check voice system status",
-            "/api/debug/adb-devices": "GET - Debug ADB devices"
+            "/api/debug/adb-devices": "GET - Debug ADB devices",
+            "/api/metrics": "GET - Detection pipeline metrics",
+            "/api/ready": "GET - Model readiness and load progress"
         }
     })
 
 
-@app.route('/voice-control.html', methods=['GET'])
-def voice_control():
-    """Serve voice control page"""
-    try:
-        file_path = os.path.join(os.path.dirname(__file__), '..', 'voice-control.html')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return jsonify({"error": f"File not found: {str(e)}"}), 404
-
-
-@app.route('/<path:filename>', methods=['GET'])
-def serve_static(filename):
-    """Serve static files"""
-    try:
-        file_path = os.path.join(os.path.dirname(__file__), '..', filename)
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return jsonify({"error": "File not found"}), 404
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server; see serve.py for production
+    debug = config.SERVER_DEBUG
+    # With the reloader on, only the child process that serves requests loads the model
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        model_loader.start()
+        status_watcher.start()
+    app.run(host='0.0.0.0', port=config.SERVER_PORT, debug=debug)
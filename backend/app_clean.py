@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 import os
-import sys
-import subprocess
-import time
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+import adb_commands
+import adb_shell
+import config
+from adb_client import adb
+from device_status import phone_status_response, status_blueprint, status_watcher
+from devices import DeviceNotFoundError, registry
+from phone_jobs import fan_out_response, jobs_blueprint
+from static_assets import static_blueprint
+
 print("🚀 Starting Voice Control Backend...")
 print("✅ No YOLO model needed - Voice commands only")
 
@@ -14,99 +20,58 @@ os.environ['PATH'] += ';C:\\tools\\platform-tools'
 
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(jobs_blueprint)  # /api/phone/jobs/<id>
+app.register_blueprint(status_blueprint)  # /api/phone/status/events
+app.register_blueprint(static_blueprint)  # pages, css/ and js/ from memory
 
 class PhoneController:
     """Android phone control via ADB"""
     
     @staticmethod
-    def get_connected_device():
-        """Get currently connected device ID"""
+    def get_connected_device(target=None):
+        """Serial of the requested device, else the default / first connected one (None if not connected)"""
         try:
-            cmd = 'adb devices'
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=3)
-            lines = result.stdout.strip().split('\n')
-            
-            for line in lines[1:]:  # Skip header
-                if 'device' in line and not line.startswith('*'):
-                    device_id = line.split()[0]
-                    if device_id and device_id != 'List':
-                        return device_id
-            return None
-        except Exception as e:
-            print(f"❌ Error getting device: {e}")
+            return registry.resolve(target)
+        except DeviceNotFoundError:
             return None
     
     @staticmethod
-    def execute_adb_command(command):
-        """Execute ADB command"""
-        try:
-            result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=5)
-            return result.returncode == 0, result.stdout, result.stderr
-        except Exception as e:
-            return False, "", str(e)
-    
-    @staticmethod
-    def make_call(phone_number):
+    def make_call(phone_number, device=None):
         """Make a call"""
-        device = PhoneController.get_connected_device()
+        device = device or PhoneController.get_connected_device()
         if not device:
             return False
         
-        try:
-            cmd = f'adb -s {device} shell am start -a android.intent.action.CALL -d tel:{phone_number}'
-            subprocess.run(cmd, shell=True, capture_output=True, timeout=5)
-            return True
-        except Exception as e:
-            print(f"Call error: {e}")
-            return False
+        success, stdout, stderr = adb.shell(device, adb_commands.CALL.shell_command(number=phone_number))
+        if not success:
+            print(f"Call error: {stderr or stdout}")
+        return success
     
     @staticmethod
-    def open_sms_app(phone_number):
+    def open_sms_app(phone_number, device=None):
         """Open SMS app with contact"""
-        device = PhoneController.get_connected_device()
+        device = device or PhoneController.get_connected_device()
         if not device:
             return False
         
-        try:
-            cmd = f'adb -s {device} shell am start -a android.intent.action.SENDTO -d sms:{phone_number}'
-            subprocess.run(cmd, shell=True, capture_output=True, timeout=5)
-            return True
-        except Exception as e:
-            print(f"SMS open error: {e}")
-            return False
+        success, stdout, stderr = adb.shell(device, adb_commands.OPEN_SMS.shell_command(number=phone_number))
+        if not success:
+            print(f"SMS open error: {stderr or stdout}")
+        return success
     
     @staticmethod
-    def send_sms(phone_number, message):
-        """Send SMS via ADB"""
+    def send_sms(phone_number, message, device=None):
+        """Send SMS via ADB (one pooled shell session, no fixed sleeps)"""
         try:
-            device = PhoneController.get_connected_device()
+            device = device or PhoneController.get_connected_device()
             if not device:
                 return False
             
-            # Clean number
-            clean_number = ''.join(filter(str.isdigit, phone_number))
+            # Digits with an optional leading +
+            clean_number = adb_commands.normalize_phone_number(phone_number)
             
-            # Open SMS app
-            cmd = f'adb -s {device} shell am start -a android.intent.action.SENDTO -d sms:{clean_number}'
-            subprocess.run(cmd, shell=True, capture_output=True, timeout=5)
-            time.sleep(1.5)
-            
-            # Clear field
-            subprocess.run(f'adb -s {device} shell input keyevent 67', shell=True, capture_output=True, timeout=2)
-            time.sleep(0.5)
-            
-            # Type message
-            escaped_msg = message.replace("'", "\\'").replace('"', '\\"').replace('$', '\\$')
-            cmd_text = f'adb -s {device} shell input text "{escaped_msg}"'
-            subprocess.run(cmd_text, shell=True, capture_output=True, timeout=5)
-            time.sleep(0.5)
-            
-            # Send
-            subprocess.run(f'adb -s {device} shell input keyevent 9', shell=True, capture_output=True, timeout=2)
-            time.sleep(0.3)
-            subprocess.run(f'adb -s {device} shell input keyevent 66', shell=True, capture_output=True, timeout=2)
-            
-            return True
+            # Open SMS app, wait for the compose screen, type and send
+            return adb_shell.send_sms(device, clean_number, message)
         except Exception as e:
             print(f"SMS send error: {e}")
             return False
@@ -118,67 +83,33 @@ def index():
     return jsonify({"message": "Smart Object AI Backend - Voice Control", "status": "running"})
 
 
-@app.route('/voice-control.html', methods=['GET'])
-def voice_control():
-    try:
-        file_path = os.path.join(os.path.dirname(__file__), '..', 'voice-control.html')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return jsonify({"error": f"File not found: {str(e)}"}), 404
-
-
-@app.route('/<path:filename>', methods=['GET'])
-def serve_static(filename):
-    try:
-        file_path = os.path.join(os.path.dirname(__file__), '..', filename)
-        if os.path.isfile(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return jsonify({"error": "File not found"}), 404
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
 @app.route('/api/phone/status', methods=['GET'])
 def get_status():
-    """Check phone connection status"""
-    try:
-        device = PhoneController.get_connected_device()
-        if device:
-            return jsonify({"connected": True, "device": device})
-        else:
-            return jsonify({"connected": False, "device": None})
-    except Exception as e:
-        print(f"Error in status: {e}")
-        return jsonify({"connected": False, "error": str(e)})
+    """Check phone connection status (?device=<serial> checks one handset); served from memory"""
+    return phone_status_response(request.args.get('device'), disconnected_status=200)
 
 
 @app.route('/api/phone/connect', methods=['POST'])
 def connect_device():
     """Connect to phone"""
     try:
-        data = request.json or {}
-        ip = data.get('ip', '192.168.29.67')
-        port = data.get('port', '5555')
-        
-        print(f"🔗 Connecting to {ip}:{port}...")
-        cmd = f'adb connect {ip}:{port}'
-        result = subprocess.run(cmd, shell=True, capture_output=True, timeout=5, text=True)
-        print(f"Connect output: {result.stdout} | Error: {result.stderr}")
+        data = request.get_json(silent=True) or {}
+        # "device": ip:port, or "ip" (+ "port"); omitted = PHONE_DEFAULT_DEVICE
+        try:
+            device = registry.address(data.get('device'), data.get('ip'), data.get('port'))
+        except DeviceNotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        time.sleep(1)
+        print(f"🔗 Connecting to {device}...")
+        connected, output = adb.connect(device)
+        print(f"Connect output: {output}")
         
-        device = PhoneController.get_connected_device()
-        if device:
+        if connected:
             print(f"✅ Connected device: {device}")
             return jsonify({"success": True, "device": device})
         else:
-            print(f"❌ No device found after connect")
+            print(f"❌ Connect failed: {output}")
             return jsonify({"success": False, "message": "Connection failed"}), 400
-    except subprocess.TimeoutExpired:
-        print("❌ ADB connect timeout")
-        return jsonify({"success": False, "error": "Connection timeout"}), 500
     except Exception as e:
         print(f"❌ Connect error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
@@ -186,13 +117,11 @@ def connect_device():
 
 @app.route('/api/phone/disconnect', methods=['POST'])
 def disconnect_device():
-    """Disconnect from phone"""
+    """Disconnect from phone ("device": serial; omitted = default / first connected phone)"""
     try:
-        device = PhoneController.get_connected_device()
+        device = PhoneController.get_connected_device((request.get_json(silent=True) or {}).get('device'))
         if device:
-            cmd = f'adb disconnect {device}'
-            subprocess.run(cmd, shell=True, capture_output=True, timeout=5)
-            time.sleep(1)
+            adb.disconnect(device)
         
         return jsonify({"success": True})
     except Exception as e:
@@ -201,76 +130,102 @@ def disconnect_device():
 
 @app.route('/api/phone/call', methods=['POST'])
 def make_call():
-    """Make a call"""
+    """Queue a call ("device": serial, list of serials or "all")"""
     try:
-        device = PhoneController.get_connected_device()
-        if not device:
-            return jsonify({"success": False, "error": "Phone not connected"}), 400
-        
         data = request.json
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
         phone_number = data.get('phoneNumber')
         contact = data.get('contact', 'Unknown')
         
         if not phone_number:
             return jsonify({"success": False, "error": "No phone number"}), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        success = PhoneController.make_call(phone_number)
-        if success:
-            return jsonify({"success": True, "message": f"Calling {contact}"})
-        else:
-            return jsonify({"success": False, "error": "Call failed"}), 500
+        def run(device):
+            if PhoneController.make_call(phone_number, device):
+                return {"success": True, "message": f"Calling {contact}", "device": device}
+            return {"success": False, "error": "Call failed", "device": device}
+        
+        # One job per target device; poll /api/phone/jobs/<id> for the result
+        return fan_out_response(devices, 'call', run, {"contact": contact})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/phone/message', methods=['POST'])
 def open_message():
-    """Open message app"""
+    """Queue opening the message app ("device": serial, list of serials or "all")"""
     try:
-        device = PhoneController.get_connected_device()
-        if not device:
-            return jsonify({"success": False, "error": "Phone not connected"}), 400
-        
         data = request.json
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
         phone_number = data.get('phoneNumber')
         contact = data.get('contact', 'Unknown')
         
         if not phone_number:
             return jsonify({"success": False, "error": "No phone number"}), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        success = PhoneController.open_sms_app(phone_number)
-        if success:
-            return jsonify({"success": True, "message": f"SMS app opened for {contact}"})
-        else:
-            return jsonify({"success": False, "error": "Failed to open SMS"}), 500
+        def run(device):
+            if PhoneController.open_sms_app(phone_number, device):
+                return {"success": True, "message": f"SMS app opened for {contact}", "device": device}
+            return {"success": False, "error": "Failed to open SMS", "device": device}
+        
+        return fan_out_response(devices, 'message', run, {"contact": contact})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/phone/send-message', methods=['POST'])
 def send_message():
-    """Send SMS message"""
+    """Queue sending an SMS ("device": serial, list of serials or "all")"""
     try:
-        device = PhoneController.get_connected_device()
-        if not device:
-            return jsonify({"success": False, "error": "Phone not connected"}), 400
-        
         data = request.json
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
         phone_number = data.get('phoneNumber')
         message = data.get('message', '')
         contact = data.get('contact', 'Unknown')
         
         if not phone_number:
             return jsonify({"success": False, "error": "No phone number"}), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        success = PhoneController.send_sms(phone_number, message)
-        if success:
-            return jsonify({"success": True, "message": f"SMS sent to {contact}"})
-        else:
-            return jsonify({"success": False, "error": "SMS failed"}), 500
+        def run(device):
+            if PhoneController.send_sms(phone_number, message, device):
+                return {"success": True, "message": f"SMS sent to {contact}", "device": device}
+            return {"success": False, "error": "SMS failed", "device": device}
+        
+        # Runs on each device's job queue; poll /api/phone/jobs/<id> for the result
+        return fan_out_response(devices, 'send_message', run, {"contact": contact})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server; see serve.py for production
+    debug = config.SERVER_DEBUG
+    # With the reloader on, only the child process that serves requests tracks devices
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        adb.start()
+        status_watcher.start()
+    app.run(host='0.0.0.0', port=config.SERVER_PORT, debug=debug)
@@ -1,95 +1,71 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
-import subprocess
-import json
-from datetime import datetime
+
+import adb_commands
+import adb_shell
+import config
+from adb_client import adb
+from device_status import phone_status_response, status_blueprint, status_watcher, voice_status_response
+from devices import DeviceNotFoundError, registry
+from phone_jobs import fan_out_response, jobs_blueprint
+from static_assets import static_blueprint
 
 # Add ADB to PATH
 os.environ['PATH'] = os.environ.get('PATH', '') + ';C:\\tools\\platform-tools'
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), '..'), static_url_path='')
+app = Flask(__name__, static_folder=None)
 CORS(app)
+app.register_blueprint(jobs_blueprint)  # /api/phone/jobs/<id>
+app.register_blueprint(status_blueprint)  # /api/phone/status/events
+app.register_blueprint(static_blueprint)  # pages, css/ and js/ from memory
 
 # ===== PHONE CONNECTION UTILITIES =====
 class PhoneController:
     @staticmethod
-    def get_connected_device():
-        """Get connected Android device via ADB"""
+    def get_connected_device(target=None):
+        """Serial of the requested device, else the default / first connected one (None if not connected)"""
         try:
-            result = subprocess.run(['adb', 'devices'], capture_output=True, text=True)
-            lines = result.stdout.strip().split('\n')
-            if len(lines) > 1:
-                device = lines[1].split('\t')[0]
-                if device and 'device' in lines[1]:
-                    return device
-            return None
-        except Exception as e:
-            print(f"Error getting device: {e}")
+            return registry.resolve(target)
+        except DeviceNotFoundError:
             return None
     
     @staticmethod
-    def execute_adb_command(command):
-        """Execute ADB command"""
-        try:
-            result = subprocess.run(command, capture_output=True, text=True, shell=True)
-            return result.returncode == 0, result.stdout, result.stderr
-        except Exception as e:
-            print(f"ADB Command Error: {e}")
-            return False, "", str(e)
+    def shell(command, device=None):
+        """Run a shell command on the device through the adb server"""
+        device = device or PhoneController.get_connected_device()
+        if not device:
+            return False, "", "Phone not connected"
+        return adb.shell(device, command)
     
     @staticmethod
-    def make_call(phone_number):
+    def make_call(phone_number, device=None):
         """Make a call using ADB"""
-        command = f'adb shell am start -a android.intent.action.CALL -d tel:{phone_number}'
-        success, stdout, stderr = PhoneController.execute_adb_command(command)
+        command = adb_commands.CALL.shell_command(number=phone_number)
+        success, stdout, stderr = PhoneController.shell(command, device)
         return success
     
     @staticmethod
-    def open_sms_app(phone_number):
+    def open_sms_app(phone_number, device=None):
         """Open SMS app with contact"""
-        command = f'adb shell am start -a android.intent.action.SENDTO -d sms:{phone_number}'
-        success, stdout, stderr = PhoneController.execute_adb_command(command)
+        command = adb_commands.OPEN_SMS.shell_command(number=phone_number)
+        success, stdout, stderr = PhoneController.shell(command, device)
         return success
     
     @staticmethod
-    def send_sms(phone_number, message):
-        """Send SMS via ADB using input text method"""
+    def send_sms(phone_number, message, device=None):
+        """Send SMS via ADB using input text method (one pooled shell session)"""
         try:
-            import time
+            device = device or PhoneController.get_connected_device()
+            if not device:
+                return False
             
-            # Extract only digits from phone number
-            clean_number = ''.join(filter(str.isdigit, phone_number))
+            # Digits with an optional leading +
+            clean_number = adb_commands.normalize_phone_number(phone_number)
             
-            # Step 1: Open SMS app with contact number
-            command = f'adb shell am start -a android.intent.action.SENDTO -d sms:{clean_number}'
-            subprocess.run(command, shell=True, capture_output=True, timeout=5)
-            time.sleep(1.5)
+            # Open the compose screen, wait until it has focus, type and send
+            return adb_shell.send_sms(device, clean_number, message)
             
-            # Step 2: Clear compose field (DEL key press)
-            subprocess.run('adb shell input keyevent 67', shell=True, capture_output=True, timeout=2)
-            time.sleep(0.5)
-            
-            # Step 3: Type message using 'input text' (better for special characters)
-            # URL encode the message for safety
-            import urllib.parse
-            escaped_msg = message.replace("'", "\\'").replace('"', '\\"').replace('$', '\\$')
-            cmd_text = f'adb shell input text "{escaped_msg}"'
-            subprocess.run(cmd_text, shell=True, capture_output=True, timeout=5)
-            time.sleep(0.5)
-            
-            # Step 4: Send message (press ENTER or find Send button)
-            # Try Tab key to move to Send button
-            subprocess.run('adb shell input keyevent 9', shell=True, capture_output=True, timeout=2)
-            time.sleep(0.3)
-            # Press Enter/Send
-            subprocess.run('adb shell input keyevent 66', shell=True, capture_output=True, timeout=2)
-            
-            return True
-            
-        except subprocess.TimeoutExpired:
-            print("SMS command timeout")
-            return False
         except Exception as e:
             print(f"SMS Error: {e}")
             return False
@@ -106,81 +82,39 @@ def index():
     })
 
 
-@app.route('/voice-control.html', methods=['GET'])
-def voice_control():
-    """Serve voice control page"""
-    try:
-        file_path = os.path.join(os.path.dirname(__file__), '..', 'voice-control.html')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return jsonify({"error": f"File not found: {str(e)}"}), 404
-
-
-@app.route('/<path:filename>', methods=['GET'])
-def serve_static(filename):
-    """Serve static files"""
-    try:
-        file_path = os.path.join(os.path.dirname(__file__), '..', filename)
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return jsonify({"error": "File not found"}), 404
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
 @app.route('/api/phone/status', methods=['GET'])
 def phone_status():
-    """Check if phone is connected"""
-    try:
-        device = PhoneController.get_connected_device()
-        if device:
-            return jsonify({
-                "status": "connected",
-                "device": device,
-                "connection": "Bluetooth/USB"
-            })
-        else:
-            return jsonify({
-                "status": "disconnected",
-                "message": "No Android device found. Make sure phone is connected and ADB debugging is enabled."
-            }), 500
-    except Exception as e:
-        print(f"❌ Phone status error: {e}")
-        return jsonify({
-            "status": "disconnected",
-            "error": str(e)
-        }), 500
+    """Check if phone is connected (?device=<serial> checks one handset); served from memory"""
+    return phone_status_response(request.args.get('device'))
 
 
 @app.route('/api/phone/connect', methods=['POST'])
 def connect_phone():
     """Connect to phone via wireless ADB"""
     try:
-        data = request.json or {}
-        ip = data.get('ip', '192.168.29.67')
-        port = data.get('port', '5555')
-        
-        # Try to connect
-        cmd = f'adb connect {ip}:{port}'
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10)
+        data = request.get_json(silent=True) or {}
+        # "device": ip:port, or "ip" (+ "port"); omitted = PHONE_DEFAULT_DEVICE
+        try:
+            device = registry.address(data.get('device'), data.get('ip'), data.get('port'))
+        except DeviceNotFoundError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
-        import time
-        time.sleep(1)
+        # Ask the adb server to connect (no adb process, no shell)
+        connected, output = adb.connect(device)
         
-        # Check if connected
-        device = phone_controller.get_connected_device()
-        if device:
+        if connected:
             return jsonify({
                 "success": True,
-                "message": f"Connected to {ip}:{port}",
+                "message": f"Connected to {device}",
                 "device": device
             })
         else:
             return jsonify({
                 "success": False,
-                "message": result.stdout or result.stderr or "Connection failed"
+                "message": output or "Connection failed"
             }), 400
     except Exception as e:
         return jsonify({
@@ -191,15 +125,11 @@ def connect_phone():
 
 @app.route('/api/phone/disconnect', methods=['POST'])
 def disconnect_phone():
-    """Disconnect from phone"""
+    """Disconnect from phone ("device": serial; omitted = default / first connected phone)"""
     try:
-        device = PhoneController.get_connected_device()
+        device = PhoneController.get_connected_device((request.get_json(silent=True) or {}).get('device'))
         if device:
-            cmd = f'adb disconnect {device}'
-            subprocess.run(cmd, shell=True, capture_output=True, timeout=5)
-            
-            import time
-            time.sleep(1)
+            adb.disconnect(device)
             
             return jsonify({
                 "success": True,
@@ -215,17 +145,22 @@ def disconnect_phone():
             "success": False,
             "error": str(e)
         }), 500
+
+
+@app.route('/api/phone/call', methods=['POST'])
 def make_call():
-    """Make a call from connected phone"""
+    """Queue a call on one or more phones (202 with job IDs, see /api/phone/jobs/<id>)"""
     try:
-        device = PhoneController.get_connected_device()
-        if not device:
+        data = request.json
+        # "device": serial, list of serials or "all"; omitted = default / first connected phone
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
             return jsonify({
                 "success": False,
-                "error": "Phone not connected"
+                "error": str(e)
             }), 400
         
-        data = request.json
         contact = data.get('contact', 'Unknown')
         phone_number = data.get('phoneNumber')
         
@@ -234,24 +169,26 @@ def make_call():
                 "success": False,
                 "error": "Phone number not provided"
             }), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        print(f"📞 Initiating call to {contact} ({phone_number})")
-        success = PhoneController.make_call(phone_number)
-        
-        if success:
+        def run(device):
+            print(f"📞 Initiating call to {contact} ({phone_number}) on {device}")
+            if not PhoneController.make_call(phone_number, device):
+                return {"success": False, "error": "Failed to execute call command"}
             print(f"✅ Call initiated")
-            return jsonify({
+            return {
                 "success": True,
                 "message": f"Calling {contact}",
                 "contact": contact,
                 "phone_number": phone_number,
                 "device": device
-            })
-        else:
-            return jsonify({
-                "success": False,
-                "error": "Failed to execute call command"
-            }), 500
+            }
+        
+        # One job per target device; several devices run in parallel
+        return fan_out_response(devices, 'call', run, {"contact": contact})
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -260,16 +197,18 @@ def make_call():
 
 @app.route('/api/phone/message', methods=['POST'])
 def open_message():
-    """Open messaging app with contact"""
+    """Queue opening the messaging app with a contact"""
     try:
-        device = phone_controller.get_connected_device()
-        if not device:
+        data = request.json
+        # "device": serial, list of serials or "all"; omitted = default / first connected phone
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
             return jsonify({
                 "success": False,
-                "error": "Phone not connected"
+                "error": str(e)
             }), 400
         
-        data = request.json
         contact = data.get('contact', 'Unknown')
         phone_number = data.get('phoneNumber')
         
@@ -278,24 +217,26 @@ def open_message():
                 "success": False,
                 "error": "Phone number not provided"
             }), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        print(f"💬 Opening message app")
-        success = phone_controller.open_sms_app(phone_number)
-        
-        if success:
+        def run(device):
+            print(f"💬 Opening message app on {device}")
+            if not phone_controller.open_sms_app(phone_number, device):
+                return {"success": False, "error": "Failed to open message app"}
             print(f"✅ Message app opened")
-            return jsonify({
+            return {
                 "success": True,
                 "message": f"Message app opened for {contact}",
                 "contact": contact,
                 "phone_number": phone_number,
                 "device": device
-            })
-        else:
-            return jsonify({
-                "success": False,
-                "error": "Failed to open message app"
-            }), 500
+            }
+        
+        # One job per target device; several devices run in parallel
+        return fan_out_response(devices, 'message', run, {"contact": contact})
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -304,16 +245,18 @@ def open_message():
 
 @app.route('/api/phone/send-message', methods=['POST'])
 def send_message():
-    """Send a text message"""
+    """Queue sending a text message"""
     try:
-        device = phone_controller.get_connected_device()
-        if not device:
+        data = request.json
+        # "device": serial, list of serials or "all"; omitted = default / first connected phone
+        try:
+            devices = registry.resolve_many(data.get('device'))
+        except DeviceNotFoundError as e:
             return jsonify({
                 "success": False,
-                "error": "Phone not connected"
+                "error": str(e)
             }), 400
         
-        data = request.json
         contact = data.get('contact', 'Unknown')
         phone_number = data.get('phoneNumber')
         message = data.get('message')
@@ -323,28 +266,33 @@ def send_message():
                 "success": False,
                 "error": "Phone number or message not provided"
             }), 400
+        try:
+            phone_number = adb_commands.normalize_phone_number(phone_number)
+        except adb_commands.InvalidPhoneNumberError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        print(f"📨 Sending message to {contact}")
-        success = phone_controller.send_sms(phone_number, message)
-        
-        if success:
-            print(f"✅ Message operation completed")
-            return jsonify({
-                "success": True,
-                "message": "Message sent",
-                "contact": contact,
-                "phone_number": phone_number,
-                "device": device
-            })
-        else:
-            phone_controller.open_sms_app(phone_number)
-            return jsonify({
+        def run(device):
+            print(f"📨 Sending message to {contact} on {device}")
+            if phone_controller.send_sms(phone_number, message, device):
+                print(f"✅ Message operation completed")
+                return {
+                    "success": True,
+                    "message": "Message sent",
+                    "contact": contact,
+                    "phone_number": phone_number,
+                    "device": device
+                }
+            phone_controller.open_sms_app(phone_number, device)
+            return {
                 "success": True,
                 "message": "Message app opened - please send manually",
                 "contact": contact,
                 "phone_number": phone_number,
                 "device": device
-            })
+            }
+        
+        # Typing the message takes seconds; answer with job IDs straight away
+        return fan_out_response(devices, 'send_message', run, {"contact": contact})
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -353,26 +301,21 @@ def send_message():
 
 @app.route('/api/voice/status', methods=['GET'])
 def voice_status():
-    """Check voice command system status"""
-    device = phone_controller.get_connected_device()
-    return jsonify({
-        "status": "ready" if device else "disconnected",
-        "phone_connected": device is not None,
-        "device": device,
-        "features": ["call", "message", "send_message"],
-        "language": "en-IN",
-        "connection_type": "Bluetooth/USB via ADB"
-    })
+    """Check voice command system status (served from memory)"""
+    return voice_status_response()
 
 
 @app.route('/api/debug/adb-devices', methods=['GET'])
 def debug_adb_devices():
     """Debug endpoint to check ADB devices"""
-    success, stdout, stderr = PhoneController.execute_adb_command('adb devices')
+    devices = adb.devices()
+    stats = adb.stats()
     return jsonify({
-        "adb_available": success,
-        "output": stdout,
-        "error": stderr,
+        "adb_available": stats["tracking"],
+        "output": "List of devices attached\n" + "".join(f"{serial}\t{state}\n" for serial, state in devices.items()),
+        "devices": devices,
+        "server": stats,
+        "shell_sessions": adb_shell.session_pool.stats(),
         "device_connected": PhoneController.get_connected_device() is not None
     })
 
@@ -380,4 +323,10 @@ def debug_adb_devices():
 if __name__ == '__main__':
     print("🚀 Starting Voice Control Backend...")
     print("✅ No YOLO model needed - Voice commands only")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server; see serve.py for production
+    debug = config.SERVER_DEBUG
+    # With the reloader on, only the child process that serves requests tracks devices
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        adb.start()
+        status_watcher.start()
+    app.run(host='0.0.0.0', port=config.SERVER_PORT, debug=debug)
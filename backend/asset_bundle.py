@@ -0,0 +1,447 @@
+"""Build step for the frontend: minified, concatenated, content-hashed CSS / JS.
+
+Each page loads css/style.css and up to four scripts from js/ as separate
+requests. For every page this finds the runs of consecutive local
+`<script src>` tags (and `<link rel="stylesheet">` tags), minifies and
+concatenates each run into one file named by its content hash
+(dist/config-auth-main.3f9a1c2e.js), and writes a copy of the page that
+references the bundles. static_assets serves those copies at the original
+URLs, and the bundles with a year-long immutable Cache-Control.
+
+Usage:
+    python backend/asset_bundle.py [--no-minify] [--check]
+
+Run it as a build step (or `serve.py --build-assets`). Importing the backend
+never builds: with ASSET_BUNDLE=1 (the default) the first page request uses
+the manifest an earlier build left in dist/, or builds if there is none or
+its sources changed, and later requests rebuild when a page or one of its
+sources changes. The minifiers only drop comments and whitespace outside
+strings. Line breaks in scripts are kept so semicolon insertion can't change
+meaning. When the optional rjsmin / rcssmin packages are installed, they are
+used instead.
+
+Scripts in one bundle run as one script: an uncaught error at the top level
+of one file stops the files after it in the same bundle, where separate
+<script> tags would have carried on. Wrapping each file in try / catch would
+block-scope its top-level let / const / class, which the pages share between
+files, so the files are concatenated as they are.
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+import threading
+import time
+
+import config
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST_NAME = 'manifest.json'
+
+SCRIPT_TAG = re.compile(r'<script\s+src="([^"]+)"\s*>\s*</script>', re.IGNORECASE)
+STYLESHEET_TAG = re.compile(r'<link\s+rel="stylesheet"\s+href="([^"]+)"\s*/?>', re.IGNORECASE)
+# Only whitespace and HTML comments may sit between tags that are bundled together
+BETWEEN_TAGS = re.compile(r'^(?:\s|<!--.*?-->)*$', re.DOTALL)
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+# After these words a "/" starts a regular expression, not a division
+REGEX_KEYWORDS = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|new|delete|void|throw|instanceof|yield|await)$')
+
+
+def is_local(url):
+    return not re.match(r'^(?:[a-z]+:|//|/)', url, re.IGNORECASE)
+
+
+def _is_word(char):
+    return char.isalnum() or char in '_$\\' or ord(char) > 127
+
+
+def _skip_quoted(source, i, quote):
+    """Index just past the string / template literal starting at source[i]"""
+    i += 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == quote:
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex(source, i):
+    """Index just past the regex literal (and its flags) starting at source[i]"""
+    i += 1
+    in_class = False
+    while i < len(source) and source[i] != '\n':
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(source) and _is_word(source[i]):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """Drop comments and redundant whitespace outside strings, template literals and regexes"""
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    out = []
+    i, n = 0, len(source)
+    pending_space = pending_newline = False
+
+    def last():
+        return out[-1][-1] if out else ''
+
+    while i < n:
+        char = source[i]
+        if char in ' \t\r\n':
+            pending_newline = pending_newline or char == '\n'
+            pending_space = True
+            i += 1
+            continue
+        if char == '/' and source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        if char == '/' and source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            pending_newline = pending_newline or '\n' in source[i:end]
+            pending_space = True
+            i = end
+            continue
+
+        if pending_newline and out:
+            out.append('\n')
+        elif pending_space and out:
+            previous = last()
+            # Keep the spaces that separate words, and "a + +b" / "a - -b"
+            if (_is_word(previous) and _is_word(char)) or (previous in '+-' and char in '+-'):
+                out.append(' ')
+        pending_space = pending_newline = False
+
+        if char in '"\'`':
+            end = _skip_quoted(source, i, char)
+            out.append(source[i:end])
+            i = end
+            continue
+        if char == '/':
+            tail = ''.join(out[-3:])[-12:].rstrip()
+            # After a postfix "a++" / "a--" it's a division, after any other operator a regex
+            postfix = tail.endswith(('++', '--'))
+            if not tail or (tail[-1] in '(,=:[!&|?{};+-*%<>~^' and not postfix) or REGEX_KEYWORDS.search(tail):
+                end = _skip_regex(source, i)
+                out.append(source[i:end])
+                i = end
+                continue
+        out.append(char)
+        i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """Drop comments and whitespace around punctuation, leaving strings alone"""
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+    out = []
+    i, n = 0, len(source)
+    pending_space = False
+    while i < n:
+        char = source[i]
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            pending_space = True
+            continue
+        if char.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if pending_space and out and out[-1][-1] not in '{};,>' and char not in '{};,>':
+            # Spaces before ":" matter in selectors ("a :hover"), so only "{};,>" drop them
+            out.append(' ')
+        pending_space = False
+        if char in '"\'':
+            end = _skip_quoted(source, i, char)
+            out.append(source[i:end])
+            i = end
+            continue
+        if char == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(char)
+        i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def rebase_css_urls(css, source_dir, output_dir):
+    """Rewrite relative url(...) references so they still resolve from the output folder"""
+    def rebase(match):
+        quote, url = match.groups()
+        if not is_local(url) or url.startswith('#'):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(target, output_dir)}{quote})'
+    return CSS_URL.sub(rebase, css)
+
+
+def find_runs(html, pattern):
+    """[(start, end, [urls])] for runs of consecutive local tags matching pattern"""
+    runs = []
+    for match in pattern.finditer(html):
+        url = match.group(1)
+        if not is_local(url):
+            continue
+        if runs and BETWEEN_TAGS.match(html[runs[-1][1]:match.start()]):
+            start, _, urls = runs[-1]
+            runs[-1] = (start, match.end(), urls + [url])
+        else:
+            runs.append((match.start(), match.end(), [url]))
+    return runs
+
+
+class AssetBuilder:
+    """Builds bundles for the pages under `root` and keeps them current"""
+
+    def __init__(self, root, dist_dir='dist', minify=True, recheck_s=1.0):
+        self.root = root
+        self.dist = dist_dir.strip('/')
+        self.minify = minify
+        self.recheck_s = float(recheck_s)
+        self._lock = threading.Lock()
+        # One build at a time; held while the first request loads or builds the manifest
+        self._build_lock = threading.Lock()
+        self._manifest = None
+        self._failed = False
+        self._checked_at = 0.0
+        self._builds = 0
+        self._build_ms = 0.0
+
+    def _path(self, relative):
+        return os.path.join(self.root, *relative.split('/'))
+
+    def _mtime(self, relative):
+        try:
+            return os.stat(self._path(relative)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _pages(self):
+        return sorted(name for name in os.listdir(self.root) if name.endswith('.html'))
+
+    def _write(self, relative, text):
+        path = self._path(relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(text)
+        os.replace(temporary, path)
+
+    def _bundle(self, urls, kind, outputs):
+        """Write one minified, hashed file for `urls` (page-relative); returns its path"""
+        parts = []
+        for url in urls:
+            with open(self._path(url), 'r', encoding='utf-8-sig') as f:
+                text = f.read()
+            if kind == 'css':
+                text = rebase_css_urls(text, posixpath.dirname(url), self.dist)
+                parts.append(minify_css(text) if self.minify else text)
+            else:
+                parts.append(minify_js(text) if self.minify else text)
+        # ";" keeps a script without a trailing semicolon from running into the next one
+        body = (';\n' if kind == 'js' else '\n').join(part.rstrip() for part in parts) + '\n'
+        digest = hashlib.blake2b(body.encode('utf-8'), digest_size=4).hexdigest()
+        name = '-'.join(posixpath.splitext(posixpath.basename(url))[0] for url in urls)
+        relative = f'{self.dist}/{name}.{digest}.{kind}'
+        if relative not in outputs:
+            outputs[relative] = {"sources": urls, "bytes": len(body.encode('utf-8')),
+                                 "source_bytes": sum(os.path.getsize(self._path(url)) for url in urls)}
+            if not os.path.exists(self._path(relative)):
+                self._write(relative, body)
+        return relative
+
+    def build(self):
+        """Bundle every page; returns the manifest"""
+        started = time.perf_counter()
+        pages, outputs = {}, {}
+        for page in self._pages():
+            with open(self._path(page), 'r', encoding='utf-8-sig') as f:
+                html = f.read()
+            sources = {page: self._mtime(page)}
+            replacements = []
+            for pattern, kind in ((STYLESHEET_TAG, 'css'), (SCRIPT_TAG, 'js')):
+                for start, end, urls in find_runs(html, pattern):
+                    if not all(os.path.isfile(self._path(url)) for url in urls):
+                        continue
+                    bundle = self._bundle(urls, kind, outputs)
+                    sources.update((url, self._mtime(url)) for url in urls)
+                    tag = f'<link rel="stylesheet" href="{bundle}">' if kind == 'css' else f'<script src="{bundle}"></script>'
+                    replacements.append((start, end, tag, len(urls)))
+            if not replacements:
+                continue
+            for start, end, tag, _ in sorted(replacements, reverse=True):
+                html = html[:start] + tag + html[end:]
+            built = f'{self.dist}/pages/{page}'
+            self._write(built, html)
+            requests_before = sum(count for *_, count in replacements)
+            pages[page] = {"built": built, "sources": sources,
+                           "requests_before": requests_before, "requests_after": len(replacements)}
+
+        manifest = {"built_at": time.time(), "minified": self.minify, "pages": pages, "files": outputs}
+        self._write(f'{self.dist}/{MANIFEST_NAME}', json.dumps(manifest, indent=2))
+        self._remove_stale(outputs, pages)
+        with self._lock:
+            self._manifest = manifest
+            self._checked_at = time.monotonic()
+            self._builds += 1
+            self._build_ms = (time.perf_counter() - started) * 1000.0
+        return manifest
+
+    def _remove_stale(self, outputs, pages):
+        """Delete bundles from earlier builds that nothing references any more"""
+        keep = set(outputs) | {entry["built"] for entry in pages.values()} | {f'{self.dist}/{MANIFEST_NAME}'}
+        for directory, _, files in os.walk(self._path(self.dist)):
+            for name in files:
+                relative = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                if relative not in keep and not name.endswith('.tmp'):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+
+    def _stale(self, manifest):
+        """True when a source changed or a built file is gone since `manifest` was written"""
+        outputs = list(manifest["files"]) + [entry["built"] for entry in manifest["pages"].values()]
+        return (any(self._mtime(source) != mtime
+                    for entry in manifest["pages"].values() for source, mtime in entry["sources"].items())
+                or any(self._mtime(output) is None for output in outputs))
+
+    def _read_manifest(self):
+        try:
+            with open(self._path(f'{self.dist}/{MANIFEST_NAME}'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("minified") == self.minify else None
+
+    def _rebuild(self, reason):
+        """Build under the build lock; None (serve pages unbundled from now on) if that fails"""
+        try:
+            manifest = self.build()
+            print(f"📦 Bundled {len(manifest['files'])} CSS / JS files for {len(manifest['pages'])} pages ({reason})")
+            return manifest
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"⚠️ Asset bundling failed, serving unbundled pages: {e}")
+            with self._lock:
+                self._manifest = None
+                self._failed = True
+            return None
+
+    def _ensure(self):
+        """The manifest in use: the one in dist/ if still current, else a fresh build"""
+        with self._build_lock:
+            with self._lock:
+                if self._manifest is not None or self._failed:
+                    return self._manifest
+            manifest = self._read_manifest()
+            if manifest is None or self._stale(manifest):
+                return self._rebuild(f"no current build in {self.dist}/")
+            with self._lock:
+                self._manifest = manifest
+                self._checked_at = time.monotonic()
+            return manifest
+
+    def invalidate(self):
+        """Recheck the sources on the next page request (e.g. a built file went missing)"""
+        with self._lock:
+            self._checked_at = 0.0
+
+    def page(self, filename):
+        """Repo-relative path of the bundled copy of a page, or None to serve the page as-is"""
+        manifest = self._ensure()
+        if manifest is None:
+            return None
+        with self._lock:
+            recheck = time.monotonic() - self._checked_at >= self.recheck_s
+            if recheck:
+                self._checked_at = time.monotonic()
+        if recheck and self._stale(manifest):
+            with self._build_lock:
+                # Another request may have rebuilt while this one waited
+                with self._lock:
+                    manifest = self._manifest
+                if manifest is not None and self._stale(manifest):
+                    manifest = self._rebuild("sources changed")
+            if manifest is None:
+                return None
+        entry = manifest["pages"].get(filename)
+        return entry["built"] if entry else None
+
+    def stats(self):
+        with self._lock:
+            manifest = self._manifest
+            if manifest is None:
+                return {"enabled": False}
+            return {
+                "enabled": True,
+                "pages": len(manifest["pages"]),
+                "bundles": len(manifest["files"]),
+                "builds": self._builds,
+                "last_build_ms": round(self._build_ms, 1),
+                "bytes": sum(entry["bytes"] for entry in manifest["files"].values()),
+                "source_bytes": sum(entry["source_bytes"] for entry in manifest["files"].values())
+            }
+
+
+asset_builder = AssetBuilder(ROOT_DIR, config.ASSET_DIST_DIR, config.ASSET_MINIFY, config.STATIC_RECHECK_S)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--no-minify', action='store_true', help="Concatenate and hash only")
+    parser.add_argument('--check', action='store_true', help="Exit with status 1 if a bundle would change")
+    args = parser.parse_args()
+
+    asset_builder.minify = not args.no_minify
+    previous = None
+    manifest_path = os.path.join(ROOT_DIR, config.ASSET_DIST_DIR, MANIFEST_NAME)
+    if args.check and os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = set(json.load(f)["files"])
+
+    manifest = asset_builder.build()
+    print(f"{'page':<22}{'requests':>10}")
+    for page, entry in manifest["pages"].items():
+        print(f"{page:<22}{entry['requests_before']:>5} -> {entry['requests_after']}")
+    print(f"\n{'bundle':<44}{'source':>9}{'built':>9}")
+    for name, entry in manifest["files"].items():
+        print(f"{name:<44}{entry['source_bytes']:>9}{entry['bytes']:>9}")
+    print(f"\n✅ {asset_builder.stats()}")
+    if args.check and previous is not None and previous != set(manifest["files"]):
+        print("❌ Bundles were out of date")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Micro-batching scheduler for YOLO inference.
+
+Concurrent /detect requests hand their decoded frames to background
+dispatcher threads. A dispatcher waits a few milliseconds for more frames to
+arrive, runs them through the model in one batched call and hands each
+request its own result back. With a process-pool engine there is one
+dispatcher per worker process so batches run in parallel.
+
+Frames are submitted with a group key (the request's inference options):
+only frames of the same group share a batch, and the group whose oldest
+frame has waited longest runs next. A frame whose caller has already timed
+out is dropped from the queue instead of being sent to the model.
+"""
+import threading
+import time
+from collections import deque
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler already holds the maximum number of frames"""
+
+
+class _PendingFrame:
+    __slots__ = ('image', 'group', 'done', 'result', 'error', 'enqueued_at', 'deadline')
+
+    def __init__(self, image, group, timeout=None):
+        self.image = image
+        self.group = group
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.perf_counter()
+        # When the caller stops waiting; None waits forever
+        self.deadline = self.enqueued_at + timeout if timeout is not None else None
+
+
+class BatchScheduler:
+    """Collects frames from many threads and runs them through the model in batches"""
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10, max_queue_depth=64, concurrency=1):
+        # run_batch takes a list of images and their group key, and returns one result per image
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue_depth = max(1, int(max_queue_depth))
+
+        self._changed = threading.Condition()
+        self._groups = {}  # group key -> deque of waiting frames, oldest first
+        self._depth = 0
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._rejected = 0
+        self._expired = 0
+        self._errors = 0
+        self._max_batch_seen = 0
+        self._total_inference_s = 0.0
+        self._total_wait_s = 0.0
+        # Latency of the first real batch, to compare against the steady-state average
+        self._first_batch_ms = None
+
+        self._workers = []
+        for index in range(max(1, int(concurrency))):
+            worker = threading.Thread(target=self._run, name=f'detect-batcher-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, image, timeout=None, group=None):
+        """Queue one frame and block until its result is ready"""
+        pending = _PendingFrame(image, group, timeout)
+        with self._changed:
+            if self._depth >= self.max_queue_depth:
+                with self._stats_lock:
+                    self._rejected += 1
+                raise QueueFullError(f"Detection queue is full ({self.max_queue_depth} frames waiting)")
+            self._groups.setdefault(group, deque()).append(pending)
+            self._depth += 1
+            # Wake idle dispatchers and any dispatcher still collecting this group's batch
+            self._changed.notify_all()
+
+        if not pending.done.wait(timeout):
+            self._withdraw(pending)
+            raise TimeoutError("Timed out waiting for detection result")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _withdraw(self, pending):
+        """Take a timed-out frame out of the queue if no dispatcher has picked it up yet"""
+        with self._changed:
+            frames = self._groups.get(pending.group)
+            if frames is None or pending not in frames:
+                return
+            frames.remove(pending)
+            self._depth -= 1
+            if not frames:
+                del self._groups[pending.group]
+        with self._stats_lock:
+            self._expired += 1
+
+    def _take(self, group, batch):
+        frames = self._groups.get(group)
+        now = time.perf_counter()
+        expired = 0
+        while frames and len(batch) < self.max_batch_size:
+            item = frames.popleft()
+            self._depth -= 1
+            if item.deadline is not None and now >= item.deadline:
+                # Its caller is timing out right now; the model would work for nobody
+                expired += 1
+                continue
+            batch.append(item)
+        if frames is not None and not frames:
+            del self._groups[group]
+        if expired:
+            with self._stats_lock:
+                self._expired += expired
+
+    def _collect_batch(self):
+        with self._changed:
+            batch = []
+            while not batch:
+                self._changed.wait_for(lambda: self._depth > 0)
+                group = min(self._groups, key=lambda g: self._groups[g][0].enqueued_at)
+                self._take(group, batch)
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+                self._take(group, batch)
+        return group, batch
+
+    def _run(self):
+        while True:
+            group, batch = self._collect_batch()
+            started = time.perf_counter()
+            try:
+                results = self.run_batch([item.image for item in batch], group)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Model returned {len(results)} results for {len(batch)} frames")
+                for item, result in zip(batch, results):
+                    item.result = result
+            except Exception as e:
+                print(f"❌ Batch inference error: {e}")
+                for item in batch:
+                    item.error = e
+                with self._stats_lock:
+                    self._errors += 1
+            elapsed = time.perf_counter() - started
+
+            with self._stats_lock:
+                self._batches += 1
+                self._frames += len(batch)
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+                self._total_inference_s += elapsed
+                self._total_wait_s += sum(started - item.enqueued_at for item in batch)
+                if self._first_batch_ms is None:
+                    self._first_batch_ms = elapsed * 1000.0
+
+            for item in batch:
+                item.done.set()
+
+    def stats(self):
+        """Snapshot of batching configuration and counters for the metrics endpoint"""
+        with self._stats_lock:
+            batches = self._batches
+            frames = self._frames
+            return {
+                "config": {
+                    "max_batch_size": self.max_batch_size,
+                    "max_wait_ms": self.max_wait * 1000.0,
+                    "max_queue_depth": self.max_queue_depth,
+                    "dispatchers": len(self._workers)
+                },
+                "queue_depth": self._depth,
+                "batches": batches,
+                "frames": frames,
+                "rejected": self._rejected,
+                "expired": self._expired,
+                "errors": self._errors,
+                "avg_batch_size": frames / batches if batches else 0.0,
+                "max_batch_size_seen": self._max_batch_seen,
+                "first_batch_ms": self._first_batch_ms,
+                "avg_inference_ms": self._total_inference_s * 1000.0 / batches if batches else 0.0,
+                "avg_queue_wait_ms": self._total_wait_s * 1000.0 / frames if frames else 0.0
+            }
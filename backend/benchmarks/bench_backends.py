@@ -0,0 +1,64 @@
+"""Benchmark every available inference backend and check parity with PyTorch.
+
+Usage:
+    python backend/benchmarks/bench_backends.py [--weights yolov8n.pt] [--runs 20] [--images DIR] [--quantized]
+
+Exits with status 1 if any backend's detections differ from PyTorch by more
+than the tolerance, so it can gate a deployment that switches runtimes.
+"""
+import argparse
+import glob
+import os
+import sys
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config  # noqa: E402
+from inference_backends import BACKENDS, TorchBackend, benchmark, compare_results, sample_frames  # noqa: E402
+
+
+def load_images(directory, limit=8):
+    paths = sorted(glob.glob(os.path.join(directory, '*.jpg')) + glob.glob(os.path.join(directory, '*.png')))
+    return [img for img in (cv2.imread(p) for p in paths[:limit]) if img is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default=config.DETECT_MODEL)
+    parser.add_argument('--imgsz', type=int, default=config.DETECT_IMGSZ)
+    parser.add_argument('--conf', type=float, default=config.DETECT_CONF)
+    parser.add_argument('--tolerance', type=float, default=config.DETECT_PARITY_TOLERANCE)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--images', help="Folder of sample frames (defaults to ultralytics' bundled photos)")
+    parser.add_argument('--quantized', action='store_true', help="Also include the opt-in INT8/FP16 backends")
+    args = parser.parse_args()
+
+    frames = load_images(args.images) if args.images else sample_frames(args.imgsz)
+    if not frames:
+        print(f"❌ No images found in {args.images}")
+        return 1
+
+    reference = TorchBackend(args.weights, args.imgsz).load()
+    reference_results = reference(frames, conf=args.conf)
+
+    failed = False
+    print(f"\n{'backend':<10}{'ms/frame':>10}  parity")
+    for name, backend_cls in BACKENDS.items():
+        if backend_cls.opt_in and not args.quantized:
+            continue
+        if not backend_cls.is_available():
+            print(f"{name:<10}{'-':>10}  skipped ({', '.join(backend_cls.requires)} not installed)")
+            continue
+        backend = reference if name == reference.name else backend_cls(args.weights, args.imgsz).load()
+        problems = compare_results(reference_results, backend(frames, conf=args.conf),
+                                   conf_tolerance=args.tolerance, conf_threshold=args.conf)
+        ms = benchmark(backend, frames, args.runs, conf=args.conf)
+        status = "ok" if not problems else f"FAIL {problems[:3]}"
+        failed = failed or bool(problems)
+        print(f"{name:<10}{ms:>10.1f}  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Aggregate phone-action throughput across N devices: one at a time vs fan-out.
+
+Usage:
+    python backend/benchmarks/bench_devices.py [--actions 20] [--command "input keyevent 0"]
+
+For n = 1..N online devices the same number of actions per device is run
+  * serial  - one device after another, each action waited for (the old
+              single-device code path, scaled up)
+  * fan-out - every action submitted to the per-device job queues at once,
+              the way a broadcast request does it
+and the aggregate actions/s is printed. The default command (KEYCODE_UNKNOWN)
+does nothing visible on the handsets. Works against any adb server given by
+ANDROID_ADB_SERVER_PORT, including the fake one in fake_adb_server.py.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from adb_client import adb  # noqa: E402
+from devices import registry  # noqa: E402
+from phone_jobs import job_queue  # noqa: E402
+
+
+def run_serial(devices, actions, command):
+    started = time.perf_counter()
+    for device in devices:
+        for _ in range(actions):
+            adb.shell(device, command)
+    return time.perf_counter() - started
+
+
+def run_fan_out(devices, actions, command):
+    def action(device):
+        success, stdout, stderr = adb.shell(device, command)
+        return {"success": success, "error": stderr or None}
+
+    started = time.perf_counter()
+    jobs = [job_queue.submit(device, 'bench', lambda d=device: action(d)) for _ in range(actions) for device in devices]
+    for job in jobs:
+        job_queue.wait(job.id)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--actions', type=int, default=20, help="Actions per device")
+    parser.add_argument('--command', default='input keyevent 0')
+    args = parser.parse_args()
+    job_queue.max_queue_depth = max(job_queue.max_queue_depth, args.actions)
+
+    devices = registry.online()
+    if not devices:
+        print("❌ No devices online")
+        return 1
+    print(f"📱 {len(devices)} devices online, {args.actions} actions each\n")
+    print(f"{'devices':>8}{'serial/s':>11}{'fan-out/s':>11}{'speedup':>9}")
+    for n in range(1, len(devices) + 1):
+        subset = devices[:n]
+        total = n * args.actions
+        serial_s = run_serial(subset, args.actions, args.command)
+        fan_out_s = run_fan_out(subset, args.actions, args.command)
+        print(f"{n:>8}{total / serial_s:>11.1f}{total / fan_out_s:>11.1f}{serial_s / fan_out_s:>8.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
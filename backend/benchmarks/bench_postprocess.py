@@ -0,0 +1,139 @@
+"""Post-processing cost per frame: per-box loops vs array-level, on crowded scenes.
+
+Usage:
+    python backend/benchmarks/bench_postprocess.py [--boxes 10 100 300 1000] [--runs 200]
+
+For each box count a synthetic (N, 6) detection array is post-processed
+into the /detect response:
+  * tensor_loop - `for box in result.boxes` with int(box.cls[0]),
+                  float(box.conf[0]) and a names lookup per box, the way
+                  detect_object used to do it (only when torch is installed)
+  * row_loop    - the same per-box loop over the engine's NumPy array
+  * vectorized  - postprocess.select + to_predictions (what /detect runs now)
+  * arrays      - postprocess.select + to_arrays, columns built straight
+                  from the arrays (what /detect?format=arrays runs now)
+Median microseconds per frame are printed, plus the JSON body size and
+json.dumps time of the object form vs the array form.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from postprocess import class_name_array, predictions_to_arrays, select, to_arrays, to_predictions  # noqa: E402
+from preprocess import Preprocessor  # noqa: E402
+
+NAMES = {i: f'class_{i}' for i in range(80)}
+CONF = 0.25
+
+
+def crowded_result(count, imgsz=640, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, imgsz - 40, (count, 2))
+    wh = rng.uniform(8, 120, (count, 2))
+    boxes = np.clip(np.hstack([xy, xy + wh]), 0, imgsz)
+    # Some below the threshold, so the confidence filter has work to do
+    conf = rng.uniform(0.1, 1.0, (count, 1))
+    cls = rng.integers(0, len(NAMES), (count, 1))
+    return np.hstack([boxes, conf, cls]).astype(np.float32)
+
+
+def row_loop(result, frame, names):
+    detections = []
+    original_boxes = frame.to_original(result[:, :4])
+    for row, xyxy in zip(result, original_boxes):
+        confidence = float(row[4])
+        if confidence < CONF:
+            continue
+        detections.append({
+            "class": names[int(row[5])],
+            "confidence": confidence,
+            "box": [round(float(v), 1) for v in xyxy]
+        })
+    detections.sort(key=lambda x: x['confidence'], reverse=True)
+    return detections
+
+
+def tensor_loop(boxes, frame, names):
+    """Per-box access to torch tensors, like iterating ultralytics' Results.boxes"""
+    xyxy, conf, cls = boxes
+    detections = []
+    for i in range(len(conf)):
+        confidence = float(conf[i:i + 1][0])
+        if confidence < CONF:
+            continue
+        box = frame.to_original(xyxy[i:i + 1].cpu().numpy())[0]
+        detections.append({
+            "class": names[int(cls[i:i + 1][0])],
+            "confidence": confidence,
+            "box": [round(float(v), 1) for v in box]
+        })
+    detections.sort(key=lambda x: x['confidence'], reverse=True)
+    return detections
+
+
+def vectorized(result, frame, class_names):
+    rows = result[select(result, CONF)]
+    return to_predictions(class_names, rows[:, 5].astype(np.intp), rows[:, 4], frame.to_original(rows[:, :4]))
+
+
+def columns(result, frame, class_names):
+    rows = result[select(result, CONF)]
+    return to_arrays(class_names, rows[:, 5].astype(np.intp), rows[:, 4], frame.to_original(rows[:, :4]))
+
+
+def median_us(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--boxes', type=int, nargs='+', default=[10, 100, 300, 1000])
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    preprocessor = Preprocessor(imgsz=640)
+    frame = preprocessor.letterbox(np.zeros((720, 1280, 3), np.uint8), 1280, 720)
+    class_names = class_name_array(NAMES)
+    torch = None
+    if importlib.util.find_spec('torch') is not None:
+        import torch
+
+    print(f"{'boxes':>6}{'tensor_loop':>13}{'row_loop':>10}{'vectorized':>12}{'arrays':>9}{'speedup':>9}"
+          f"{'json obj':>15}{'json arrays':>15}")
+    for count in args.boxes:
+        result = crowded_result(count)
+        assert row_loop(result, frame, NAMES) == vectorized(result, frame, class_names)
+        assert predictions_to_arrays(vectorized(result, frame, class_names)) == columns(result, frame, class_names)
+        tensor_us = '-'
+        if torch is not None:
+            tensors = tuple(torch.from_numpy(a.copy()) for a in (result[:, :4], result[:, 4], result[:, 5]))
+            tensor_us = f'{median_us(lambda: tensor_loop(tensors, frame, NAMES), args.runs):.0f}'
+        row_us = median_us(lambda: row_loop(result, frame, NAMES), args.runs)
+        vector_us = median_us(lambda: vectorized(result, frame, class_names), args.runs)
+        arrays_us = median_us(lambda: columns(result, frame, class_names), args.runs)
+
+        predictions = vectorized(result, frame, class_names)
+        objects_json, arrays_json = {"predictions": predictions}, columns(result, frame, class_names)
+        objects_dump = median_us(lambda: json.dumps(objects_json), args.runs)
+        arrays_dump = median_us(lambda: json.dumps(arrays_json), args.runs)
+        objects_size, arrays_size = len(json.dumps(objects_json)), len(json.dumps(arrays_json))
+        print(f"{count:>6}{tensor_us:>13}{row_us:>10.0f}{vector_us:>12.0f}{arrays_us:>9.0f}{row_us / vector_us:>8.1f}x"
+              f"{f'{objects_size / 1024:.1f}K/{objects_dump:.0f}us':>15}{f'{arrays_size / 1024:.1f}K/{arrays_dump:.0f}us':>15}")
+    print("\n(us = median microseconds per frame; speedup = row_loop / vectorized)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Requests/s of the Flask development server vs serve.py (waitress / gunicorn).
+
+Usage:
+    python backend/benchmarks/bench_serving.py [--app app] [--clients 16] [--duration 10]
+        [--paths / /css/style.css /api/phone/status] [--servers dev waitress gunicorn]
+
+Each server is started in its own process on a free port:
+  * dev      - app.run(threaded=True, debug=False), i.e. `python app.py`
+               without the reloader
+  * waitress - serve.py --server waitress --threads SERVE_THREADS
+  * gunicorn - serve.py --server gunicorn (1 worker, gthread)
+Then --clients threads, each holding one keep-alive connection, fetch the
+paths in turn for --duration seconds. RPS and p50 / p99 latency are printed
+per server. Every HTTP answer counts as served (/api/phone/status is a 500
+with no phone attached); errors are failed or dropped connections. Servers
+that aren't installed are skipped. Backends with /api/ready are measured
+once the model has finished loading.
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, app, port):
+    env = dict(os.environ, PORT=str(port), PYTHONUNBUFFERED='1')
+    if kind == 'dev':
+        command = [sys.executable, '-c',
+                   f'import {app}; {app}.adb.start(); '
+                   f'getattr({app}, "model_loader", None) and {app}.model_loader.start(); '
+                   f'{app}.app.run(host="127.0.0.1", port={port}, threaded=True, debug=False)']
+    else:
+        command = [sys.executable, os.path.join(BACKEND_DIR, 'serve.py'), '--app', app,
+                   '--server', kind, '--host', '127.0.0.1', '--port', str(port), '--workers', '1']
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def get(port, path, timeout=2.0):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def wait_ready(port, timeout_s=180.0):
+    """Wait until the server answers, then until the model (if any) has finished loading"""
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            status = get(port, '/api/ready')
+            if status != 503:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def client(port, paths, stop_at, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    i = 0
+    while time.perf_counter() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            if response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.close()
+
+
+def measure(port, paths, clients, duration_s):
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + duration_s
+    threads = [threading.Thread(target=client, args=(port, paths, stop_at, latencies, errors))
+               for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='app', choices=['app', 'app_voice_only', 'app_clean', 'server'])
+    parser.add_argument('--servers', nargs='+', default=['dev', 'waitress', 'gunicorn'],
+                        choices=['dev', 'waitress', 'gunicorn'])
+    parser.add_argument('--paths', nargs='+', default=['/', '/css/style.css', '/api/phone/status'])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"🔥 {args.app}: {args.clients} keep-alive clients x {args.duration:g}s over {', '.join(args.paths)}\n")
+    print(f"{'server':<10}{'requests':>10}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for kind in args.servers:
+        if kind != 'dev' and importlib.util.find_spec(kind) is None:
+            print(f"{kind:<10}  not installed (pip install {kind})")
+            continue
+        port = free_port()
+        process = start_server(kind, args.app, port)
+        try:
+            if not wait_ready(port):
+                print(f"{kind:<10}  did not start")
+                continue
+            latencies, errors = measure(port, args.paths, args.clients, args.duration)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        if not latencies:
+            print(f"{kind:<10}  no successful requests ({len(errors)} errors)")
+            continue
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{kind:<10}{len(latencies):>10}{len(latencies) / args.duration:>9.0f}{p50:>9.2f}{p99:>9.2f}{len(errors):>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""End-to-end SMS latency: one adb process per step vs a pooled shell session.
+
+Usage:
+    python backend/benchmarks/bench_sms.py 5551234567 [--serial emulator-5554] [--runs 5]
+
+  * legacy  - the old sequence: five `adb -s <serial> shell ...` processes with
+              the fixed 1.5 / 0.5 / 0.5 / 0.3 s sleeps between them
+  * session - adb_shell.send_sms: one pooled `exec:sh` session, focus polling
+              instead of sleeps, keys sent in one round trip
+
+This really sends messages, so point it at a test handset or emulator.
+It also works against any adb server given by ANDROID_ADB_SERVER_PORT.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import adb_commands  # noqa: E402
+import adb_shell  # noqa: E402
+from adb_client import adb  # noqa: E402
+
+
+def legacy_send(serial, number, message):
+    def shell(template, timeout=5, **params):
+        # The same quoted command lines send_sms writes to its session
+        subprocess.run([*adb_commands.device_prefix(serial), template.shell_command(**params)],
+                       capture_output=True, timeout=timeout)
+
+    shell(adb_commands.OPEN_SMS, number=number)
+    time.sleep(1.5)
+    shell(adb_commands.KEYEVENT, timeout=2, code=adb_commands.KEY_DEL)
+    time.sleep(0.5)
+    shell(adb_commands.INPUT_TEXT, text=adb_commands.input_text(message))
+    time.sleep(0.5)
+    shell(adb_commands.KEYEVENT, timeout=2, code=adb_commands.KEY_TAB)
+    time.sleep(0.3)
+    shell(adb_commands.KEYEVENT, timeout=2, code=adb_commands.KEY_ENTER)
+    return True
+
+
+def session_send(serial, number, message):
+    return adb_shell.send_sms(serial, number, message)
+
+
+def measure(name, send, serial, number, runs):
+    samples, failures = [], 0
+    for i in range(runs):
+        started = time.perf_counter()
+        if not send(serial, number, f"benchmark message {i + 1}"):
+            failures += 1
+        samples.append((time.perf_counter() - started) * 1000.0)
+        # Let the messaging app settle before the next send
+        time.sleep(1.0)
+    samples.sort()
+    print(f"{name:<8} p50 {samples[len(samples) // 2]:8.0f} ms   max {samples[-1]:8.0f} ms   failures {failures}/{runs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('number', help="Phone number the test messages go to")
+    parser.add_argument('--serial', help="Device serial (first online device if omitted)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modes', nargs='+', default=['legacy', 'session'], choices=['legacy', 'session'])
+    args = parser.parse_args()
+
+    serial = args.serial or adb.get_connected_device()
+    if not serial:
+        print("❌ No device connected")
+        return 1
+    print(f"📱 {serial}, {args.runs} messages per mode\n")
+    senders = {'legacy': legacy_send, 'session': session_send}
+    for mode in args.modes:
+        measure(mode, senders[mode], serial, args.number, args.runs)
+    print(f"\nsessions: {adb_shell.session_pool.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Per-command overhead: shell=True command line vs argv list vs adb server socket.
+
+Usage:
+    python backend/benchmarks/bench_spawn.py [--serial emulator-5554] [--runs 50] [--binary true]
+
+Each mode runs the same harmless command (`input keyevent 0`) --runs times:
+  * shell  - f-string command line through subprocess with shell=True (the
+             old execute_adb_command / server.py path: /bin/sh, then adb)
+  * argv   - adb_commands.KEYEVENT.argv(...) through subprocess, no shell
+  * socket - adb_commands.KEYEVENT.shell_command(...) sent to the adb server
+             (adb_client), no local process at all
+and p50 / p95 per command are printed, plus the cost of building the command.
+
+--binary swaps `adb` for another program (e.g. `true`) to measure only the
+local fork/exec cost with no device attached; the socket mode is skipped
+then. Works against any adb server given by ANDROID_ADB_SERVER_PORT.
+"""
+import argparse
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import adb_commands  # noqa: E402
+from adb_client import adb  # noqa: E402
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def measure(name, run, runs):
+    run()  # first call pays for imports / connection setup
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    p50, p95 = percentiles(samples)
+    print(f"{name:<8} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--serial', help="Device serial (first online device if omitted)")
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--binary', default='adb', help="Program to spawn instead of adb (e.g. true)")
+    args = parser.parse_args()
+
+    serial = args.serial or (adb.get_connected_device() if args.binary == 'adb' else 'bench-device')
+    if not serial:
+        print("❌ No device connected (use --binary true to measure spawn cost only)")
+        return 1
+    print(f"📱 {serial} via {args.binary}, {args.runs} runs per mode\n")
+
+    argv = adb_commands.KEYEVENT.argv(serial, code=0)
+    argv[0] = args.binary
+    command_line = ' '.join(shlex.quote(arg) for arg in argv)
+    remote = adb_commands.KEYEVENT.shell_command(code=0)
+
+    p50 = {}
+    if shutil.which(args.binary):
+        p50['shell'] = measure('shell', lambda: subprocess.run(command_line, shell=True, capture_output=True), args.runs)
+        p50['argv'] = measure('argv', lambda: subprocess.run(argv, capture_output=True), args.runs)
+    else:
+        print(f"⚠️ {args.binary} is not on PATH, skipping the shell and argv modes")
+    if args.binary == 'adb':
+        p50['socket'] = measure('socket', lambda: adb.shell(serial, remote), args.runs)
+    if 'shell' in p50:
+        for mode in ('argv', 'socket'):
+            if mode in p50:
+                print(f"{mode} saves {p50['shell'] - p50[mode]:.2f} ms per command over shell=True")
+
+    # Building the command is noise next to spawning it, but check it stays that way
+    started = time.perf_counter()
+    for _ in range(10000):
+        adb_commands.CALL.argv(serial, number='5551234567')
+    print(f"template build: {(time.perf_counter() - started) * 100:.2f} µs per command")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Startup benchmark: import time, time-to-first-response and time-to-ready.
+
+Usage:
+    python backend/benchmarks/bench_startup.py [--script backend/app.py] [--runs 3]
+
+Starts the backend on a free port and records, from process launch:
+  * first_response_s - first answer from GET /
+  * ready_s          - /api/ready returning 200 (model loaded)
+  * first_detect_s   - first successful POST /detect
+Also reports how long `import app` takes on its own.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(url, data=None, content_type=None, timeout=2.0):
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': content_type} if content_type else {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None
+
+
+def tiny_jpeg():
+    import cv2
+    import numpy as np
+    return cv2.imencode('.jpg', np.full((480, 640, 3), 127, np.uint8))[1].tobytes()
+
+
+def measure_import(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    try:
+        return float(out.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+
+
+def measure_startup(script, timeout):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PORT=str(port))
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, script], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=(os.name == 'posix'))
+    timings = {"first_response_s": None, "ready_s": None, "first_detect_s": None}
+    jpeg = tiny_jpeg()
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline and proc.poll() is None:
+            elapsed = time.perf_counter() - started
+            if timings["first_response_s"] is None:
+                if request(base + '/') is not None:
+                    timings["first_response_s"] = elapsed
+            elif timings["ready_s"] is None:
+                if request(base + '/api/ready') == 200:
+                    timings["ready_s"] = elapsed
+            elif request(base + '/detect', jpeg, 'image/jpeg', timeout=30) == 200:
+                timings["first_detect_s"] = time.perf_counter() - started
+                break
+            time.sleep(0.02)
+    finally:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+        proc.wait(timeout=10)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--script', default=os.path.join(BACKEND_DIR, 'app.py'))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    module = os.path.splitext(os.path.basename(args.script))[0]
+    print(f"📦 import {module}: {measure_import(module):.3f}s")
+    runs = []
+    for i in range(args.runs):
+        timings = measure_startup(args.script, args.timeout)
+        runs.append(timings)
+        print(f"run {i + 1}: " + json.dumps({k: round(v, 3) if v is not None else None for k, v in timings.items()}))
+    for key in runs[0]:
+        values = sorted(r[key] for r in runs if r[key] is not None)
+        if values:
+            print(f"{key:<18} median {values[len(values) // 2]:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
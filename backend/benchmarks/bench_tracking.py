@@ -0,0 +1,133 @@
+"""CPU saved by tracking between keyframes instead of running YOLO on every frame.
+
+Usage:
+    python backend/benchmarks/bench_tracking.py [--video clip.mp4] [--frames 300]
+        [--every 2 5 10] [--motion 8]
+
+Plays the same frame sequence through DetectionPipeline.detect() as one
+client, once with tracking off and once per --every value. For each pass it
+prints how many frames ran YOLO, process CPU time (all threads, including
+the model's), wall time per frame, and the average cost of a tracked frame
+vs a detected one. It also prints how closely the tracked boxes follow what
+YOLO finds on those same frames: the mean IoU against the tracking-off pass,
+matched by class.
+
+Without --video a synthetic handheld-camera clip is generated: a textured
+scene with two objects, a few pixels of shake per frame, a slow pan, and a
+scene change every 63 frames (off the keyframe interval, so the motion check
+has to catch it). For realistic IoU numbers, use a clip the model recognises
+objects in. The result cache and near-duplicate reuse are switched off so
+only the tracker is measured.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+os.environ['DETECT_CACHE_ENTRIES'] = '0'
+os.environ['DETECT_DEDUP_MAX_AGE_S'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config  # noqa: E402
+from detection import DetectionPipeline  # noqa: E402
+from frame_tracker import FrameTracker, box_iou  # noqa: E402
+
+
+def synthetic_clip(count, width=1280, height=720, scene_every=63):
+    rng = np.random.default_rng(0)
+    frames = []
+    for start in range(0, count, scene_every):
+        # Oversized scene so the pan and shake never show an edge
+        scene = cv2.GaussianBlur(rng.integers(0, 255, (height + 200, width + 200, 3), dtype=np.uint8), (9, 9), 0)
+        for _ in range(2):
+            x, y = rng.integers(150, width - 300), rng.integers(150, height - 250)
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.rectangle(scene, (x, y), (x + 250, y + 200), color, -1)
+        for i in range(min(scene_every, count - start)):
+            jx, jy = rng.integers(-3, 4, 2)
+            ox, oy = 100 + i // 2 + jx, 100 + jy
+            frame = scene[oy:oy + height, ox:ox + width]
+            frames.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return frames
+
+
+def video_clip(path, count):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    capture.release()
+    return frames
+
+
+def run_pass(pipeline, frames, client_id):
+    results, timings = [], {True: [], False: []}
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for jpeg in frames:
+        started = time.perf_counter()
+        result = pipeline.detect(jpeg, client_id)
+        timings[bool(result.get("tracked"))].append((time.perf_counter() - started) * 1000.0)
+        results.append(result)
+    return results, time.process_time() - cpu_started, time.perf_counter() - wall_started, timings
+
+
+def average(values):
+    return f'{sum(values) / len(values):.2f}' if values else '-'
+
+
+def mean_iou(tracked, reference):
+    """Mean best same-class IoU of tracked boxes against YOLO's boxes for the same frames"""
+    scores = []
+    for result, truth in zip(tracked, reference):
+        if not result.get("tracked"):
+            continue
+        for box in result["predictions"]:
+            candidates = [box_iou(box["box"], t["box"]) for t in truth["predictions"] if t["class"] == box["class"]]
+            scores.append(max(candidates, default=0.0))
+    return sum(scores) / len(scores) if scores else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--video', help="Clip to read with cv2.VideoCapture instead of the synthetic one")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--every', type=int, nargs='+', default=[2, 5, 10])
+    parser.add_argument('--motion', type=float, default=config.DETECT_TRACK_MOTION)
+    args = parser.parse_args()
+
+    frames = video_clip(args.video, args.frames) if args.video else synthetic_clip(args.frames)
+    pipeline = DetectionPipeline()
+    try:
+        print(f"🎞️ {len(frames)} frames, backend {pipeline.engine.stats().get('backend', '?')}\n")
+        print(f"{'every':<8}{'YOLO frames':>12}{'CPU s':>9}{'saved':>8}{'ms/frame':>10}"
+              f"{'ms YOLO':>9}{'ms tracked':>11}{'track IoU':>11}")
+
+        pipeline.tracker = FrameTracker(every=0)
+        reference, base_cpu, base_wall, timings = run_pass(pipeline, frames, 'bench-off')
+        print(f"{'off':<8}{len(frames):>12}{base_cpu:>9.2f}{'':>8}{base_wall / len(frames) * 1000:>10.2f}"
+              f"{average(timings[False]):>9}{'':>11}{'':>11}")
+
+        for every in args.every:
+            pipeline.tracker = FrameTracker(every=every, motion_threshold=args.motion,
+                                            max_shift=config.DETECT_TRACK_MAX_SHIFT,
+                                            max_age_s=config.DETECT_TRACK_MAX_AGE_S,
+                                            iou_threshold=config.DETECT_TRACK_IOU)
+            results, cpu, wall, timings = run_pass(pipeline, frames, f'bench-{every}')
+            detected = sum(1 for r in results if not r.get("tracked"))
+            iou = mean_iou(results, reference)
+            saved = (1 - cpu / base_cpu) * 100 if base_cpu else 0.0
+            print(f"{every:<8}{detected:>12}{cpu:>9.2f}{saved:>7.0f}%{wall / len(frames) * 1000:>10.2f}"
+                  f"{average(timings[False]):>9}{average(timings[True]):>11}{'-' if iou is None else f'{iou:.2f}':>11}")
+            print(f"{'':<8}keyframes: {pipeline.tracker.stats()['keyframes']}")
+    finally:
+        pipeline.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Compare /detect upload formats: bytes on the wire and server-side decode time.
+
+Usage:
+    python backend/benchmarks/bench_upload.py [image.jpg] [--runs 200]
+
+Without an image a synthetic 1280x720 camera-like frame is encoded at JPEG
+quality 90, matching what scanner.js captures.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from imaging import decode_image_bytes, read_request_image_bytes  # noqa: E402
+
+
+def synthetic_jpeg(width=1280, height=720, quality=90):
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.dstack([x + 0 * y, y + 0 * x, (x + y) / 2]).astype(np.uint8)
+    img = cv2.GaussianBlur(img + rng.integers(0, 40, img.shape, dtype=np.uint8), (5, 5), 0)
+    cv2.rectangle(img, (400, 200), (800, 600), (30, 30, 200), -1)
+    ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes()
+
+
+def build_requests(jpeg):
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+    boundary = 'benchboundary'
+    multipart = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + jpeg + f'\r\n--{boundary}--\r\n'.encode()
+    return {
+        "json_base64": (json.dumps({"image": data_url}).encode(), 'application/json'),
+        "raw_jpeg": (jpeg, 'image/jpeg'),
+        "multipart": (multipart, f'multipart/form-data; boundary={boundary}')
+    }
+
+
+def time_decode(app, body, content_type, runs):
+    samples = []
+    for _ in range(runs):
+        with app.test_request_context('/detect', method='POST', data=body, content_type=content_type) as ctx:
+            started = time.perf_counter()
+            decode_image_bytes(read_request_image_bytes(ctx.request))
+            samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('image', nargs='?', help="JPEG file to use instead of a synthetic frame")
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            jpeg = f.read()
+    else:
+        jpeg = synthetic_jpeg()
+
+    app = Flask(__name__)
+    print(f"📷 JPEG size: {len(jpeg):,} bytes, {args.runs} runs per format\n")
+    print(f"{'format':<14}{'bytes':>12}{'overhead':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, (body, content_type) in build_requests(jpeg).items():
+        p50, p99 = time_decode(app, body, content_type, args.runs)
+        overhead = (len(body) / len(jpeg) - 1) * 100
+        print(f"{name:<14}{len(body):>12,}{overhead:>9.1f}%{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
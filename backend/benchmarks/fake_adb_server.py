@@ -0,0 +1,302 @@
+"""Stand-in adb server for load and latency tests of the phone routes, no handsets needed.
+
+Usage:
+    python backend/benchmarks/fake_adb_server.py [--port 15037] [--devices 2]
+        [--latency-ms 20] [--jitter-ms 5] [--failure-rate 0.01] [--drop-rate 0]
+
+then point the backend at it:
+    ANDROID_ADB_SERVER_PORT=15037 python backend/app.py
+
+It speaks the adb server protocol adb_client.py uses:
+  * host:version, host:devices, host:track-devices (pushes a new list when
+    the devices change), host:connect:<addr>, host:disconnect:<addr>
+  * host:transport:<serial>, then shell:<command> (one command) or exec:sh
+    (a persistent shell, as used by adb_shell.py)
+
+Every device command sleeps for the configured latency (± jitter). It fails
+with exit status 1 at --failure-rate. At --drop-rate the connection is closed
+mid-command instead, the way a handset dropping off Wi-Fi looks. Commands
+the phone routes use (am start, input, dumpsys window, cmd package
+resolve-activity, getprop) get realistic output, so the SMS focus polling
+works unchanged.
+"""
+import argparse
+import random
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+
+SMS_ACTIVITY = 'com.google.android.apps.messaging/.ui.conversation.ConversationActivity'
+# adb_client / adb_shell end every command with this to read back the exit status
+EXIT_SUFFIX = '; echo __adb_exit=$?'
+SESSION_TERMINATOR = b'echo __adb_exit=$?\n'
+
+
+def _block(text):
+    payload = text.encode('utf-8')
+    return b'%04x' % len(payload) + payload
+
+
+class _Dropped(Exception):
+    """The simulated device went away mid-command"""
+
+
+class FakeDevice:
+    """Canned output for the shell commands the backend sends"""
+
+    def __init__(self, serial, model='Fake Phone'):
+        self.serial = serial
+        self.model = model
+        self.focus = 'com.android.launcher3/.Launcher'
+
+    def run(self, command):
+        """(exit status, output) for one command line"""
+        command = command.strip()
+        if command.startswith('am start'):
+            if 'SENDTO' in command:
+                self.focus = SMS_ACTIVITY
+            elif 'CALL' in command:
+                self.focus = 'com.android.dialer/.InCallActivity'
+            output = 'Starting: Intent { ... }\n'
+            if ' -W ' in command:
+                output += 'Status: ok\nLaunchState: WARM\nTotalTime: 180\n'
+            return 0, output
+        if command.startswith('cmd package resolve-activity'):
+            return 0, f'priority=0 preferredOrder=0 match=0x208000\n{SMS_ACTIVITY}\n'
+        if command.startswith('dumpsys window'):
+            return 0, f'  mCurrentFocus=Window{{1a2b3c u0 {self.focus}}}\n'
+        if command.startswith('getprop ro.product.model'):
+            return 0, f'{self.model}\n'
+        # input keyevent / input text / anything else: silent success
+        return 0, ''
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """adb server stand-in with configurable latency and failure rates"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=15037, devices=1, latency_ms=20.0, jitter_ms=0.0,
+                 failure_rate=0.0, drop_rate=0.0, seed=None):
+        self.latency_s = latency_ms / 1000.0
+        self.jitter_s = jitter_ms / 1000.0
+        self.failure_rate = float(failure_rate)
+        self.drop_rate = float(drop_rate)
+        self.random = random.Random(seed)
+        self.changed = threading.Condition()
+        self.devices = {f'emulator-{5554 + 2 * i}': FakeDevice(f'emulator-{5554 + 2 * i}') for i in range(devices)}
+        self.version = 0
+        self.counts = {"connections": 0, "commands": 0, "failures": 0, "drops": 0}
+        # (serial, command line) of the latest device commands, for tests that check what was sent
+        self.history = deque(maxlen=1000)
+        self.connections = set()
+        super().__init__((host, port), _FakeAdbHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def device_list(self):
+        with self.changed:
+            return ''.join(f'{serial}\tdevice\n' for serial in self.devices)
+
+    def add_device(self, serial):
+        with self.changed:
+            self.devices.setdefault(serial, FakeDevice(serial))
+            self.version += 1
+            self.changed.notify_all()
+
+    def remove_device(self, serial):
+        with self.changed:
+            removed = self.devices.pop(serial, None) is not None
+            self.version += 1
+            self.changed.notify_all()
+            return removed
+
+    def count(self, key):
+        with self.changed:
+            self.counts[key] += 1
+
+    def run_command(self, device, command):
+        """Run one device command with the configured latency and failures"""
+        self.count('commands')
+        with self.changed:
+            self.history.append((device.serial, command))
+            roll = self.random.random()
+            delay = max(0.0, self.latency_s + self.random.uniform(-self.jitter_s, self.jitter_s))
+        time.sleep(delay)
+        if roll < self.drop_rate:
+            self.count('drops')
+            raise _Dropped()
+        if roll < self.drop_rate + self.failure_rate:
+            self.count('failures')
+            return 1, 'Error: simulated failure\n'
+        return device.run(command)
+
+    def drop_connections(self):
+        """Cut every open connection, the way an adb server restart looks to its clients"""
+        with self.changed:
+            connections = list(self.connections)
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return len(connections)
+
+    def stats(self):
+        with self.changed:
+            return {"devices": len(self.devices), **self.counts}
+
+    def start(self):
+        """Serve on a daemon thread (for harnesses that run in-process)"""
+        thread = threading.Thread(target=self.serve_forever, name='fake-adb', daemon=True)
+        thread.start()
+        return self
+
+
+class _FakeAdbHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count('connections')
+        with self.server.changed:
+            self.server.connections.add(self.request)
+
+    def finish(self):
+        with self.server.changed:
+            self.server.connections.discard(self.request)
+
+    def _recv_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data.extend(chunk)
+        return bytes(data)
+
+    def _read_request(self):
+        length = int(self._recv_exact(4), 16)
+        return self._recv_exact(length).decode('utf-8')
+
+    def _fail(self, message):
+        self.request.sendall(b'FAIL' + _block(message))
+
+    def handle(self):
+        device = None
+        try:
+            while True:
+                service = self._read_request()
+                if service.startswith('host:transport:'):
+                    device = self.server.devices.get(service[len('host:transport:'):])
+                    if device is None:
+                        return self._fail(f"device '{service[len('host:transport:'):]}' not found")
+                    self.request.sendall(b'OKAY')
+                    continue
+                if service in ('host:transport-any', 'host:transport-usb', 'host:transport-local'):
+                    device = next(iter(self.server.devices.values()), None)
+                    if device is None:
+                        return self._fail('no devices/emulators found')
+                    self.request.sendall(b'OKAY')
+                    continue
+                return self._dispatch(service, device)
+        except (EOFError, ConnectionError, _Dropped):
+            pass
+
+    def _dispatch(self, service, device):
+        server = self.server
+        if service == 'host:version':
+            return self.request.sendall(b'OKAY' + _block('0029'))
+        if service == 'host:devices':
+            return self.request.sendall(b'OKAY' + _block(server.device_list()))
+        if service == 'host:track-devices':
+            return self._track_devices()
+        if service.startswith('host:connect:'):
+            address = service[len('host:connect:'):]
+            server.add_device(address)
+            return self.request.sendall(b'OKAY' + _block(f'connected to {address}'))
+        if service.startswith('host:disconnect:'):
+            address = service[len('host:disconnect:'):]
+            if not server.remove_device(address):
+                return self.request.sendall(b'OKAY' + _block(f"error: no such device '{address}'"))
+            return self.request.sendall(b'OKAY' + _block(f'disconnected {address}'))
+        if device is None:
+            return self._fail(f'unsupported service: {service}')
+        if service.startswith('shell:'):
+            return self._shell(device, service[len('shell:'):])
+        if service == 'exec:sh':
+            return self._session(device)
+        return self._fail(f'unsupported service: {service}')
+
+    def _track_devices(self):
+        self.request.sendall(b'OKAY')
+        seen = None
+        while True:
+            with self.server.changed:
+                self.server.changed.wait_for(lambda: self.server.version != seen, 5.0)
+                changed = self.server.version != seen
+                seen = self.server.version
+            if changed:
+                self.request.sendall(_block(self.server.device_list()))
+
+    def _shell(self, device, command):
+        self.request.sendall(b'OKAY')
+        has_suffix = command.endswith(EXIT_SUFFIX)
+        if has_suffix:
+            command = command[:-len(EXIT_SUFFIX)]
+        code, output = self.server.run_command(device, command)
+        if has_suffix:
+            output += f'__adb_exit={code}\n'
+        self.request.sendall(output.encode('utf-8'))
+
+    def _session(self, device):
+        self.request.sendall(b'OKAY')
+        buffer = b''
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                return
+            buffer += chunk
+            if buffer.startswith(b'exit\n'):
+                return
+            while SESSION_TERMINATOR in buffer:
+                block, buffer = buffer.split(SESSION_TERMINATOR, 1)
+                # adb_shell sends "{ <command>\n} 2>&1; echo __adb_exit=$?\n"
+                command = block.decode('utf-8').strip().removeprefix('{').rsplit('}', 1)[0].strip()
+                code, output = self.server.run_command(device, command)
+                self.request.sendall(f'{output}__adb_exit={code}\n'.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=15037)
+    parser.add_argument('--devices', type=int, default=1, help="Devices online at start")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="Time each device command takes")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Uniform ± spread around the latency")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of commands that exit with status 1")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="Share of commands whose connection is cut")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = FakeAdbServer(args.host, args.port, args.devices, args.latency_ms, args.jitter_ms,
+                           args.failure_rate, args.drop_rate, args.seed)
+    print(f"📱 Fake adb server on {args.host}:{server.port} with {args.devices} devices, "
+          f"{args.latency_ms:.0f}±{args.jitter_ms:.0f} ms per command")
+    print(f"   ANDROID_ADB_SERVER_PORT={server.port} python backend/app.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n{server.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
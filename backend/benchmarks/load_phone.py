@@ -0,0 +1,169 @@
+"""Load test of the phone routes at a target request rate, against the fake adb server.
+
+Usage:
+    python backend/benchmarks/load_phone.py [--app app] [--rps 20] [--duration 10]
+        [--endpoints call message send-message] [--devices 1] [--latency-ms 20]
+        [--failure-rate 0] [--no-wait]
+
+By default this starts fake_adb_server.FakeAdbServer on a free port, points
+the backend at it (ANDROID_ADB_SERVER_PORT), serves the chosen app module
+(app, app_clean, app_voice_only or server) on a local werkzeug server and
+sends POSTs on a fixed schedule (open loop: a slow reply doesn't delay the
+next request). With --url it drives an already running backend instead
+(start fake_adb_server.py and the backend by hand for that).
+
+Phone actions are sent with ?wait=1 so the measured latency covers the
+device commands, not only the queueing; --no-wait measures the 202 path.
+Latency is counted from each request's scheduled send time, so a backlog
+shows up in the tail instead of silently lowering the request rate.
+"""
+import argparse
+import contextlib
+import http.client
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_adb_server import FakeAdbServer  # noqa: E402
+
+ENDPOINTS = {
+    'call': '/api/phone/call',
+    'message': '/api/phone/message',
+    'send-message': '/api/phone/send-message',
+}
+
+
+def payload(endpoint, i):
+    body = {"contact": f"Load {i}", "phoneNumber": f"+1555{i % 10000000:07d}"}
+    if endpoint == 'send-message':
+        body["message"] = f"load test message {i}"
+    return json.dumps(body).encode('utf-8')
+
+
+def serve_app(module_name, adb_port):
+    """Import the backend module against the fake adb server and serve it on a free port"""
+    os.environ['ANDROID_ADB_SERVER_PORT'] = str(adb_port)
+    from werkzeug.serving import make_server
+    module = importlib.import_module(module_name)
+    http_server = make_server('127.0.0.1', 0, module.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, name='load-http', daemon=True).start()
+    return f'http://127.0.0.1:{http_server.server_port}', module
+
+
+def quiet_output(verbose):
+    """Hide the backend's per-request log lines while it runs in this process"""
+    if verbose:
+        return contextlib.nullcontext()
+    return contextlib.redirect_stdout(open(os.devnull, 'w'))
+
+
+class LoadResult:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def add(self, endpoint, status, latency_ms):
+        with self._lock:
+            self.latencies[endpoint].append(latency_ms)
+            self.statuses[endpoint][status] += 1
+
+
+def send(base_url, endpoint, body, wait, scheduled, result):
+    parts = urlsplit(base_url)
+    path = ENDPOINTS[endpoint] + ('?wait=1' if wait else '')
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    try:
+        connection.request('POST', path, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except OSError as e:
+        status = type(e).__name__
+    finally:
+        connection.close()
+    result.add(endpoint, status, (time.perf_counter() - scheduled) * 1000.0)
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def report(result, elapsed_s):
+    print(f"{'endpoint':<14}{'sent':>6}{'ok':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  statuses")
+    for endpoint, latencies in result.latencies.items():
+        latencies.sort()
+        statuses = result.statuses[endpoint]
+        ok = sum(count for status, count in statuses.items() if status in (200, 202))
+        print(f"{endpoint:<14}{len(latencies):>6}{ok:>6}{len(latencies) / elapsed_s:>8.1f}"
+              f"{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.95):>9.1f}"
+              f"{percentile(latencies, 0.99):>9.1f}{latencies[-1]:>9.1f}  {dict(statuses)}")
+    print("(latencies in ms from the scheduled send time)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='app', choices=['app', 'app_clean', 'app_voice_only', 'server'])
+    parser.add_argument('--url', help="Drive a running backend instead of starting one")
+    parser.add_argument('--rps', type=float, default=20.0, help="Target requests per second (all endpoints)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of load")
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument('--no-wait', action='store_true', help="Don't add ?wait=1 (measure the queued 202 path)")
+    parser.add_argument('--workers', type=int, default=64, help="Most requests in flight at once")
+    parser.add_argument('--devices', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--verbose', action='store_true', help="Show the backend's own log lines")
+    args = parser.parse_args()
+
+    fake = None
+    base_url = args.url
+    if not base_url:
+        fake = FakeAdbServer(port=0, devices=args.devices, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                             failure_rate=args.failure_rate, drop_rate=args.drop_rate).start()
+        if not args.verbose:
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        with quiet_output(args.verbose):
+            base_url, module = serve_app(args.app, fake.port)
+        if args.app == 'server':
+            # server.py drives one fixed wireless address
+            fake.add_device(module.PHONE_ADDRESS)
+
+    total = int(args.rps * args.duration)
+    print(f"🔥 {total} requests at {args.rps:g}/s to {base_url} "
+          f"({', '.join(args.endpoints)}{'' if args.no_wait else ', ?wait=1'})")
+    if fake:
+        print(f"📱 fake adb: {args.devices} devices, {args.latency_ms:g}±{args.jitter_ms:g} ms per command, "
+              f"failure rate {args.failure_rate:g}, drop rate {args.drop_rate:g}\n")
+
+    result = LoadResult()
+    with quiet_output(args.verbose or not fake), ThreadPoolExecutor(max_workers=args.workers) as pool:
+        started = time.perf_counter()
+        for i in range(total):
+            scheduled = started + i / args.rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = args.endpoints[i % len(args.endpoints)]
+            pool.submit(send, base_url, endpoint, payload(endpoint, i), not args.no_wait, scheduled, result)
+    elapsed_s = time.perf_counter() - started
+
+    report(result, elapsed_s)
+    if fake:
+        print(f"\nfake adb: {fake.stats()}")
+        fake.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
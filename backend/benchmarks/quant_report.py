@@ -0,0 +1,173 @@
+"""Accuracy-vs-latency report for the FP32 and quantized detection models.
+
+Usage:
+    python backend/benchmarks/quant_report.py path/to/labelled_set [--calib path/to/frames]
+
+The labelled set uses the YOLO layout:
+    labelled_set/images/frame_001.jpg
+    labelled_set/labels/frame_001.txt   (one "class cx cy w h" line per object, normalised 0-1)
+
+For every installed variant (torch, onnx, onnx-int8, onnx-fp16) the report
+prints mAP@0.5, mAP@0.5:0.95, p50/p99 single-frame latency and model size,
+so each deployment can pick its own trade-off.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config  # noqa: E402
+from inference_backends import BACKENDS, QuantizedOnnxBackend  # noqa: E402
+from quantize import list_images  # noqa: E402
+
+VARIANTS = ('torch', 'onnx', 'onnx-int8', 'onnx-fp16')
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def load_labelled_set(root):
+    """Return [(image, gt_classes, gt_boxes_xyxy)] for every image with a label file"""
+    samples = []
+    for path in list_images(os.path.join(root, 'images')):
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        height, width = img.shape[:2]
+        label_path = os.path.join(root, 'labels', os.path.splitext(os.path.basename(path))[0] + '.txt')
+        rows = np.loadtxt(label_path, ndmin=2) if os.path.exists(label_path) else np.zeros((0, 5))
+        classes = rows[:, 0].astype(int)
+        cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        samples.append((img, classes, boxes))
+    return samples
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_predictions(pred_classes, pred_conf, pred_boxes, gt_classes, gt_boxes):
+    """True-positive flags, shape (num_preds, num_iou_thresholds), greedy by confidence"""
+    tp = np.zeros((len(pred_classes), len(IOU_THRESHOLDS)), dtype=bool)
+    if len(pred_classes) == 0 or len(gt_classes) == 0:
+        return tp
+    iou = box_iou(pred_boxes, gt_boxes)
+    iou[pred_classes[:, None] != gt_classes[None, :]] = 0
+    order = np.argsort(-pred_conf)
+    for t, threshold in enumerate(IOU_THRESHOLDS):
+        taken = np.zeros(len(gt_classes), dtype=bool)
+        for i in order:
+            candidates = np.where(~taken & (iou[i] >= threshold))[0]
+            if len(candidates):
+                best = candidates[np.argmax(iou[i, candidates])]
+                taken[best] = True
+                tp[i, t] = True
+    return tp
+
+
+def average_precision(tp, conf, num_gt):
+    """COCO-style 101-point interpolated AP for one class and one IoU threshold"""
+    if num_gt == 0 or len(tp) == 0:
+        return 0.0
+    order = np.argsort(-conf)
+    tp_cum = np.cumsum(tp[order])
+    fp_cum = np.cumsum(~tp[order])
+    recall = tp_cum / num_gt
+    precision = tp_cum / (tp_cum + fp_cum)
+    # Precision envelope, then sample it at 101 recall points (0 past the highest recall)
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    index = np.searchsorted(recall, np.linspace(0, 1, 101), side='left')
+    sampled = np.where(index < len(precision), precision[np.minimum(index, len(precision) - 1)], 0.0)
+    return float(sampled.mean())
+
+
+def evaluate(backend, samples, conf):
+    all_tp, all_conf, all_cls, gt_counts = [], [], [], {}
+    latencies = []
+    for img, gt_classes, gt_boxes in samples:
+        started = time.perf_counter()
+        result = backend(img, conf=conf)[0]
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        boxes = result.boxes
+        pred_classes = boxes.cls.cpu().numpy().astype(int)
+        pred_conf = boxes.conf.cpu().numpy()
+        pred_boxes = boxes.xyxy.cpu().numpy()
+        all_tp.append(match_predictions(pred_classes, pred_conf, pred_boxes, gt_classes, gt_boxes))
+        all_conf.append(pred_conf)
+        all_cls.append(pred_classes)
+        for cls in gt_classes:
+            gt_counts[cls] = gt_counts.get(cls, 0) + 1
+
+    tp = np.concatenate(all_tp) if all_tp else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+    confs = np.concatenate(all_conf) if all_conf else np.zeros(0)
+    classes = np.concatenate(all_cls) if all_cls else np.zeros(0, dtype=int)
+    ap = np.zeros((len(gt_counts), len(IOU_THRESHOLDS)))
+    for row, (cls, num_gt) in enumerate(gt_counts.items()):
+        mask = classes == cls
+        for t in range(len(IOU_THRESHOLDS)):
+            ap[row, t] = average_precision(tp[mask, t], confs[mask], num_gt)
+
+    latencies.sort()
+    return {
+        "map50": float(ap[:, 0].mean()) if len(ap) else 0.0,
+        "map50_95": float(ap.mean()) if len(ap) else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+        "p99_ms": latencies[max(0, int(len(latencies) * 0.99) - 1)] if latencies else 0.0
+    }
+
+
+def artifact_size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files) / 1e6
+    return os.path.getsize(path) / 1e6 if os.path.exists(path) else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('dataset', help="Folder with images/ and labels/ subfolders")
+    parser.add_argument('--weights', default=config.DETECT_MODEL)
+    parser.add_argument('--imgsz', type=int, default=config.DETECT_IMGSZ)
+    parser.add_argument('--calib', default=config.DETECT_QUANT_CALIB_DIR or None,
+                        help="Calibration frames for static INT8 (dynamic INT8 if omitted)")
+    parser.add_argument('--conf', type=float, default=0.001, help="Confidence threshold used while scoring mAP")
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=VARIANTS)
+    args = parser.parse_args()
+
+    samples = load_labelled_set(args.dataset)
+    if not samples:
+        print(f"❌ No labelled images found under {args.dataset}/images")
+        return 1
+    print(f"📊 {len(samples)} labelled images\n")
+
+    rows = []
+    for name in args.variants:
+        backend_cls = BACKENDS[name]
+        if not backend_cls.is_available():
+            print(f"ℹ️ {name} skipped ({', '.join(backend_cls.requires)} not installed)")
+            continue
+        if issubclass(backend_cls, QuantizedOnnxBackend):
+            backend = backend_cls(args.weights, args.imgsz, calibration_dir=args.calib)
+        else:
+            backend = backend_cls(args.weights, args.imgsz)
+        backend.load()
+        backend(samples[0][0], conf=args.conf)  # warm up before timing
+        metrics = evaluate(backend, samples, args.conf)
+        rows.append((name, metrics, artifact_size_mb(backend.artifact_path())))
+
+    print(f"\n{'variant':<11}{'mAP50':>8}{'mAP50-95':>10}{'p50 ms':>9}{'p99 ms':>9}{'size MB':>9}")
+    for name, m, size in rows:
+        print(f"{name:<11}{m['map50']:>8.3f}{m['map50_95']:>10.3f}{m['p50_ms']:>9.1f}{m['p99_ms']:>9.1f}{size:>9.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
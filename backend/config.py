@@ -0,0 +1,201 @@
+"""Runtime settings for the Smart Object AI backend.
+
+Every value can be overridden with an environment variable of the same name,
+so a deployment can be tuned without editing code.
+"""
+import os
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"⚠️ Invalid value for {name}, using default {default}")
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        print(f"⚠️ Invalid value for {name}, using default {default}")
+        return default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int_list(name, default):
+    try:
+        return [int(v) for v in os.environ[name].split(',') if v.strip()]
+    except KeyError:
+        return default
+    except ValueError:
+        print(f"⚠️ Invalid value for {name}, using default {default}")
+        return default
+
+
+# ===== SERVER =====
+SERVER_PORT = _env_int('PORT', 5000)
+
+# ===== DETECTION / BATCHING =====
+# YOLO weights to load
+DETECT_MODEL = os.environ.get('DETECT_MODEL', 'yolov8n.pt')
+# Inference runtime: torch, onnx, openvino, or auto (benchmark at startup, use the fastest).
+# The quantized onnx-int8 / onnx-fp16 variants are opt-in and never picked by auto.
+DETECT_BACKEND = os.environ.get('DETECT_BACKEND', 'auto').lower()
+# Folder of sample frames used to calibrate static INT8 quantization (dynamic INT8 if empty)
+DETECT_QUANT_CALIB_DIR = os.environ.get('DETECT_QUANT_CALIB_DIR', '')
+# Largest confidence difference allowed between a backend and PyTorch on the parity check
+DETECT_PARITY_TOLERANCE = _env_float('DETECT_PARITY_TOLERANCE', 0.05)
+# Timed runs per backend in the startup benchmark
+DETECT_BENCH_RUNS = _env_int('DETECT_BENCH_RUNS', 10)
+# Defaults for the per-request conf / iou / classes / max_det / top_k options (detect_options.py)
+# Minimum confidence for a box to be returned
+DETECT_CONF = _env_float('DETECT_CONF', 0.25)
+# NMS IoU threshold: a box overlapping a better one of its class by more than this is dropped
+DETECT_IOU = _env_float('DETECT_IOU', 0.7)
+# Only detect these classes (comma-separated names or ids, e.g. "cell phone,cup"); empty = all
+DETECT_CLASSES = os.environ.get('DETECT_CLASSES', '')
+# Most boxes NMS keeps per image
+DETECT_MAX_DET = _env_int('DETECT_MAX_DET', 300)
+# Largest max_det / top_k a request may ask for
+DETECT_MAX_DET_LIMIT = _env_int('DETECT_MAX_DET_LIMIT', 1000)
+# Most detections returned per image, highest confidence first; 0 returns all
+DETECT_TOP_K = _env_int('DETECT_TOP_K', 0)
+# Square input size the model runs at; uploads are letterboxed to this
+DETECT_IMGSZ = _env_int('DETECT_IMGSZ', 640)
+# Largest number of frames sent to the model in one forward pass
+DETECT_BATCH_SIZE = _env_int('DETECT_BATCH_SIZE', 8)
+# How long the batching worker waits for more frames after the first one arrives
+DETECT_BATCH_WAIT_MS = _env_float('DETECT_BATCH_WAIT_MS', 10)
+# Frames allowed to wait for the model before /detect starts rejecting requests
+DETECT_QUEUE_DEPTH = _env_int('DETECT_QUEUE_DEPTH', 64)
+# Longest time a /detect request waits for its result
+DETECT_TIMEOUT_S = _env_float('DETECT_TIMEOUT_S', 10)
+# Retry-After (seconds) sent with 503 when the queue is full
+DETECT_RETRY_AFTER_S = _env_int('DETECT_RETRY_AFTER_S', 1)
+
+# ===== WARM-UP / INPUT SHAPE =====
+# Synthetic inference passes per input shape before the model is reported ready (0 disables)
+DETECT_WARMUP_RUNS = _env_int('DETECT_WARMUP_RUNS', 3)
+# Batch sizes to warm up (every frame is DETECT_IMGSZ x DETECT_IMGSZ, so batch size is the shape)
+DETECT_WARMUP_BATCH_SIZES = _env_int_list('DETECT_WARMUP_BATCH_SIZES', [1, DETECT_BATCH_SIZE])
+# Pad every batch to DETECT_BATCH_SIZE so the runtime only ever sees one input shape
+DETECT_PIN_SHAPE = _env_bool('DETECT_PIN_SHAPE', False)
+
+# ===== INFERENCE WORKER POOL =====
+# Number of model-holding worker processes; 0 runs the model inside the server process
+DETECT_WORKERS = _env_int('DETECT_WORKERS', 0)
+# CPU threads each worker's runtime may use (defaults to an even share of the cores)
+DETECT_WORKER_THREADS = _env_int('DETECT_WORKER_THREADS', max(1, (os.cpu_count() or 1) // max(1, DETECT_WORKERS)))
+
+# ===== RESULT CACHE =====
+# Byte-identical uploads are answered from memory; 0 entries disables the cache
+DETECT_CACHE_ENTRIES = _env_int('DETECT_CACHE_ENTRIES', 512)
+DETECT_CACHE_MAX_BYTES = _env_int('DETECT_CACHE_MAX_BYTES', 8 * 1024 * 1024)
+DETECT_CACHE_TTL_S = _env_float('DETECT_CACHE_TTL_S', 300)
+
+# ===== NEAR-DUPLICATE FRAMES =====
+# Reuse a client's previous detections when the new frame's dHash differs by at most this many bits (of 64)
+DETECT_DEDUP_MAX_DISTANCE = _env_int('DETECT_DEDUP_MAX_DISTANCE', 4)
+# ...and the previous result is at most this old; 0 disables near-duplicate reuse
+DETECT_DEDUP_MAX_AGE_S = _env_float('DETECT_DEDUP_MAX_AGE_S', 1.0)
+DETECT_DEDUP_MAX_CLIENTS = _env_int('DETECT_DEDUP_MAX_CLIENTS', 256)
+
+# ===== TRACKING BETWEEN FRAMES =====
+# Run YOLO at least every K frames per client and track boxes in between; 0 or 1 runs it on every frame
+DETECT_TRACK_EVERY = _env_int('DETECT_TRACK_EVERY', 0)
+# Mean grayscale difference (0-255) left after aligning with the keyframe that forces a new detection
+DETECT_TRACK_MOTION = _env_float('DETECT_TRACK_MOTION', 8.0)
+# Largest shift from the keyframe that is still tracked, as a fraction of the frame size
+DETECT_TRACK_MAX_SHIFT = _env_float('DETECT_TRACK_MAX_SHIFT', 0.25)
+# Oldest keyframe that may be tracked from
+DETECT_TRACK_MAX_AGE_S = _env_float('DETECT_TRACK_MAX_AGE_S', 2.0)
+# IoU that keeps an object's track_id from one keyframe to the next
+DETECT_TRACK_IOU = _env_float('DETECT_TRACK_IOU', 0.3)
+
+# ===== LIVE STREAMING (/ws/detect) =====
+# Largest JPEG frame accepted over the WebSocket
+DETECT_STREAM_MAX_FRAME_BYTES = _env_int('DETECT_STREAM_MAX_FRAME_BYTES', 2 * 1024 * 1024)
+# Concurrent live streams; each one holds a server thread (and a worker thread) while open
+DETECT_STREAM_MAX_CLIENTS = _env_int('DETECT_STREAM_MAX_CLIENTS', 16)
+
+# ===== ADB (PHONE CONTROL) =====
+# adb server the phone routes talk to directly (same variables the adb CLI honours)
+ADB_SERVER_HOST = os.environ.get('ADB_SERVER_HOST', '127.0.0.1')
+ADB_SERVER_PORT = _env_int('ANDROID_ADB_SERVER_PORT', 5037)
+# Longest time one adb shell command may take
+ADB_COMMAND_TIMEOUT_S = _env_float('ADB_COMMAND_TIMEOUT_S', 5)
+# How long a request waits for the first device list after startup
+ADB_SYNC_TIMEOUT_S = _env_float('ADB_SYNC_TIMEOUT_S', 1.0)
+# Persistent shell sessions kept open per device for multi-step actions (SMS)
+ADB_SESSIONS_PER_DEVICE = _env_int('ADB_SESSIONS_PER_DEVICE', 2)
+# Idle sessions older than this are closed instead of reused
+ADB_SESSION_IDLE_S = _env_float('ADB_SESSION_IDLE_S', 60)
+# Longest wait for the SMS compose window to take focus
+ADB_SMS_READY_TIMEOUT_S = _env_float('ADB_SMS_READY_TIMEOUT_S', 5)
+# Interval between foreground-window checks while waiting
+ADB_POLL_INTERVAL_S = _env_float('ADB_POLL_INTERVAL_S', 0.1)
+
+# ===== PHONE ACTION JOBS =====
+# Phone actions waiting per device before new ones are rejected with 503
+PHONE_JOB_QUEUE_DEPTH = _env_int('PHONE_JOB_QUEUE_DEPTH', 32)
+# Finished jobs kept for GET /api/phone/jobs/<id> (oldest dropped first)...
+PHONE_JOB_HISTORY = _env_int('PHONE_JOB_HISTORY', 500)
+# ...for at most this long
+PHONE_JOB_TTL_S = _env_float('PHONE_JOB_TTL_S', 600)
+# Longest time a request with ?wait=1 blocks for its job to finish
+PHONE_JOB_WAIT_S = _env_float('PHONE_JOB_WAIT_S', 30)
+# A device's worker thread exits after this long without jobs (one is started again on demand)
+PHONE_JOB_IDLE_S = _env_float('PHONE_JOB_IDLE_S', 60)
+
+# ===== PHONE DEVICES =====
+# Serial used when a request names no device (e.g. 192.168.29.67:5555); empty = first online device
+PHONE_DEFAULT_DEVICE = os.environ.get('PHONE_DEFAULT_DEVICE', '')
+# Longest a cached device status is served when the adb tracker is disconnected
+PHONE_STATUS_TTL_S = _env_float('PHONE_STATUS_TTL_S', 2.0)
+# Seconds between keep-alive comments on the status event stream
+PHONE_STATUS_KEEPALIVE_S = _env_float('PHONE_STATUS_KEEPALIVE_S', 15)
+
+# ===== STATIC FILES =====
+# Memory budget for cached frontend files (including their gzip / brotli copies)
+STATIC_CACHE_MAX_BYTES = _env_int('STATIC_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+# Files bigger than this are streamed from disk instead of cached
+STATIC_CACHE_MAX_FILE_BYTES = _env_int('STATIC_CACHE_MAX_FILE_BYTES', 2 * 1024 * 1024)
+# How often a cached file's mtime is checked for edits (0 = every request)
+STATIC_RECHECK_S = _env_float('STATIC_RECHECK_S', 1.0)
+# Cache lifetime sent for versioned URLs (?v=... or a content hash in the name)
+STATIC_MAX_AGE_S = _env_int('STATIC_MAX_AGE_S', 365 * 24 * 3600)
+# Smaller files aren't worth compressing
+STATIC_COMPRESS_MIN_BYTES = _env_int('STATIC_COMPRESS_MIN_BYTES', 512)
+
+# ===== FRONTEND BUNDLES =====
+# Serve pages that use minified, content-hashed CSS / JS bundles (built by asset_bundle.py
+# or serve.py --build-assets, else on the first page request)
+ASSET_BUNDLE = _env_bool('ASSET_BUNDLE', True)
+# Minify bundles (off = concatenate and hash only)
+ASSET_MINIFY = _env_bool('ASSET_MINIFY', True)
+# Output folder under the repo root
+ASSET_DIST_DIR = os.environ.get('ASSET_DIST_DIR', 'dist')
+
+# ===== PRODUCTION SERVER (serve.py) =====
+# waitress, gunicorn, or auto (waitress if installed, else gunicorn)
+SERVE_SERVER = os.environ.get('SERVE_SERVER', 'auto').lower()
+SERVE_HOST = os.environ.get('SERVE_HOST', '0.0.0.0')
+# Server processes; every one holds its own detection pipeline, caches and phone job queues
+SERVE_WORKERS = _env_int('SERVE_WORKERS', 1)
+# Request threads per process (concurrent /detect requests are batched across them)
+SERVE_THREADS = _env_int('SERVE_THREADS', 8)
+# Seconds an idle keep-alive connection stays open
+SERVE_KEEPALIVE_S = _env_int('SERVE_KEEPALIVE_S', 5)
+# gunicorn: a worker silent for this long is restarted
+SERVE_TIMEOUT_S = _env_int('SERVE_TIMEOUT_S', 60)
+# Allow SERVE_WORKERS > 1 for app.py, which loads one YOLO copy per worker
+SERVE_MODEL_PER_WORKER = _env_bool('SERVE_MODEL_PER_WORKER', False)
+# Flask debugger + reloader for `python app.py` (the development server only)
+SERVER_DEBUG = _env_bool('SERVER_DEBUG', True)
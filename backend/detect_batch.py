@@ -0,0 +1,429 @@
+"""Offline detection over image directories and video files.
+
+Runs the same detection core as /detect (decode + letterbox, the selected
+inference backend, boxes mapped back to the source image) over archived
+scans and recordings, without going through HTTP:
+
+    python backend/detect_batch.py scans/ clip.mp4 -o results.jsonl
+        [--format jsonl|parquet] [--batch-size 8] [--prefetch-workers 4]
+        [--stride 1] [--no-resume] [--conf 0.25] [--iou 0.7] [--classes cup,bottle]
+        [--max-det 300] [--top-k 0]
+
+Inputs can be directories (searched recursively for images and videos),
+image files or video files. A pool of --prefetch-workers threads reads and
+decodes images ahead of the model; video frames are read in order with
+cv2.VideoCapture and letterboxed in the same pool. At most --prefetch frames
+are decoded ahead, so memory stays flat on any archive size. Decoded frames
+go to the engine in batches of --batch-size. With DETECT_WORKERS set, one
+batch per worker process is in flight.
+
+One record is written per image or video frame, flushed after every batch:
+
+    {"source": "scans/a.jpg", "frame": null, "width": 1280, "height": 720,
+     "predictions": [{"class": "cup", "confidence": 0.91, "box": [...]}]}
+
+Images that can't be decoded get an "error" instead of predictions. Running
+the same command again resumes: (source, frame) pairs already in the output
+are skipped, and already-processed video frames are skipped with grab(),
+which doesn't decode them. Parquet output (needs pyarrow) is a directory of
+part files. A part is closed every --parquet-rows records, so an
+interrupted run loses at most that part.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
+
+
+class BatchItem:
+    """One image or video frame on its way through the pipeline"""
+
+    __slots__ = ('source', 'frame', 'load', 'prepared', 'error')
+
+    def __init__(self, source, frame, load):
+        self.source = source
+        self.frame = frame  # frame index for videos, None for images
+        self.load = load  # () -> PreparedFrame, run on the prefetch pool
+        self.prepared = None
+        self.error = None
+
+    def record(self, predictions=None):
+        record = {"source": self.source, "frame": self.frame}
+        if self.prepared is not None:
+            record["width"] = self.prepared.orig_width
+            record["height"] = self.prepared.orig_height
+        if self.error is not None:
+            record["error"] = self.error
+        else:
+            record["predictions"] = predictions
+        return record
+
+
+def find_inputs(paths):
+    """Expand directories into their image and video files (sorted, recursive)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, '**', '*'), recursive=True)
+            files.extend(sorted(f for f in found if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"⚠️ Skipping {path}: not found")
+    return [os.path.normpath(f).replace(os.sep, '/') for f in files]
+
+
+def is_video(path):
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+def count_frames(files, stride):
+    """Frames to process, or None when a video doesn't report its length"""
+    import cv2
+    total = 0
+    for path in files:
+        if not is_video(path):
+            total += 1
+            continue
+        capture = cv2.VideoCapture(path)
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        if frames <= 0:
+            return None
+        total += (frames + stride - 1) // stride
+    return total
+
+
+def iter_items(files, preprocessor, done, stride):
+    """Yield a BatchItem per image / video frame that isn't in `done`"""
+    import cv2
+    for path in files:
+        if not is_video(path):
+            if (path, None) not in done:
+                yield BatchItem(path, None, lambda path=path: preprocessor(read_file(path)))
+            continue
+
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            # Keyed like an image record, so a resumed run doesn't write the error again
+            if (path, None) in done:
+                continue
+            item = BatchItem(path, None, None)
+            item.error = "Could not open video"
+            yield item
+            continue
+        index = 0
+        try:
+            while True:
+                wanted = index % stride == 0 and (path, index) not in done
+                if wanted:
+                    ok, image = capture.read()
+                else:
+                    # grab() demuxes without decoding, for frames that are skipped or already done
+                    ok, image = capture.grab(), None
+                if not ok:
+                    break
+                if wanted:
+                    yield BatchItem(path, index, lambda image=image: letterbox_frame(preprocessor, image))
+                index += 1
+        finally:
+            capture.release()
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def letterbox_frame(preprocessor, image):
+    height, width = image.shape[:2]
+    return preprocessor.letterbox(image, width, height)
+
+
+def prefetch(items, pool, depth):
+    """Load items on `pool`, at most `depth` ahead of the consumer, yielding them in order"""
+    pending = deque()
+
+    def load(item):
+        from imaging import ImageInputError
+        try:
+            item.prepared = item.load()
+        except (ImageInputError, OSError) as e:
+            item.error = str(e)
+        return item
+
+    for item in items:
+        if item.load is None:
+            pending.append((item, None))
+        else:
+            pending.append((item, pool.submit(load, item)))
+        while len(pending) >= depth:
+            item, future = pending.popleft()
+            yield future.result() if future else item
+    while pending:
+        item, future = pending.popleft()
+        yield future.result() if future else item
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ===== OUTPUT =====
+
+class JsonlOutput:
+    """Appends one JSON object per line, flushed after every batch"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def done_keys(self):
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            # A run killed mid-write leaves a partial last line; drop it before appending
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            if line.strip():
+                record = json.loads(line)
+                done.add((record["source"], record.get("frame")))
+        return done
+
+    def open(self, fresh=False):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'w' if fresh else 'a', encoding='utf-8')
+
+    def write(self, records):
+        for record in records:
+            self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetOutput:
+    """Writes part-NNNNN.parquet files into a directory, one row group per batch"""
+
+    def __init__(self, path, rows_per_part=10000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.rows_per_part = int(rows_per_part)
+        self.schema = pa.schema([
+            ("source", pa.string()),
+            ("frame", pa.int64()),
+            ("width", pa.int32()),
+            ("height", pa.int32()),
+            ("predictions", pa.list_(pa.struct([
+                ("class", pa.string()),
+                ("confidence", pa.float32()),
+                ("box", pa.list_(pa.float32()))
+            ]))),
+            ("error", pa.string())
+        ])
+        self._writer = None
+        self._rows = 0
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def done_keys(self):
+        done = set()
+        for part in self._parts():
+            try:
+                table = self.pq.read_table(part, columns=["source", "frame"])
+            except self.pa.ArrowInvalid:
+                # Interrupted before its footer was written: redo those frames
+                print(f"⚠️ Removing incomplete {part}")
+                os.remove(part)
+                continue
+            done.update(zip(table.column("source").to_pylist(), table.column("frame").to_pylist()))
+        return done
+
+    def open(self, fresh=False):
+        os.makedirs(self.path, exist_ok=True)
+        if fresh:
+            for part in self._parts():
+                os.remove(part)
+
+    def write(self, records):
+        if self._writer is None:
+            index = len(self._parts())
+            self._writer = self.pq.ParquetWriter(os.path.join(self.path, f'part-{index:05d}.parquet'), self.schema)
+        self._writer.write_table(self.pa.Table.from_pylist(records, schema=self.schema))
+        self._rows += len(records)
+        if self._rows >= self.rows_per_part:
+            self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._rows = 0
+
+
+# ===== PROGRESS =====
+
+class Progress:
+    """Images/s over the whole run and the last interval, printed every `every_s` seconds"""
+
+    def __init__(self, total, every_s=5.0):
+        self.total = total
+        self.every = float(every_s)
+        self.done = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._last_at = self.started
+        self._last_done = 0
+
+    def update(self, done, errors):
+        self.done += done
+        self.errors += errors
+        now = time.perf_counter()
+        if now - self._last_at >= self.every:
+            rate = (self.done - self._last_done) / (now - self._last_at)
+            self._last_at, self._last_done = now, self.done
+            print(f"⏳ {self._position()} · {rate:.1f} img/s{self._eta(rate)}", flush=True)
+
+    def _position(self):
+        if not self.total:
+            return f"{self.done:,} images"
+        return f"{self.done:,} / {self.total:,} images ({self.done / self.total:.1%})"
+
+    def _eta(self, rate):
+        if not self.total or rate <= 0:
+            return ""
+        remaining = max(0, self.total - self.done) / rate
+        return f" · ETA {int(remaining // 60)}m{int(remaining % 60):02d}s"
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        return f"{self.done:,} images in {elapsed:.1f}s ({rate:.1f} img/s), {self.errors} errors"
+
+
+def run(args):
+    # Applied before config is imported, so the engine's batch limit and pinned shape match
+    os.environ['DETECT_BATCH_SIZE'] = str(args.batch_size)
+    from detection import DetectionPipeline, DetectOptionsError
+
+    if args.format == 'parquet':
+        try:
+            output = ParquetOutput(args.output, args.parquet_rows)
+        except ImportError:
+            print("❌ Parquet output needs pyarrow: pip install pyarrow (or use --format jsonl)")
+            return 1
+    else:
+        output = JsonlOutput(args.output)
+
+    files = find_inputs(args.inputs)
+    if not files:
+        print("❌ No images or videos found")
+        return 1
+    done = output.done_keys() if args.resume else set()
+    if done:
+        print(f"↩️ Resuming: {len(done):,} images / frames already in {args.output}")
+    total = count_frames(files, args.stride)
+
+    pipeline = DetectionPipeline()
+    try:
+        # Same options as /detect; unset ones use the deployment defaults
+        options = pipeline.parse_options({name: getattr(args, name) for name in ('conf', 'iou', 'classes', 'max_det', 'top_k')})
+    except DetectOptionsError as e:
+        print(f"❌ {e}")
+        pipeline.close()
+        return 2
+    # Started once the model is loaded, so images/s is throughput only
+    progress = Progress(total - len(done) if total is not None else None, args.progress_s)
+    output.open(fresh=not args.resume)
+    in_flight = deque()
+    # Prefetched frames plus the batches in flight each hold a letterbox buffer;
+    # size the pool for them, or buffers would be allocated per frame
+    pipeline.preprocessor.reserve(args.prefetch + args.batch_size * (pipeline.engine.concurrency + 1))
+    print(f"🚀 {len(files)} inputs → {args.output} ({args.format}), batches of {args.batch_size}, "
+          f"{args.prefetch_workers} decode threads, {args.prefetch} frames prefetched")
+
+    def infer(batch):
+        ready = [item for item in batch if item.prepared is not None]
+        predictions = {}
+        if ready:
+            results = pipeline.detect_prepared([item.prepared for item in ready], options)
+            predictions = dict(zip(map(id, ready), results))
+        for item in ready:
+            pipeline.preprocessor.release(item.prepared)
+        return [item.record(predictions.get(id(item))) for item in batch], sum(item.error is not None for item in batch)
+
+    def finish_oldest():
+        records, errors = in_flight.popleft().result()
+        output.write(records)
+        progress.update(len(records), errors)
+
+    try:
+        with ThreadPoolExecutor(args.prefetch_workers, thread_name_prefix='decode') as decode_pool, \
+                ThreadPoolExecutor(pipeline.engine.concurrency, thread_name_prefix='infer') as infer_pool:
+            items = prefetch(iter_items(files, pipeline.preprocessor, done, args.stride), decode_pool, args.prefetch)
+            for batch in batched(items, args.batch_size):
+                in_flight.append(infer_pool.submit(infer, batch))
+                while len(in_flight) > pipeline.engine.concurrency:
+                    finish_oldest()
+            while in_flight:
+                finish_oldest()
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted; run the same command again to resume")
+        return 130
+    finally:
+        output.close()
+        pipeline.close()
+        print(f"✅ {progress.summary()}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="Image / video files or directories")
+    parser.add_argument('-o', '--output', required=True, help="JSONL file, or directory for --format parquet")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('DETECT_BATCH_SIZE', 8)))
+    parser.add_argument('--prefetch-workers', type=int, default=os.cpu_count() or 1, help="Decode threads")
+    parser.add_argument('--prefetch', type=int, default=32, help="Most frames decoded ahead of the model")
+    parser.add_argument('--stride', type=int, default=1, help="Process every Nth video frame")
+    parser.add_argument('--no-resume', dest='resume', action='store_false', help="Reprocess everything")
+    parser.add_argument('--progress-s', type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument('--parquet-rows', type=int, default=10000, help="Records per Parquet part file")
+    parser.add_argument('--conf', type=float, help="Confidence threshold (default DETECT_CONF)")
+    parser.add_argument('--iou', type=float, help="NMS IoU threshold (default DETECT_IOU)")
+    parser.add_argument('--classes', help="Comma-separated class names or ids (default DETECT_CLASSES)")
+    parser.add_argument('--max-det', type=int, help="Most boxes NMS keeps per image (default DETECT_MAX_DET)")
+    parser.add_argument('--top-k', type=int, help="Most detections written per image (default DETECT_TOP_K)")
+    args = parser.parse_args()
+    if args.batch_size < 1 or args.stride < 1 or args.prefetch_workers < 1 or args.prefetch < 1:
+        parser.error("--batch-size, --stride, --prefetch-workers and --prefetch must be at least 1")
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Per-request inference options for /detect: conf, iou, classes, max_det, top_k.
+
+conf, iou, classes and max_det go into the model call, so ultralytics drops
+low-confidence and unwanted-class boxes inside NMS and stops at max_det.
+top_k is applied afterwards, to the boxes NMS kept, highest confidence first.
+Each option falls back to its deployment default (DETECT_CONF, DETECT_IOU,
+DETECT_CLASSES, DETECT_MAX_DET, DETECT_TOP_K).
+
+Requests with different options can't share a forward pass, so the batching
+scheduler groups frames by DetectOptions. The options are also part of the
+result cache, near-duplicate and tracker keys.
+"""
+from collections import namedtuple
+
+import config
+
+
+class DetectOptionsError(ValueError):
+    """Raised for an option value that is out of range or names an unknown class"""
+
+
+class DetectOptions(namedtuple('DetectOptions', ['conf', 'iou', 'classes', 'max_det', 'top_k'])):
+    """Hashable, so it can key batches and caches; classes is a sorted tuple of ids or None"""
+
+    __slots__ = ()
+
+    def model_kwargs(self):
+        """Keyword arguments for the model call"""
+        kwargs = {"conf": self.conf, "iou": self.iou, "max_det": self.max_det}
+        if self.classes is not None:
+            kwargs["classes"] = list(self.classes)
+        return kwargs
+
+
+def _number(name, value, cast, low, high):
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise DetectOptionsError(f"{name} must be a number")
+    if not low <= number <= high:
+        raise DetectOptionsError(f"{name} must be between {low} and {high}")
+    return number
+
+
+def _class_ids(value, names):
+    """Class ids from "0,41", "cup, cell phone", a JSON list of ids / names or a single id"""
+    if isinstance(value, str):
+        items = value.split(',')
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = [value]
+    by_name = {str(name).lower(): class_id for class_id, name in names.items()}
+    ids = set()
+    for item in items:
+        item = str(item).strip()
+        if not item:
+            continue
+        if item.isdigit() and int(item) in names:
+            ids.add(int(item))
+        elif item.lower() in by_name:
+            ids.add(by_name[item.lower()])
+        else:
+            raise DetectOptionsError(f"Unknown class: {item}")
+    return tuple(sorted(ids)) or None
+
+
+def parse_options(values, names, defaults=None):
+    """DetectOptions from request values (query string, form or JSON fields)
+
+    `names` is the model's {id: name} dict; missing values use `defaults`.
+    Raises DetectOptionsError for invalid values.
+    """
+    defaults = defaults or default_options(names)
+    conf, iou, classes, max_det, top_k = defaults
+    if values.get('conf') not in (None, ''):
+        conf = round(_number('conf', values['conf'], float, 0.0, 1.0), 4)
+    if values.get('iou') not in (None, ''):
+        iou = round(_number('iou', values['iou'], float, 0.01, 1.0), 4)
+    if values.get('classes') not in (None, ''):
+        classes = _class_ids(values['classes'], names)
+    if values.get('max_det') not in (None, ''):
+        max_det = _number('max_det', values['max_det'], int, 1, config.DETECT_MAX_DET_LIMIT)
+    if values.get('top_k') not in (None, ''):
+        top_k = _number('top_k', values['top_k'], int, 0, config.DETECT_MAX_DET_LIMIT)
+    return DetectOptions(conf, iou, classes, max_det, top_k)
+
+
+def request_option_values(request):
+    """Option values from a Flask request: query string, then form fields, then a JSON body"""
+    values = dict(request.args.items())
+    values.update(request.form.items())
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            values.update((k, v) for k, v in body.items() if k in DetectOptions._fields)
+    return values
+
+
+def default_options(names):
+    """The deployment defaults from config"""
+    classes = _class_ids(config.DETECT_CLASSES, names) if config.DETECT_CLASSES else None
+    return DetectOptions(round(config.DETECT_CONF, 4), round(config.DETECT_IOU, 4), classes,
+                         config.DETECT_MAX_DET, config.DETECT_TOP_K)
@@ -0,0 +1,277 @@
+"""Live camera detection over one WebSocket per client: /ws/detect.
+
+POSTing every frame to /detect costs a new request with full headers per
+frame, and when inference falls behind the frames pile up in the batching
+queue, so latency keeps growing. Here the browser sends binary JPEG frames
+over one persistent connection and gets a JSON message back for each frame
+that was processed:
+
+    {"type": "detections", "seq": 42, "predictions": [...],
+     "server_ms": 38.1, "dropped": 3, "fps": 9.8}
+
+Each client keeps only its newest unprocessed frame. A frame that arrives
+while the previous one is still being detected replaces any frame already
+waiting, which is counted as dropped. So a slow model lowers the frame rate
+instead of adding latency. Frames from all clients still share batched
+forward passes through the pipeline's scheduler. `seq` is the frame's
+1-based position in what the client sent, so the client can compute
+end-to-end latency from its own send times. Inference options (conf, iou,
+classes, max_det, top_k) go in the query string of the WebSocket URL, e.g.
+/ws/detect?top_k=1, and apply to every frame of the connection.
+
+Needs the optional flask-sock package (pip install flask-sock). It works
+under the development server and gunicorn (gthread), but not under waitress,
+which can't upgrade connections.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+from flask import Blueprint, jsonify, request
+
+import config
+
+try:
+    from flask_sock import ConnectionClosed, Sock
+except ImportError:
+    Sock = None
+
+    class ConnectionClosed(Exception):
+        pass
+
+# Frames kept for the per-client FPS / latency window
+STATS_WINDOW = 30
+
+
+class StreamClient:
+    """One WebSocket connection: the newest waiting frame plus its counters"""
+
+    def __init__(self, client_id, option_values=None):
+        self.client_id = client_id
+        self.option_values = option_values or {}
+        self.connected_at = time.time()
+        self._changed = threading.Condition()
+        self._pending = None  # (seq, received_at, bytes)
+        self._closed = False
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._done_at = deque(maxlen=STATS_WINDOW)
+        self._latencies_ms = deque(maxlen=STATS_WINDOW)
+
+    def push(self, data):
+        """Store a new frame, replacing (and dropping) one that is still waiting"""
+        with self._changed:
+            self.received += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (self.received, time.monotonic(), data)
+            self._changed.notify()
+
+    def take(self, timeout):
+        """Newest waiting frame, or None after `timeout` / once closed"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._pending is not None or self._closed, timeout)
+            frame, self._pending = self._pending, None
+            return frame
+
+    def close(self):
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def record(self, latency_ms):
+        with self._changed:
+            self.processed += 1
+            self._done_at.append(time.monotonic())
+            self._latencies_ms.append(latency_ms)
+
+    def fps(self):
+        with self._changed:
+            if len(self._done_at) < 2:
+                return 0.0
+            span = self._done_at[-1] - self._done_at[0]
+            return (len(self._done_at) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        fps = self.fps()
+        with self._changed:
+            latencies = sorted(self._latencies_ms)
+            return {
+                "connected_s": round(time.time() - self.connected_at, 1),
+                "received": self.received,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "fps": round(fps, 1),
+                "latency_p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+                "latency_max_ms": round(latencies[-1], 1) if latencies else None
+            }
+
+
+class DetectStreamHub:
+    """Runs detection for every connected stream and keeps their stats"""
+
+    def __init__(self, max_clients=16):
+        self.max_clients = int(max_clients)
+        self.get_pipeline = lambda: None
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._next_id = 0
+        self._rejected = 0
+        self._finished = {"clients": 0, "processed": 0, "dropped": 0}
+
+    def attach(self, model_loader):
+        """Take the detection pipeline from the app's ModelLoader"""
+        self.get_pipeline = model_loader.get
+
+    def connect(self, option_values=None):
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                self._rejected += 1
+                return None
+            self._next_id += 1
+            client = StreamClient(f'ws-{self._next_id}', option_values)
+            self._clients[client.client_id] = client
+            return client
+
+    def disconnect(self, client):
+        client.close()
+        with self._lock:
+            if self._clients.pop(client.client_id, None) is not None:
+                self._finished["clients"] += 1
+                self._finished["processed"] += client.processed
+                self._finished["dropped"] += client.dropped
+
+    def run_detections(self, client, send):
+        """Worker loop for one client: detect the newest frame, send the result, repeat"""
+        from detection import DetectOptionsError, ImageInputError, QueueFullError, WorkerError
+        options = None
+        while not client.closed:
+            frame = client.take(timeout=1.0)
+            if frame is None:
+                continue
+            seq, received_at, data = frame
+            pipeline = self.get_pipeline()
+            if pipeline is None:
+                send({"type": "status", "status": "warming_up", "seq": seq})
+                continue
+            if options is None:
+                try:
+                    options = pipeline.parse_options(client.option_values)
+                except DetectOptionsError as e:
+                    send({"type": "error", "error": str(e)})
+                    client.close()
+                    break
+            try:
+                # client_id lets near-identical consecutive frames reuse the last result
+                result = pipeline.detect(data, client.client_id, options)
+            except ImageInputError as e:
+                client.errors += 1
+                send({"type": "error", "seq": seq, "error": str(e)})
+                continue
+            except (QueueFullError, WorkerError, TimeoutError) as e:
+                # Inference is overloaded: skip this frame, the next one is already on its way
+                client.errors += 1
+                send({"type": "error", "seq": seq, "error": str(e), "retry": True})
+                continue
+            except Exception as e:
+                # A model failure on one frame must not end the stream; report it and go on
+                print(f"❌ Live stream {client.client_id} frame {seq} failed: {e}")
+                client.errors += 1
+                send({"type": "error", "seq": seq, "error": str(e)})
+                continue
+            latency_ms = (time.monotonic() - received_at) * 1000.0
+            client.record(latency_ms)
+            send({
+                "type": "detections",
+                "seq": seq,
+                **result,
+                "server_ms": round(latency_ms, 1),
+                "dropped": client.dropped,
+                "fps": round(client.fps(), 1)
+            })
+
+    def serve(self, ws, option_values=None):
+        """Handle one WebSocket connection until the browser closes it"""
+        client = self.connect(option_values)
+        if client is None:
+            ws.send(json.dumps({"type": "error", "error": "Too many live streams, try again later"}))
+            return
+        send_lock = threading.Lock()
+
+        def send(message):
+            with send_lock:
+                ws.send(json.dumps(message))
+
+        worker = threading.Thread(target=self._run_worker, args=(client, send),
+                                  name=f'stream-{client.client_id}', daemon=True)
+        worker.start()
+        print(f"🎥 Live stream {client.client_id} connected")
+        try:
+            send({"type": "hello", "client_id": client.client_id})
+            while not client.closed:
+                data = ws.receive(timeout=1.0)
+                if isinstance(data, bytes):
+                    if len(data) > config.DETECT_STREAM_MAX_FRAME_BYTES:
+                        send({"type": "error", "error": "Frame too large"})
+                        continue
+                    client.push(data)
+        except ConnectionClosed:
+            pass
+        finally:
+            self.disconnect(client)
+            worker.join(timeout=config.DETECT_TIMEOUT_S)
+            print(f"🎥 Live stream {client.client_id} closed: {client.stats()}")
+
+    def _run_worker(self, client, send):
+        try:
+            self.run_detections(client, send)
+        except ConnectionClosed:
+            client.close()
+        except Exception as e:
+            # Never leave serve() accepting frames that nobody will process
+            print(f"❌ Live stream {client.client_id} worker stopped: {e}")
+            client.close()
+
+    def stats(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            return {
+                "available": Sock is not None,
+                "active": len(clients),
+                "rejected": self._rejected,
+                "finished": dict(self._finished),
+                "clients": {client.client_id: client.stats() for client in clients}
+            }
+
+
+stream_hub = DetectStreamHub(max_clients=config.DETECT_STREAM_MAX_CLIENTS)
+
+stream_blueprint = Blueprint('detect_stream', __name__)
+
+if Sock is not None:
+    sock = Sock()
+
+    @stream_blueprint.record_once
+    def _configure(state):
+        # Frames bigger than this are refused by the WebSocket layer itself
+        state.app.config.setdefault('SOCK_SERVER_OPTIONS', {
+            'max_message_size': config.DETECT_STREAM_MAX_FRAME_BYTES,
+            'ping_interval': 25
+        })
+
+    @sock.route('/ws/detect', bp=stream_blueprint)
+    def detect_stream(ws):
+        """WebSocket: binary JPEG frames in, JSON detections out"""
+        stream_hub.serve(ws, dict(request.args.items()))
+else:
+    @stream_blueprint.route('/ws/detect', methods=['GET'])
+    def detect_stream():
+        return jsonify({"error": "Live streaming needs flask-sock: pip install flask-sock"}), 501
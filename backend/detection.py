@@ -0,0 +1,236 @@
+"""Object detection pipeline behind /detect.
+
+Ties together the stages an upload goes through:
+
+    exact-bytes cache -> near-duplicate check -> tracker -> reduced decode
+    + letterbox -> batching scheduler -> inference engine -> boxes mapped
+    back to the upload
+
+detect_prepared() is the offline entry point (detect_batch.py): frames that
+are already letterboxed go straight to the engine as one batch.
+
+Importing this module pulls in OpenCV, NumPy and (when the engine starts)
+ultralytics, so app.py only imports it from the background model loader.
+"""
+import numpy as np
+
+import config
+from batching import BatchScheduler, QueueFullError  # noqa: F401 (re-exported for app.py)
+from detect_options import DetectOptionsError, default_options, parse_options  # noqa: F401 (re-exported for app.py)
+from frame_dedup import NearDuplicateCache, thumbnail, thumbnail_hash
+from frame_tracker import FrameTracker
+from imaging import ImageInputError, read_request_image_bytes  # noqa: F401 (re-exported for app.py)
+from inference_backends import load_backend
+from inference_engine import InProcessEngine, ProcessPoolEngine, WorkerError  # noqa: F401 (re-exported for app.py)
+from postprocess import class_name_array, predictions_to_arrays, select, to_arrays, to_predictions
+from preprocess import PAD_VALUE, Preprocessor
+from result_cache import DetectionCache
+
+
+def _no_progress(stage, fraction):
+    pass
+
+
+class DetectionPipeline:
+    """Everything /detect needs, built once the model is loaded"""
+
+    def __init__(self, progress=None):
+        report = progress or _no_progress
+
+        # yolov8n by default, small model for speed; runs on PyTorch, ONNX Runtime or OpenVINO
+        self.backend_options = {
+            "weights": config.DETECT_MODEL,
+            "imgsz": config.DETECT_IMGSZ,
+            "preference": config.DETECT_BACKEND,
+            "conf": config.DETECT_CONF,
+            "conf_tolerance": config.DETECT_PARITY_TOLERANCE,
+            "bench_runs": config.DETECT_BENCH_RUNS,
+            "calibration_dir": config.DETECT_QUANT_CALIB_DIR or None
+        }
+        report('loading_model', 0.1)
+        if config.DETECT_WORKERS > 0:
+            # Each worker process holds its own model copy and its own CPU threads
+            self.engine = ProcessPoolEngine(
+                config.DETECT_WORKERS,
+                self.backend_options,
+                max_batch_size=config.DETECT_BATCH_SIZE,
+                threads_per_worker=config.DETECT_WORKER_THREADS,
+                on_worker_ready=lambda ready, total: report('starting_workers', 0.1 + 0.8 * ready / total)
+            )
+        else:
+            self.engine = InProcessEngine(load_backend(**self.backend_options))
+
+        # conf / iou / classes / max_det / top_k for requests that don't set their own
+        self.default_options = default_options(self.names)
+
+        # Pay for allocator setup and graph optimization now, not on the first request
+        if config.DETECT_WARMUP_RUNS > 0:
+            report('warming_up', 0.9)
+            sizes = [config.DETECT_BATCH_SIZE] if config.DETECT_PIN_SHAPE else config.DETECT_WARMUP_BATCH_SIZES
+            warmup = self.engine.warm_up(sizes, config.DETECT_WARMUP_RUNS, **self.default_options.model_kwargs())
+            if warmup:
+                print(f"🔥 Warm-up done in {warmup['elapsed_s']:.1f}s: cold {warmup['cold_ms']} ms, "
+                      f"warm {warmup['warm_ms']} ms per batch size")
+        report('starting_pipeline', 0.95)
+
+        # Class id -> name, looked up for all boxes of a frame at once
+        self.class_names = class_name_array(self.engine.names)
+
+        # Uploads are decoded at reduced resolution and letterboxed to the model input size
+        self.preprocessor = Preprocessor(
+            imgsz=config.DETECT_IMGSZ,
+            pool_size=config.DETECT_QUEUE_DEPTH + config.DETECT_BATCH_SIZE
+        )
+
+        # Identical uploads (rescans, client retries) skip decode and inference
+        self.result_cache = DetectionCache(
+            max_entries=config.DETECT_CACHE_ENTRIES,
+            max_bytes=config.DETECT_CACHE_MAX_BYTES,
+            ttl_s=config.DETECT_CACHE_TTL_S
+        )
+
+        # Near-identical consecutive frames from one client reuse that client's last result
+        self.frame_dedup = NearDuplicateCache(
+            max_distance=config.DETECT_DEDUP_MAX_DISTANCE,
+            max_age_s=config.DETECT_DEDUP_MAX_AGE_S,
+            max_clients=config.DETECT_DEDUP_MAX_CLIENTS
+        )
+
+        # Between keyframes, a client's boxes follow the frame's motion instead of re-running YOLO
+        self.tracker = FrameTracker(
+            every=config.DETECT_TRACK_EVERY,
+            motion_threshold=config.DETECT_TRACK_MOTION,
+            max_shift=config.DETECT_TRACK_MAX_SHIFT,
+            max_age_s=config.DETECT_TRACK_MAX_AGE_S,
+            iou_threshold=config.DETECT_TRACK_IOU,
+            max_clients=config.DETECT_DEDUP_MAX_CLIENTS
+        )
+
+        # Frames from concurrent /detect requests share batched forward passes
+        self._pad_frame = None
+        if config.DETECT_PIN_SHAPE:
+            self._pad_frame = np.full((config.DETECT_IMGSZ, config.DETECT_IMGSZ, 3), PAD_VALUE, dtype=np.uint8)
+        self.scheduler = BatchScheduler(
+            self._run_batch,
+            max_batch_size=config.DETECT_BATCH_SIZE,
+            max_wait_ms=config.DETECT_BATCH_WAIT_MS,
+            max_queue_depth=config.DETECT_QUEUE_DEPTH,
+            concurrency=self.engine.concurrency
+        )
+        print(f"✅ YOLOv8 model loaded ({self.engine.backend_name} backend, {self.engine.mode})")
+
+    def _run_batch(self, images, options):
+        count = len(images)
+        if self._pad_frame is not None and count < config.DETECT_BATCH_SIZE:
+            # Always the same input shape, so the runtime never re-plans for a new batch size
+            images = images + [self._pad_frame] * (config.DETECT_BATCH_SIZE - count)
+        # conf, iou, classes and max_det are applied inside NMS
+        return self.engine.run_batch(images, **options.model_kwargs())[:count]
+
+    def parse_options(self, values):
+        """DetectOptions from request values, defaulting to the deployment's (raises DetectOptionsError)"""
+        return parse_options(values, self.names, self.default_options)
+
+    def detect_prepared(self, frames, options=None):
+        """Predictions for PreparedFrames run as one batch, skipping caches and the scheduler"""
+        options = options or self.default_options
+        results = self._run_batch([frame.image for frame in frames], options)
+        return [to_predictions(self.class_names, *self._select(result, frame, options))
+                for result, frame in zip(results, frames)]
+
+    @property
+    def names(self):
+        return self.engine.names
+
+    def detect(self, image_bytes, client_id=None, options=None, columns=False):
+        """Run one encoded image through the pipeline
+
+        Returns {"predictions": [...]} plus "cached" / "reused" / "tracked" when
+        the answer came from the exact-bytes cache, the client's previous frame
+        or the client's last keyframe moved by the estimated motion. With
+        columns=True the predictions come as count / classes / confidences /
+        boxes columns instead (see postprocess.to_arrays).
+        `options` (DetectOptions, see parse_options) defaults to the deployment's.
+        Raises ImageInputError, QueueFullError, WorkerError or TimeoutError.
+        """
+        options = options or self.default_options
+        cache_key = DetectionCache.make_key(image_bytes, config.DETECT_MODEL, options, config.DETECT_IMGSZ)
+        # Reuse across frames only between requests with the same model and options
+        reuse_key = cache_key[1:]
+        if columns:
+            # Column and per-box bodies are cached apart
+            cache_key += ('arrays',)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡ Cache hit, {cached['count'] if columns else len(cached['predictions'])} objects")
+            return {**cached, "cached": True}
+
+        thumb = None
+        if client_id and (self.frame_dedup.enabled or self.tracker.enabled):
+            thumb = thumbnail(image_bytes)
+        frame_hash = thumbnail_hash(thumb) if self.frame_dedup.enabled else None
+        reused = self.frame_dedup.lookup(client_id, frame_hash, reuse_key)
+        if reused is not None:
+            print(f"⚡ Near-duplicate frame, reusing {len(reused)} objects")
+            return {**self._body(reused, columns), "reused": True}
+
+        tracked = self.tracker.predict(client_id, thumb, reuse_key)
+        if tracked is not None:
+            print(f"⚡ Stable scene, tracking {len(tracked)} objects")
+            return {**self._body(tracked, columns), "tracked": True}
+
+        frame = None
+        try:
+            print("📥 Received image, decoding...")
+            frame = self.preprocessor(image_bytes)
+
+            print("🔍 Running YOLO detection...")
+            # Run inference (batched with other waiting requests)
+            result = self.scheduler.submit(frame.image, timeout=config.DETECT_TIMEOUT_S, group=options)
+            selected = self._select(result, frame, options)
+        except TimeoutError:
+            # A batch may already be reading the frame, so its buffer can't be reused
+            self.preprocessor.discard(frame)
+            raise
+        finally:
+            # The model is done with the letterbox buffer, let the next request reuse it
+            self.preprocessor.release(frame)
+
+        print(f"✅ Found {len(selected[0])} objects")
+        if columns and thumb is None:
+            # No per-client frame state to keep, so no dict per box is ever built
+            body = to_arrays(self.class_names, *selected)
+            self.result_cache.put(cache_key, body)
+            return body
+
+        # The near-duplicate cache and the tracker keep per-box dicts
+        detections = to_predictions(self.class_names, *selected)
+        self.result_cache.put(cache_key, self._body(detections, columns))
+        detections = self.tracker.record(client_id, thumb, reuse_key, detections)
+        self.frame_dedup.record(client_id, frame_hash, reuse_key, detections)
+        return self._body(detections, columns)
+
+    def _select(self, result, frame, options):
+        # Rows are x1, y1, x2, y2, confidence, class in letterbox space;
+        # keep the best top_k, highest confidence first, and map their boxes
+        # onto the uploaded image. Returns (class_ids, confidences, boxes).
+        rows = result[select(result, options.conf, options.top_k)]
+        return rows[:, 5].astype(np.intp), rows[:, 4], frame.to_original(rows[:, :4])
+
+    @staticmethod
+    def _body(detections, columns):
+        return predictions_to_arrays(detections) if columns else {"predictions": detections}
+
+    def stats(self):
+        return {
+            "engine": self.engine.stats(),
+            "default_options": self.default_options._asdict(),
+            "preprocess": self.preprocessor.stats(),
+            "cache": self.result_cache.stats(),
+            "dedup": self.frame_dedup.stats(),
+            "tracker": self.tracker.stats(),
+            "detect": self.scheduler.stats()
+        }
+
+    def close(self):
+        self.engine.close()
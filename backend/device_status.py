@@ -0,0 +1,186 @@
+"""In-memory device status for /api/phone/status and /api/voice/status.
+
+The voice-control page checks the phone status every few seconds from every
+open tab. Here one watcher holds the current device list: the adb tracker
+pushes changes into it, and if the tracker is down it refreshes from the adb
+server at most once per PHONE_STATUS_TTL_S. Status requests are answered
+from memory, and GET /api/phone/status/events streams every change as
+server-sent events, so pages can subscribe instead of polling.
+
+phone_status_response() and voice_status_response() build the two status
+routes' answers from that snapshot, so every entry point returns the same
+shape.
+"""
+import json
+import threading
+import time
+
+from flask import Blueprint, Response, jsonify
+
+import config
+from adb_client import AdbError, adb
+from devices import registry
+
+
+class DeviceStatusWatcher:
+    """Current device state, refreshed by tracker pushes (or a TTL when the tracker is down)"""
+
+    def __init__(self, manager, registry, ttl_s=2.0, keepalive_s=15.0):
+        self.manager = manager
+        self.registry = registry
+        self.ttl_s = float(ttl_s)
+        self.keepalive_s = float(keepalive_s)
+        self._changed = threading.Condition()
+        self._started = False
+        self._devices = {}
+        self._tracking = False
+        self._updated_at = 0.0
+        self._version = 0
+        self._subscribers = 0
+        self._refreshes = 0
+
+    def start(self):
+        with self._changed:
+            if self._started:
+                return
+            self._started = True
+        self.manager.add_listener(self._on_change)
+        self.manager.start()
+        # Seed from the tracker's first list (waits up to ADB_SYNC_TIMEOUT_S once)
+        self._on_change(self.manager.devices(), self.manager.stats()["tracking"])
+
+    def _on_change(self, devices, tracking):
+        with self._changed:
+            self._updated_at = time.time()
+            if devices == self._devices and tracking == self._tracking:
+                return
+            self._devices = devices
+            self._tracking = tracking
+            self._version += 1
+            self._changed.notify_all()
+
+    def _refresh_if_stale(self):
+        # The tracker keeps the list live; only ask the server directly when it's down
+        with self._changed:
+            if self._tracking or time.time() - self._updated_at < self.ttl_s:
+                return
+            self._updated_at = time.time()
+            self._refreshes += 1
+        try:
+            devices = self.manager.server.devices()
+        except (OSError, AdbError):
+            devices = {}
+        self._on_change(devices, False)
+
+    def _snapshot(self):
+        online = [serial for serial, state in self._devices.items() if state == 'device']
+        default = self.registry.default_device
+        return {
+            "connected": bool(online),
+            "device": default if default in online else (online[0] if online else None),
+            "devices": dict(self._devices),
+            "online": online,
+            "tracking": self._tracking,
+            "updated_at": self._updated_at,
+            "version": self._version
+        }
+
+    def snapshot(self):
+        """Current status, straight from memory"""
+        self.start()
+        self._refresh_if_stale()
+        with self._changed:
+            return self._snapshot()
+
+    def events(self):
+        """Yield the status now and after every change; None means "nothing new" (keep-alive)"""
+        self.start()
+        with self._changed:
+            self._subscribers += 1
+        seen = None
+        try:
+            while True:
+                self._refresh_if_stale()
+                with self._changed:
+                    if self._version == seen:
+                        self._changed.wait_for(lambda: self._version != seen, min(self.keepalive_s, self.ttl_s))
+                    if self._version == seen:
+                        snapshot = None
+                    else:
+                        seen = self._version
+                        snapshot = self._snapshot()
+                yield snapshot
+        finally:
+            with self._changed:
+                self._subscribers -= 1
+
+    def stats(self):
+        with self._changed:
+            return {
+                "subscribers": self._subscribers,
+                "version": self._version,
+                "ttl_refreshes": self._refreshes,
+                "age_s": round(time.time() - self._updated_at, 3) if self._updated_at else None
+            }
+
+
+status_watcher = DeviceStatusWatcher(adb, registry, config.PHONE_STATUS_TTL_S, config.PHONE_STATUS_KEEPALIVE_S)
+
+
+def phone_status_response(target=None, disconnected_status=500):
+    """/api/phone/status: the requested (or default / first online) device, served from memory
+
+    Entry points answered "no device" with different status codes before they
+    shared this function (500 for app.py / app_voice_only.py, 200 for
+    app_clean.py / server.py); each passes its own so clients keep working.
+    """
+    status = status_watcher.snapshot()
+    device = target or status["device"]
+    if device and device in status["online"]:
+        return jsonify({
+            "status": "connected",
+            "connected": True,
+            "device": device,
+            "devices": status["online"],
+            "connection": "Bluetooth/USB"
+        })
+    return jsonify({
+        "status": "disconnected",
+        "connected": False,
+        "device": None,
+        "message": "No Android device found. Make sure phone is connected and ADB debugging is enabled."
+    }), disconnected_status
+
+
+def voice_status_response():
+    """/api/voice/status, served from memory"""
+    status = status_watcher.snapshot()
+    device = status["device"]
+    return jsonify({
+        "status": "ready" if device else "disconnected",
+        "phone_connected": device is not None,
+        "device": device,
+        "devices": status["online"],
+        "features": ["call", "message", "send_message"],
+        "language": "en-IN",
+        "connection_type": "Bluetooth/USB via ADB"
+    })
+
+
+status_blueprint = Blueprint('device_status', __name__)
+
+
+@status_blueprint.route('/api/phone/status/events', methods=['GET'])
+def status_events():
+    """Server-sent events: the device status now and on every change"""
+    def stream():
+        last_keepalive = time.monotonic()
+        for snapshot in status_watcher.events():
+            if snapshot is not None:
+                yield f'data: {json.dumps(snapshot)}\n\n'
+            elif time.monotonic() - last_keepalive >= status_watcher.keepalive_s:
+                # Comment lines keep proxies from closing an idle stream
+                last_keepalive = time.monotonic()
+                yield ': keepalive\n\n'
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
@@ -0,0 +1,93 @@
+"""Registry of the handsets attached to this host.
+
+Phone routes used to act on whichever device `adb devices` listed first.
+Here every device is keyed by its serial (USB serial or ip:port for
+wireless debugging), so a request can name its target. "all" (or a list of
+serials) fans one action out to several devices, and each device runs on
+its own job queue, so they work in parallel.
+"""
+import threading
+
+import config
+from adb_client import adb
+
+BROADCAST = 'all'
+
+
+class DeviceNotFoundError(LookupError):
+    """Raised when the requested device isn't connected (or none is)"""
+
+
+class DeviceRegistry:
+    """Current devices from the adb tracker, plus per-device details fetched once"""
+
+    def __init__(self, manager, default_device=''):
+        self.manager = manager
+        self.default_device = default_device
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def online(self):
+        """Serials of every device that is ready for commands"""
+        return [serial for serial, state in self.manager.devices().items() if state == 'device']
+
+    def model(self, serial):
+        """Product model of a device (read once with getprop, then cached)"""
+        with self._lock:
+            if serial in self._models:
+                return self._models[serial]
+        success, stdout, stderr = self.manager.shell(serial, 'getprop ro.product.model')
+        model = stdout.strip() if success else None
+        with self._lock:
+            self._models[serial] = model
+        return model
+
+    def list(self):
+        devices = []
+        for serial, state in self.manager.devices().items():
+            devices.append({
+                "serial": serial,
+                "state": state,
+                "online": state == 'device',
+                "transport": "wireless" if ':' in serial else "usb",
+                "model": self.model(serial) if state == 'device' else None,
+                "default": serial == self.default_device
+            })
+        return devices
+
+    def resolve(self, target=None):
+        """Serial to act on: the named device, else the default, else the first online one"""
+        online = self.online()
+        if target:
+            if target not in online:
+                raise DeviceNotFoundError(f"Device {target} is not connected")
+            return target
+        if self.default_device in online:
+            return self.default_device
+        if not online:
+            raise DeviceNotFoundError("Phone not connected")
+        return online[0]
+
+    def address(self, device=None, ip=None, port=None):
+        """ip:port for adb connect: `device`, else `ip` (+ `port`), else the default device's address"""
+        if device:
+            return str(device)
+        default_ip, _, default_port = self.default_device.partition(':')
+        ip = ip or default_ip
+        if not ip:
+            raise DeviceNotFoundError("No device address given and PHONE_DEFAULT_DEVICE is not set")
+        return f"{ip}:{port or default_port or '5555'}"
+
+    def resolve_many(self, target):
+        """Serials for a target that may be a serial, a list of serials or "all" """
+        if target == BROADCAST:
+            online = self.online()
+            if not online:
+                raise DeviceNotFoundError("Phone not connected")
+            return online
+        if isinstance(target, (list, tuple)) and target:
+            return list(dict.fromkeys(self.resolve(serial) for serial in target))
+        return [self.resolve(target)]
+
+
+registry = DeviceRegistry(adb, config.PHONE_DEFAULT_DEVICE)
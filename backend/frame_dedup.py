@@ -0,0 +1,104 @@
+"""Near-duplicate frame detection for continuous scanning.
+
+Consecutive camera frames of the same object look the same but never hash
+the same after JPEG encoding. Each client's last frame is summarised with a
+64-bit difference hash (dHash) computed from a 1/8-scale grayscale decode.
+If a new frame from that client is within a few bits of the previous one, and
+the previous result is recent enough, its detections are reused.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8
+
+
+# thumbnail() decodes at 1/THUMBNAIL_SCALE of the original size
+THUMBNAIL_SCALE = 8
+
+
+def thumbnail(buf):
+    """1/8-scale grayscale decode of an encoded image, or None if it can't be decoded"""
+    nparr = np.frombuffer(buf, np.uint8)
+    if nparr.size == 0:
+        return None
+    # libjpeg can scale by 1/8 while decoding, far cheaper than a full decode
+    return cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+
+
+def dhash(buf):
+    """64-bit difference hash of an encoded image, or None if it can't be decoded"""
+    return thumbnail_hash(thumbnail(buf))
+
+
+def thumbnail_hash(img):
+    """dHash of a thumbnail() image (None passes through)"""
+    if img is None:
+        return None
+    small = cv2.resize(img, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateCache:
+    """Remembers the last frame hash and detections per client"""
+
+    def __init__(self, max_distance=4, max_age_s=1.0, max_clients=256):
+        self.max_distance = int(max_distance)
+        self.max_age = float(max_age_s)
+        self.max_clients = int(max_clients)
+        self._clients = OrderedDict()  # client_id -> (hash, options, recorded_at, detections)
+        self._lock = threading.Lock()
+        self._checks = 0
+        self._skipped = 0
+
+    @property
+    def enabled(self):
+        return self.max_age > 0 and self.max_distance >= 0 and self.max_clients > 0
+
+    def lookup(self, client_id, frame_hash, options):
+        """Return the client's previous detections if this frame is a near-duplicate"""
+        if not self.enabled or frame_hash is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._checks += 1
+            entry = self._clients.get(client_id)
+            if entry is None:
+                return None
+            last_hash, last_options, recorded_at, detections = entry
+            if last_options != options or now - recorded_at > self.max_age:
+                return None
+            if hamming(frame_hash, last_hash) > self.max_distance:
+                return None
+            self._skipped += 1
+            return detections
+
+    def record(self, client_id, frame_hash, options, detections):
+        """Remember the detections computed for a client's latest frame"""
+        if not self.enabled or frame_hash is None:
+            return
+        with self._lock:
+            self._clients[client_id] = (frame_hash, options, time.monotonic(), detections)
+            self._clients.move_to_end(client_id)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_distance": self.max_distance,
+                "max_age_s": self.max_age,
+                "clients": len(self._clients),
+                "checks": self._checks,
+                "skipped": self._skipped,
+                "skip_rate": self._skipped / self._checks if self._checks else 0.0
+            }
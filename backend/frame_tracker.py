@@ -0,0 +1,176 @@
+"""Track detections between frames so YOLO can skip stable scenes.
+
+In continuous scanning most frames show the same object, only a few pixels
+further along. For each client the tracker keeps the last frame YOLO ran on
+(the keyframe) as a 1/8-scale grayscale thumbnail, plus its boxes. For a new
+frame it:
+
+  1. estimates the global shift from the keyframe by phase correlation (a
+     cheap dense optical flow for whole-frame motion: hand shake, slow pans,
+     an object sliding across the view),
+  2. aligns the keyframe by that shift and measures what is left: the mean
+     absolute grayscale difference (0-255),
+  3. if that residual motion is under the threshold, the shift is small and
+     the keyframe is fewer than K frames and max_age_s old, returns the
+     keyframe's boxes moved by the shift instead of running YOLO.
+
+Otherwise the frame becomes the next keyframe. Its detections are matched to
+the previous keyframe's by IoU (same class, greedy), so an object keeps its
+track_id while it stays in view.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from frame_dedup import THUMBNAIL_SCALE
+
+# Frame border ignored by the residual, where the shift moves content out of view
+MARGIN = 0.1
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def estimate_motion(key, frame):
+    """(dx, dy, residual) of `frame` against the keyframe, in thumbnail pixels"""
+    (dx, dy), _ = cv2.phaseCorrelate(key, frame)
+    h, w = frame.shape
+    shift = np.float32([[1, 0, dx], [0, 1, dy]])
+    aligned = cv2.warpAffine(key, shift, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    my, mx = int(h * MARGIN) + 1, int(w * MARGIN) + 1
+    residual = float(cv2.absdiff(aligned, frame)[my:h - my, mx:w - mx].mean())
+    return dx, dy, residual
+
+
+class _Keyframe:
+    __slots__ = ('thumb', 'options', 'recorded_at', 'frames_since', 'tracks')
+
+    def __init__(self, thumb, options, tracks):
+        self.thumb = thumb
+        self.options = options
+        self.recorded_at = time.monotonic()
+        self.frames_since = 0
+        self.tracks = tracks  # detections with a "track_id"
+
+
+class FrameTracker:
+    """Per-client keyframes; moves their boxes onto frames YOLO skips"""
+
+    def __init__(self, every=0, motion_threshold=8.0, max_shift=0.25, max_age_s=1.0,
+                 iou_threshold=0.3, max_clients=256):
+        self.every = int(every)
+        self.motion_threshold = float(motion_threshold)
+        self.max_shift = float(max_shift)
+        self.max_age = float(max_age_s)
+        self.iou_threshold = float(iou_threshold)
+        self.max_clients = int(max_clients)
+        self._clients = OrderedDict()  # client_id -> _Keyframe
+        self._lock = threading.Lock()
+        self._next_track_id = 0
+        self._checks = 0
+        self._tracked = 0
+        self._keyframes = {"new": 0, "interval": 0, "motion": 0, "stale": 0}
+
+    @property
+    def enabled(self):
+        return self.every > 1 and self.max_age > 0 and self.max_clients > 0
+
+    def predict(self, client_id, thumb, options):
+        """Keyframe boxes moved onto this frame, or None when YOLO has to run"""
+        if not self.enabled or thumb is None:
+            return None
+        with self._lock:
+            self._checks += 1
+            key = self._clients.get(client_id)
+            reason = self._keyframe_reason(key, thumb, options)
+            if reason is not None:
+                self._keyframes[reason] += 1
+                return None
+
+        frame = thumb.astype(np.float32)
+        dx, dy, residual = estimate_motion(key.thumb, frame)
+        h, w = frame.shape
+        if residual > self.motion_threshold or abs(dx) > self.max_shift * w or abs(dy) > self.max_shift * h:
+            with self._lock:
+                self._keyframes["motion"] += 1
+            return None
+
+        with self._lock:
+            key.frames_since += 1
+            self._tracked += 1
+        ox, oy = dx * THUMBNAIL_SCALE, dy * THUMBNAIL_SCALE
+        width, height = w * THUMBNAIL_SCALE, h * THUMBNAIL_SCALE
+        return [{
+            **track,
+            "box": [round(min(max(v + o, 0.0), limit), 1)
+                    for v, o, limit in zip(track["box"], (ox, oy, ox, oy), (width, height, width, height))],
+            "tracked": True
+        } for track in key.tracks]
+
+    def _keyframe_reason(self, key, thumb, options):
+        if key is None or key.options != options or key.thumb.shape != thumb.shape:
+            return "new"
+        if time.monotonic() - key.recorded_at > self.max_age:
+            return "stale"
+        if key.frames_since + 1 >= self.every:
+            return "interval"
+        return None
+
+    def record(self, client_id, thumb, options, detections):
+        """Make this frame the client's keyframe; returns the detections with track IDs"""
+        if not self.enabled or thumb is None:
+            return detections
+        with self._lock:
+            previous = self._clients.get(client_id)
+            tracks = self._match(previous.tracks if previous is not None else [], detections)
+            self._clients[client_id] = _Keyframe(thumb.astype(np.float32), options, tracks)
+            self._clients.move_to_end(client_id)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return tracks
+
+    def _match(self, previous, detections):
+        """Carry track IDs over from the previous keyframe by IoU, same class only"""
+        pairs = sorted(
+            ((box_iou(old["box"], new["box"]), i, j)
+             for i, old in enumerate(previous)
+             for j, new in enumerate(detections)
+             if old["class"] == new["class"]),
+            reverse=True)
+        ids = {}
+        used = set()
+        for iou, i, j in pairs:
+            if iou < self.iou_threshold:
+                break
+            if i in used or j in ids:
+                continue
+            used.add(i)
+            ids[j] = previous[i]["track_id"]
+        tracks = []
+        for j, detection in enumerate(detections):
+            if j not in ids:
+                self._next_track_id += 1
+                ids[j] = self._next_track_id
+            tracks.append({**detection, "track_id": ids[j]})
+        return tracks
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "every": self.every,
+                "motion_threshold": self.motion_threshold,
+                "clients": len(self._clients),
+                "checks": self._checks,
+                "tracked": self._tracked,
+                "skip_rate": self._tracked / self._checks if self._checks else 0.0,
+                "keyframes": dict(self._keyframes)
+            }
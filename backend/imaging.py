@@ -0,0 +1,73 @@
+"""Image input helpers for the /detect endpoint.
+
+/detect accepts three kinds of request body:
+  * raw image bytes (Content-Type: image/* or application/octet-stream)
+  * multipart/form-data with the image in an "image" file field
+  * JSON {"image": "data:image/jpeg;base64,..."} as sent by older scanners
+
+The binary forms are decoded straight from the request buffer, skipping the
+base64 step and the ~33% size overhead of data URLs.
+"""
+import base64
+
+import cv2
+import numpy as np
+
+
+class ImageInputError(ValueError):
+    """Raised when a request does not contain a usable image"""
+
+
+def decode_image_bytes(buf, flags=cv2.IMREAD_COLOR):
+    """Decode an encoded image from any bytes-like object without copying it"""
+    nparr = np.frombuffer(buf, np.uint8)
+    if nparr.size == 0:
+        raise ImageInputError("Empty image")
+    img = cv2.imdecode(nparr, flags)
+    if img is None:
+        raise ImageInputError("Could not decode image")
+    return img
+
+
+def data_url_to_bytes(image_data):
+    """Strip the data URL prefix (if any) and base64-decode the payload"""
+    encoded_data = image_data.split(',', 1)[1] if ',' in image_data else image_data
+    try:
+        return base64.b64decode(encoded_data)
+    except ValueError as e:
+        raise ImageInputError(f"Invalid base64 image: {e}")
+
+
+def _buffer_from_stream(stream):
+    # In-memory uploads expose their buffer directly, larger ones are spooled to disk
+    getbuffer = getattr(stream, 'getbuffer', None)
+    if getbuffer is not None:
+        return getbuffer()
+    return stream.read()
+
+
+def read_request_image_bytes(request):
+    """Return the encoded image carried by a Flask request, whichever form it uses"""
+    mimetype = request.mimetype
+
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        buf = request.get_data(cache=False)
+        if not buf:
+            raise ImageInputError("No image provided")
+        return buf
+
+    if mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        if upload is None:
+            raise ImageInputError("No image provided")
+        return _buffer_from_stream(upload.stream)
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ImageInputError("No image provided")
+    image_data = data.get('image')
+    if not image_data:
+        raise ImageInputError("No image provided")
+    if not isinstance(image_data, str):
+        raise ImageInputError("image must be a base64 string or data URL")
+    return data_url_to_bytes(image_data)
@@ -0,0 +1,295 @@
+"""Pluggable inference backends for YOLO.
+
+Every backend wraps an ultralytics YOLO model, so results (boxes, classes,
+confidences) come back in the same form whichever runtime does the work:
+
+  * torch     - the .pt weights on PyTorch (always available)
+  * onnx      - ONNX export run by ONNX Runtime (needs `onnxruntime`)
+  * openvino  - OpenVINO IR export (needs `openvino`)
+  * onnx-int8 / onnx-fp16 - quantized copies of the ONNX export (opt-in,
+                never picked by auto; see quantize.py)
+
+ONNX / OpenVINO artifacts are exported next to the weights on first start
+and reused afterwards. With DETECT_BACKEND=auto, every available backend is
+timed on a few frames at startup, backends whose output drifts from PyTorch
+are dropped, and the fastest remaining one is used. Only the fastest so far
+is kept loaded while the others are tried, and the losers are released
+before serving starts, so the process holds a single copy of the model.
+"""
+import gc
+import importlib.util
+import os
+import time
+
+import numpy as np
+
+
+class InferenceBackend:
+    """Base class: loads a YOLO model for one runtime and runs batches through it"""
+
+    name = None
+    # Python packages the runtime needs, checked before trying to load
+    requires = ()
+    # Opt-in backends are only used when asked for by name, never by auto
+    opt_in = False
+    # Filled in by load_backend('auto'): median ms/frame of every backend tried
+    startup_benchmark_ms = None
+
+    def __init__(self, weights, imgsz=640):
+        self.weights = weights
+        self.imgsz = int(imgsz)
+        self.model = None
+
+    @classmethod
+    def is_available(cls):
+        return all(importlib.util.find_spec(package) is not None for package in cls.requires)
+
+    def artifact_path(self):
+        """Path of the file/directory this backend loads"""
+        return self.weights
+
+    def prepare(self):
+        """Create the artifact if it doesn't exist yet (no-op for PyTorch)"""
+        return self.artifact_path()
+
+    def load(self):
+        from ultralytics import YOLO
+        path = self.prepare()
+        print(f"⏳ Loading {self.name} backend from {path}...")
+        self.model = YOLO(path, task='detect')
+        return self
+
+    def release(self):
+        """Drop the loaded model so its memory can be reclaimed"""
+        self.model = None
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def __call__(self, images, **kwargs):
+        kwargs.setdefault('imgsz', self.imgsz)
+        kwargs.setdefault('verbose', False)
+        return self.model(images, **kwargs)
+
+
+class TorchBackend(InferenceBackend):
+    name = 'torch'
+
+
+class _ExportedBackend(InferenceBackend):
+    """Backend that runs an artifact exported from the .pt weights"""
+
+    export_format = None
+    suffix = None
+
+    def artifact_path(self):
+        stem, _ = os.path.splitext(self.weights)
+        return stem + self.suffix
+
+    def prepare(self):
+        path = self.artifact_path()
+        if os.path.exists(path):
+            return path
+        from ultralytics import YOLO
+        print(f"📦 Exporting {self.weights} to {self.export_format} (first start only)...")
+        # dynamic=True keeps the batch dimension open for the batching scheduler
+        exported = YOLO(self.weights).export(format=self.export_format, imgsz=self.imgsz, dynamic=True)
+        if exported and os.path.abspath(str(exported)) != os.path.abspath(path):
+            path = str(exported)
+        print(f"✅ Exported {path}")
+        return path
+
+
+class OnnxBackend(_ExportedBackend):
+    name = 'onnx'
+    requires = ('onnxruntime',)
+    export_format = 'onnx'
+    suffix = '.onnx'
+
+
+class OpenVinoBackend(_ExportedBackend):
+    name = 'openvino'
+    requires = ('openvino',)
+    export_format = 'openvino'
+    suffix = '_openvino_model'
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    """ONNX Runtime on a reduced-precision copy of the ONNX export"""
+
+    opt_in = True
+    precision = None
+
+    def __init__(self, weights, imgsz=640, calibration_dir=None):
+        super().__init__(weights, imgsz)
+        # Folder of sample frames for static INT8 quantization; dynamic without one
+        self.calibration_dir = calibration_dir
+
+    @staticmethod
+    def variant(precision):
+        return {'int8': Int8OnnxBackend, 'fp16': Fp16OnnxBackend}[precision]
+
+    def artifact_path(self):
+        stem, _ = os.path.splitext(self.weights)
+        return f"{stem}_{self.precision}.onnx"
+
+    def prepare(self):
+        path = self.artifact_path()
+        if os.path.exists(path):
+            return path
+        import quantize
+        fp32_path = OnnxBackend(self.weights, self.imgsz).prepare()
+        if self.precision == 'int8':
+            quantize.quantize_int8(fp32_path, path, self.calibration_dir, self.imgsz)
+        else:
+            quantize.convert_fp16(fp32_path, path)
+        print(f"✅ Wrote {path}")
+        return path
+
+
+class Int8OnnxBackend(QuantizedOnnxBackend):
+    name = 'onnx-int8'
+    requires = ('onnxruntime', 'onnx')
+    precision = 'int8'
+
+
+class Fp16OnnxBackend(QuantizedOnnxBackend):
+    name = 'onnx-fp16'
+    requires = ('onnxruntime', 'onnx', 'onnxconverter_common')
+    precision = 'fp16'
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+    Int8OnnxBackend.name: Int8OnnxBackend,
+    Fp16OnnxBackend.name: Fp16OnnxBackend
+}
+
+
+def sample_frames(imgsz=640, count=2):
+    """Frames for benchmarking and parity checks
+
+    Uses the sample photos bundled with ultralytics when present, since random
+    noise produces almost no detections to compare.
+    """
+    import cv2
+    frames = []
+    try:
+        from ultralytics.utils import ASSETS
+        for path in sorted(ASSETS.glob('*.jpg'))[:count]:
+            img = cv2.imread(str(path))
+            if img is not None:
+                frames.append(img)
+    except ImportError:
+        pass
+    rng = np.random.default_rng(0)
+    while len(frames) < count:
+        frames.append(rng.integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8))
+    return frames
+
+
+def benchmark(backend, frames, runs=10, **kwargs):
+    """Median single-frame latency of a backend in milliseconds"""
+    backend(frames[0], **kwargs)  # first call pays for graph setup
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        backend(frames[i % len(frames)], **kwargs)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def _box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _detections(result):
+    boxes = result.boxes
+    return list(zip(
+        boxes.cls.cpu().numpy().astype(int).tolist(),
+        boxes.conf.cpu().numpy().tolist(),
+        boxes.xyxy.cpu().numpy().tolist()
+    ))
+
+
+def compare_results(reference, candidate, conf_tolerance=0.05, min_iou=0.8, conf_threshold=0.25):
+    """Check that candidate results match reference results within tolerance
+
+    Every reference box clearly above the threshold must have a same-class box
+    in the candidate with IoU >= min_iou and a confidence within conf_tolerance
+    (and vice versa). Boxes near the threshold may legitimately appear in only
+    one of them. Returns a list of mismatch descriptions (empty when in parity).
+    """
+    problems = []
+    margin = conf_threshold + conf_tolerance
+    for frame_index, (ref, cand) in enumerate(zip(reference, candidate)):
+        ref_dets, cand_dets = _detections(ref), _detections(cand)
+        for label, source, other in (('missing', ref_dets, cand_dets), ('extra', cand_dets, ref_dets)):
+            for cls, conf, box in source:
+                if conf < margin:
+                    continue
+                match = any(
+                    o_cls == cls and _box_iou(box, o_box) >= min_iou and abs(o_conf - conf) <= conf_tolerance
+                    for o_cls, o_conf, o_box in other
+                )
+                if not match:
+                    problems.append(f"frame {frame_index}: {label} class {cls} conf {conf:.3f}")
+    return problems
+
+
+def load_backend(weights, imgsz=640, preference='auto', conf=0.25, conf_tolerance=0.05, bench_runs=10,
+                 calibration_dir=None):
+    """Load the requested backend, or the fastest one in parity with PyTorch for 'auto'"""
+    if preference != 'auto':
+        backend_cls = BACKENDS.get(preference)
+        if backend_cls is None:
+            raise ValueError(f"Unknown inference backend '{preference}', choose from {', '.join(BACKENDS)} or auto")
+        if issubclass(backend_cls, QuantizedOnnxBackend):
+            return backend_cls(weights, imgsz, calibration_dir=calibration_dir).load()
+        return backend_cls(weights, imgsz).load()
+
+    frames = sample_frames(imgsz)
+    reference = TorchBackend(weights, imgsz).load()
+    reference_results = reference(frames, conf=conf)
+    timings = {reference.name: benchmark(reference, frames, bench_runs, conf=conf)}
+    # Only the fastest backend so far stays loaded; every other one is released once it loses
+    fastest = backend = reference
+
+    for name, backend_cls in BACKENDS.items():
+        if name == reference.name or backend_cls.opt_in:
+            continue
+        if not backend_cls.is_available():
+            print(f"ℹ️ {name} backend skipped ({', '.join(backend_cls.requires)} not installed)")
+            continue
+        backend = backend_cls(weights, imgsz)
+        try:
+            backend.load()
+            problems = compare_results(reference_results, backend(frames, conf=conf),
+                                       conf_tolerance=conf_tolerance, conf_threshold=conf)
+            if problems:
+                print(f"⚠️ {name} backend output differs from torch, not using it: {problems[:3]}")
+                continue
+            timings[name] = benchmark(backend, frames, bench_runs, conf=conf)
+            if timings[name] < timings[fastest.name]:
+                backend, fastest = fastest, backend
+        except Exception as e:
+            print(f"⚠️ {name} backend unavailable: {e}")
+        finally:
+            # The slower (or rejected) one; later parity checks only need reference_results
+            backend.release()
+
+    for name, ms in sorted(timings.items(), key=lambda item: item[1]):
+        print(f"   {name:<9} {ms:7.1f} ms/frame")
+    del reference, reference_results, backend
+    gc.collect()
+    print(f"✅ Using {fastest.name} inference backend")
+    fastest.startup_benchmark_ms = timings
+    return fastest
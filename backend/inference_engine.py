@@ -0,0 +1,423 @@
+"""Inference engines behind the /detect batching scheduler.
+
+Both engines take a batch of letterboxed frames and return, per frame, an
+(N, 6) float32 array of detections: x1, y1, x2, y2, confidence, class id.
+
+  * InProcessEngine  - runs the model inside the server process
+  * ProcessPoolEngine - N worker processes, each loading the model once.
+    Frames are written into a shared-memory slot owned by the worker, so only
+    a tiny (batch size, options) message crosses the pipe; detections come
+    back as small arrays. A worker that dies is taken out of the pool and
+    restarted on a background thread, one restart at a time.
+
+Both can be warmed up with synthetic frames before serving, so the first real
+request doesn't pay for allocator setup and graph optimization; the cold
+(first pass) and warm latencies per batch size are kept for the metrics.
+
+Workers are started as separate Python processes running this file (not via
+multiprocessing's spawn, which would re-import app.py and load everything
+twice).
+"""
+import atexit
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+
+def _result_arrays(results):
+    return [r.boxes.data.cpu().numpy().astype(np.float32, copy=False) for r in results]
+
+
+def _time_warmup(run_batch, imgsz, batch_sizes, runs):
+    """Run `runs` synthetic batches of every size; returns {batch_size: [ms per pass]}"""
+    rng = np.random.default_rng(0)
+    timings = {}
+    for batch_size in batch_sizes:
+        images = [rng.integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8) for _ in range(batch_size)]
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            run_batch(images)
+            samples.append((time.perf_counter() - started) * 1000.0)
+        timings[batch_size] = samples
+    return timings
+
+
+def _warmup_summary(timings_per_runner, started):
+    """Cold (first pass) and warm (median of the rest) ms per batch size"""
+    summary = {"elapsed_s": round(time.perf_counter() - started, 3), "cold_ms": {}, "warm_ms": {}}
+    for batch_size in timings_per_runner[0]:
+        cold = [t[batch_size][0] for t in timings_per_runner]
+        warm = sorted(ms for t in timings_per_runner for ms in t[batch_size][1:])
+        summary["cold_ms"][batch_size] = round(max(cold), 1)
+        summary["warm_ms"][batch_size] = round(warm[len(warm) // 2], 1) if warm else None
+    return summary
+
+
+def _warmup_sizes(batch_sizes, max_batch_size=None):
+    sizes = sorted({max(1, int(b)) for b in batch_sizes})
+    if max_batch_size:
+        sizes = sorted({min(b, max_batch_size) for b in sizes})
+    return sizes
+
+
+class InProcessEngine:
+    """Runs the model in the server process (one batch at a time)"""
+
+    mode = 'in-process'
+    concurrency = 1
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.names = backend.names
+        self.backend_name = backend.name
+        self.warmup = None
+
+    def run_batch(self, images, **kwargs):
+        return _result_arrays(self.backend(images, **kwargs))
+
+    def warm_up(self, batch_sizes, runs, **kwargs):
+        """Run synthetic batches of every size through the model before serving"""
+        sizes = _warmup_sizes(batch_sizes)
+        if runs <= 0 or not sizes:
+            return None
+        started = time.perf_counter()
+        timings = _time_warmup(lambda images: self.run_batch(images, **kwargs), self.backend.imgsz, sizes, runs)
+        self.warmup = _warmup_summary([timings], started)
+        return self.warmup
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "backend": self.backend_name,
+            "startup_benchmark_ms": self.backend.startup_benchmark_ms,
+            "warmup": self.warmup
+        }
+
+    def close(self):
+        pass
+
+
+class WorkerError(RuntimeError):
+    """Raised when a worker process fails or dies while running a batch"""
+
+
+class _Worker:
+    """Parent-side handle of one worker process and its shared-memory frame slot"""
+
+    def __init__(self, index, slot_shape):
+        self.index = index
+        self.slot_shape = slot_shape
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(slot_shape)))
+        self.frames = np.ndarray(slot_shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.process = None
+        self.conn = None
+        self.batches = 0
+        # 'starting', 'ready', 'restarting' or 'dead' (restart failed)
+        self.state = 'starting'
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.send(None)
+            except (OSError, EOFError):
+                pass
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+    def destroy(self):
+        self.close()
+        self.frames = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ProcessPoolEngine:
+    """Dispatches batches to a pool of model-holding worker processes"""
+
+    mode = 'process-pool'
+
+    def __init__(self, workers, backend_options, max_batch_size=8, threads_per_worker=1, start_timeout_s=600,
+                 on_worker_ready=None):
+        self.concurrency = max(1, int(workers))
+        self.backend_options = dict(backend_options)
+        self.imgsz = int(backend_options.get('imgsz', 640))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.threads_per_worker = max(1, int(threads_per_worker))
+        self.start_timeout = float(start_timeout_s)
+        self.names = None
+        self.backend_name = None
+        self.warmup = None
+
+        self._authkey = os.urandom(16)
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        # Held for a whole restart, so two dead workers are never brought back at the same time
+        self._restart_lock = threading.Lock()
+        self._closed = False
+        self._restarts = 0
+        self._failures = 0
+
+        slot_shape = (self.max_batch_size, self.imgsz, self.imgsz, 3)
+        try:
+            # The first worker resolves 'auto' so the others skip the startup benchmark
+            first = _Worker(0, slot_shape)
+            self._workers.append(first)
+            self._start(first)
+            self.backend_options['preference'] = self.backend_name
+            if on_worker_ready:
+                on_worker_ready(1, self.concurrency)
+            for index in range(1, self.concurrency):
+                worker = _Worker(index, slot_shape)
+                self._workers.append(worker)
+                self._start(worker)
+                if on_worker_ready:
+                    on_worker_ready(index + 1, self.concurrency)
+        except Exception:
+            self.close()
+            raise
+        for worker in self._workers:
+            worker.state = 'ready'
+            self._idle.put(worker)
+        atexit.register(self.close)
+        print(f"✅ {self.concurrency} inference workers ready ({self.backend_name}, "
+              f"{self.threads_per_worker} threads each)")
+
+    def _start(self, worker):
+        # A listener per start: the only process that can connect to it is this worker,
+        # so concurrent or timed-out starts can't pick up each other's connections
+        listener = connection.Listener(authkey=self._authkey)
+        options = {
+            "index": worker.index,
+            "address": listener.address,
+            "authkey": self._authkey.hex(),
+            "shm_name": worker.shm.name,
+            "slot_shape": worker.slot_shape,
+            "threads": self.threads_per_worker,
+            "backend": self.backend_options
+        }
+        env = dict(os.environ)
+        # Must be set before torch / numpy start their thread pools in the child
+        for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            env[var] = str(self.threads_per_worker)
+        print(f"⏳ Starting inference worker {worker.index}...")
+        try:
+            worker.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), json.dumps(options)], env=env)
+
+            # Listener.accept has no timeout, so wait for it on a helper thread. If the worker never
+            # connects, that thread stays blocked on this listener, which nothing else connects to.
+            accepted = []
+            acceptor = threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True)
+            acceptor.start()
+            deadline = time.monotonic() + self.start_timeout
+            while acceptor.is_alive() and time.monotonic() < deadline:
+                if worker.process.poll() is not None:
+                    raise WorkerError(f"Inference worker {worker.index} exited during startup "
+                                      f"(code {worker.process.returncode})")
+                acceptor.join(0.2)
+            if not accepted:
+                worker.process.kill()
+                raise WorkerError(f"Inference worker {worker.index} did not start within {self.start_timeout:.0f}s")
+            worker.conn = accepted[0]
+        finally:
+            listener.close()
+
+        status, index, names, backend_name = worker.conn.recv()
+        if index != worker.index:
+            raise WorkerError(f"Inference worker {worker.index} got the handshake of worker {index}")
+        if status != 'ready':
+            raise WorkerError(f"Inference worker {worker.index} failed to load the model: {names}")
+        self.names = {int(k): v for k, v in names.items()}
+        self.backend_name = backend_name
+
+    def _worker_died(self, worker, error):
+        """Take a broken worker out of the pool and restart it off the request path"""
+        with self._lock:
+            self._failures += 1
+            worker.state = 'restarting'
+        threading.Thread(target=self._restart, args=(worker,), name=f'inference-restart-{worker.index}',
+                         daemon=True).start()
+        return WorkerError(f"Inference worker {worker.index} died: {error}")
+
+    def _restart(self, worker):
+        with self._restart_lock:
+            if self._closed:
+                return
+            print(f"🔁 Restarting inference worker {worker.index}...")
+            worker.close()
+            with self._lock:
+                self._restarts += 1
+            try:
+                self._start(worker)
+            except Exception as e:
+                print(f"❌ Could not restart inference worker {worker.index}: {e}")
+                worker.close()
+                with self._lock:
+                    worker.state = 'dead'
+                return
+            if self._closed:
+                worker.close()
+                return
+            with self._lock:
+                worker.state = 'ready'
+        print(f"✅ Inference worker {worker.index} restarted")
+        self._idle.put(worker)
+
+    def _take_worker(self):
+        """Next idle worker; raises WorkerError once no worker is running or coming back"""
+        while True:
+            try:
+                return self._idle.get(timeout=1.0)
+            except queue.Empty:
+                with self._lock:
+                    if self._closed or all(w.state == 'dead' for w in self._workers):
+                        raise WorkerError("No inference workers are running")
+
+    def _run_on_worker(self, worker, images, kwargs):
+        for i, image in enumerate(images):
+            if image.shape != worker.frames.shape[1:]:
+                raise ValueError(f"Expected {worker.frames.shape[1:]} frames, got {image.shape}")
+            worker.frames[i] = image
+        worker.conn.send((len(images), kwargs))
+        status, payload = worker.conn.recv()
+        if status != 'ok':
+            raise WorkerError(f"Inference worker {worker.index}: {payload}")
+        worker.batches += 1
+        return payload
+
+    def run_batch(self, images, **kwargs):
+        worker = self._take_worker()
+        try:
+            results = []
+            for start in range(0, len(images), self.max_batch_size):
+                results.extend(self._run_on_worker(worker, images[start:start + self.max_batch_size], kwargs))
+        except (EOFError, OSError) as e:
+            # Left out of the pool until the restart thread has replaced its process
+            raise self._worker_died(worker, e)
+        except BaseException:
+            self._idle.put(worker)
+            raise
+        self._idle.put(worker)
+        return results
+
+    def warm_up(self, batch_sizes, runs, **kwargs):
+        """Warm every worker up in parallel (call before the engine starts serving)"""
+        sizes = _warmup_sizes(batch_sizes, self.max_batch_size)
+        if runs <= 0 or not sizes:
+            return None
+        started = time.perf_counter()
+        timings = [None] * len(self._workers)
+        errors = []
+
+        def warm(worker):
+            try:
+                timings[worker.index] = _time_warmup(
+                    lambda images: self._run_on_worker(worker, images, kwargs), self.imgsz, sizes, runs)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=warm, args=(w,), daemon=True) for w in self._workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise WorkerError(f"Warm-up failed: {errors[0]}")
+        self.warmup = _warmup_summary(timings, started)
+        return self.warmup
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "backend": self.backend_name,
+                "warmup": self.warmup,
+                "workers": self.concurrency,
+                "threads_per_worker": self.threads_per_worker,
+                "idle_workers": self._idle.qsize(),
+                "restarting_workers": sum(1 for w in self._workers if w.state == 'restarting'),
+                "dead_workers": sum(1 for w in self._workers if w.state == 'dead'),
+                "batches_per_worker": [w.batches for w in self._workers],
+                "failures": self._failures,
+                "restarts": self._restarts
+            }
+
+    def close(self):
+        self._closed = True
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.destroy()
+
+
+def _attach_shared_memory(name):
+    try:
+        # Python 3.13+: don't let this process' resource tracker unlink the parent's segment
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _worker_main(options):
+    threads = options['threads']
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    import cv2
+    cv2.setNumThreads(1)
+    from inference_backends import load_backend
+
+    conn = connection.Client(options['address'], authkey=bytes.fromhex(options['authkey']))
+    try:
+        backend = load_backend(**options['backend'])
+    except Exception as e:
+        conn.send(('error', options['index'], str(e), None))
+        return 1
+    conn.send(('ready', options['index'], dict(backend.names), backend.name))
+
+    shm = _attach_shared_memory(options['shm_name'])
+    frames = np.ndarray(tuple(options['slot_shape']), dtype=np.uint8, buffer=shm.buf)
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            count, kwargs = message
+            try:
+                # Views into shared memory: the frames are never copied into this process
+                results = backend([frames[i] for i in range(count)], **kwargs)
+                conn.send(('ok', _result_arrays(results)))
+            except Exception as e:
+                conn.send(('error', str(e)))
+    finally:
+        del frames
+        shm.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_worker_main(json.loads(sys.argv[1])))
@@ -0,0 +1,94 @@
+"""Background model loading.
+
+Importing ultralytics and loading YOLO weights takes seconds, and the phone
+routes don't need any of it. ModelLoader builds the detection pipeline on a
+background thread so the server answers requests straight away; /detect
+reports "warming up" and /api/ready reports progress until it finishes.
+"""
+import threading
+import time
+import traceback
+
+
+class ModelLoader:
+    """Runs build(report) once on a background thread and holds the result"""
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.Lock()
+        self._thread = None
+        self._value = None
+        self._state = 'not_started'
+        self._stage = None
+        self._progress = 0.0
+        self._error = None
+        self._started_at = None
+        self._finished_at = None
+        self._stage_times = {}
+
+    def start(self):
+        """Begin loading (only the first call does anything)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._state = 'loading'
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+            self._thread.start()
+
+    def report(self, stage, progress):
+        """Called by the build function as it moves through its stages"""
+        with self._lock:
+            self._stage = stage
+            self._progress = max(self._progress, min(1.0, float(progress)))
+            self._stage_times[stage] = round(time.monotonic() - self._started_at, 3)
+        print(f"⏳ Model loader: {stage} ({progress * 100:.0f}%)")
+
+    def _run(self):
+        try:
+            value = self._build(self.report)
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+            traceback.print_exc()
+            with self._lock:
+                self._state = 'failed'
+                self._error = str(e)
+                self._finished_at = time.monotonic()
+            return
+        with self._lock:
+            self._value = value
+            self._state = 'ready'
+            self._stage = 'ready'
+            self._progress = 1.0
+            self._finished_at = time.monotonic()
+            self._stage_times['ready'] = round(self._finished_at - self._started_at, 3)
+
+    @property
+    def ready(self):
+        return self._state == 'ready'
+
+    @property
+    def failed(self):
+        return self._state == 'failed'
+
+    def get(self):
+        """The built value, or None while loading / after a failure"""
+        return self._value
+
+    def wait(self, timeout=None):
+        """Block until loading finishes; returns the value or None"""
+        self.start()
+        self._thread.join(timeout)
+        return self._value
+
+    def status(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "state": self._state,
+                "stage": self._stage,
+                "progress": round(self._progress, 3),
+                "elapsed_s": round((self._finished_at or now) - self._started_at, 3) if self._started_at else 0.0,
+                "stage_times_s": dict(self._stage_times),
+                "error": self._error
+            }
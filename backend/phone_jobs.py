@@ -0,0 +1,291 @@
+"""Asynchronous phone-action jobs.
+
+A phone action (call, open messages, send SMS) can take seconds, and running
+it inside the request holds a Flask worker for that long. Routes submit the
+action here instead and answer straight away with a job ID:
+
+  * jobs for the same device run one at a time, in submission order (so an
+    SMS being typed isn't interrupted by a call)
+  * jobs for different devices run in parallel, one worker thread per device;
+    a worker exits once its device has had no jobs for idle_s
+  * GET /api/phone/jobs/<id> reports the job; /events streams its state
+    changes as server-sent events until it finishes
+"""
+import functools
+import itertools
+import json
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+
+from flask import Blueprint, Response, jsonify, request
+
+import config
+
+FINISHED_STATES = ('succeeded', 'failed')
+
+
+class DeviceBusyError(Exception):
+    """Raised when a device already has the maximum number of queued jobs"""
+
+
+class PhoneJob:
+    """One submitted phone action and its progress"""
+
+    def __init__(self, device, action, run, details=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.device = device
+        self.action = action
+        self.details = details or {}
+        self.run = run
+        self.state = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Bumped on every state change so event streams know what they've sent
+        self.version = 0
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "device": self.device,
+            "action": self.action,
+            "details": self.details,
+            "state": self.state,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "queue_wait_ms": round((self.started_at - self.created_at) * 1000.0, 1) if self.started_at else None,
+            "run_ms": round((self.finished_at - self.started_at) * 1000.0, 1) if self.finished_at else None
+        }
+
+
+class PhoneJobQueue:
+    """Per-device serial job queues with a shared, bounded job history"""
+
+    def __init__(self, max_queue_depth=32, history=500, ttl_s=600.0, idle_s=60.0):
+        self.max_queue_depth = max(1, int(max_queue_depth))
+        self.history = max(1, int(history))
+        self.ttl_s = float(ttl_s)
+        self.idle_s = max(0.01, float(idle_s))
+        self._changed = threading.Condition()
+        self._jobs = OrderedDict()
+        self._queues = {}
+        self._thread_ids = itertools.count()
+        self._submitted = 0
+        self._rejected = 0
+        self._succeeded = 0
+        self._failed = 0
+
+    def submit(self, device, action, run, details=None):
+        """Queue run() for a device; run returns a result dict with a "success" key"""
+        job = PhoneJob(device, action, run, details)
+        with self._changed:
+            device_queue = self._queues.get(device)
+            if device_queue is None:
+                device_queue = self._queues[device] = queue.Queue(maxsize=self.max_queue_depth)
+                threading.Thread(target=self._work, args=(device, device_queue), daemon=True,
+                                 name=f'phone-jobs-{next(self._thread_ids)}').start()
+            try:
+                device_queue.put_nowait(job)
+            except queue.Full:
+                self._rejected += 1
+                raise DeviceBusyError(f"{device} already has {self.max_queue_depth} phone actions waiting")
+            self._jobs[job.id] = job
+            self._submitted += 1
+            self._prune()
+        print(f"📋 Queued {action} job {job.id} for {device}")
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_s
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) <= self.history and job.created_at >= cutoff:
+                break
+            if job.finished:
+                del self._jobs[job_id]
+
+    def _set_state(self, job, state, **fields):
+        with self._changed:
+            job.state = state
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            if state == 'succeeded':
+                self._succeeded += 1
+            elif state == 'failed':
+                self._failed += 1
+            self._changed.notify_all()
+
+    def _work(self, device, device_queue):
+        while True:
+            try:
+                job = device_queue.get(timeout=self.idle_s)
+            except queue.Empty:
+                # submit() puts jobs under the same lock, so an empty queue here stays empty
+                with self._changed:
+                    if device_queue.empty():
+                        del self._queues[device]
+                        return
+                continue
+            self._set_state(job, 'running', started_at=time.time())
+            try:
+                result = job.run()
+                state = 'succeeded' if result.get('success') else 'failed'
+                self._set_state(job, state, result=result, error=result.get('error'), finished_at=time.time())
+            except Exception as e:
+                print(f"❌ Phone job {job.id} ({job.action}) error: {e}")
+                traceback.print_exc()
+                self._set_state(job, 'failed', error=str(e), finished_at=time.time())
+            job.run = None
+            print(f"{'✅' if job.state == 'succeeded' else '❌'} {job.action} job {job.id} {job.state}")
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes (or timeout); returns its latest state"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._changed.wait_for(lambda: job.finished, timeout)
+            return job.to_dict()
+
+    def events(self, job_id, keepalive_s=15.0):
+        """Yield the job's state on every change until it finishes; None means "still waiting" """
+        seen = -1
+        while True:
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                if job.version == seen:
+                    self._changed.wait_for(lambda: job.version != seen, keepalive_s)
+                if job.version == seen:
+                    snapshot = None
+                else:
+                    seen = job.version
+                    snapshot = job.to_dict()
+            yield snapshot
+            if snapshot is not None and snapshot["state"] in FINISHED_STATES:
+                return
+
+    def stats(self):
+        with self._changed:
+            return {
+                "queued": {device: q.qsize() for device, q in self._queues.items()},
+                "workers": len(self._queues),
+                "running": sum(1 for job in self._jobs.values() if job.state == 'running'),
+                "submitted": self._submitted,
+                "succeeded": self._succeeded,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "kept": len(self._jobs)
+            }
+
+
+job_queue = PhoneJobQueue(config.PHONE_JOB_QUEUE_DEPTH, config.PHONE_JOB_HISTORY, config.PHONE_JOB_TTL_S,
+                          config.PHONE_JOB_IDLE_S)
+
+
+def submit_response(device, action, run, details=None):
+    """Submit a job and answer the request: 202 with the job ID, or the result with ?wait=1"""
+    try:
+        job = job_queue.submit(device, action, run, details)
+    except DeviceBusyError as e:
+        response = jsonify({"success": False, "error": str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    if request.args.get('wait', '').lower() in ('1', 'true', 'yes'):
+        state = job_queue.wait(job.id, config.PHONE_JOB_WAIT_S)
+        if not state or state["state"] not in FINISHED_STATES:
+            return jsonify({"success": False, "error": "Phone action still running", **(state or {})}), 504
+        result = state["result"] or {"success": False, "error": state["error"]}
+        return jsonify({**result, "job_id": job.id}), 200 if result.get("success") else 500
+
+    return jsonify({
+        "success": True,
+        "status": "queued",
+        "job_id": job.id,
+        "device": device,
+        "status_url": f"/api/phone/jobs/{job.id}",
+        "events_url": f"/api/phone/jobs/{job.id}/events"
+    }), 202
+
+
+def fan_out_response(devices, action, run, details=None):
+    """Submit run(device) for every device; a single device answers like submit_response"""
+    if len(devices) == 1:
+        return submit_response(devices[0], action, functools.partial(run, devices[0]), details)
+
+    jobs = []
+    for device in devices:
+        try:
+            job = job_queue.submit(device, action, functools.partial(run, device), details)
+            jobs.append({
+                "device": device,
+                "job_id": job.id,
+                "status_url": f"/api/phone/jobs/{job.id}",
+                "events_url": f"/api/phone/jobs/{job.id}/events"
+            })
+        except DeviceBusyError as e:
+            jobs.append({"device": device, "error": str(e)})
+
+    if request.args.get('wait', '').lower() in ('1', 'true', 'yes'):
+        # Devices run in parallel, so the total wait is the slowest device
+        deadline = time.monotonic() + config.PHONE_JOB_WAIT_S
+        for entry in jobs:
+            if "job_id" in entry:
+                state = job_queue.wait(entry["job_id"], max(0.0, deadline - time.monotonic()))
+                entry["state"] = state["state"] if state else None
+                entry["result"] = state["result"] if state else None
+        succeeded = all(entry.get("state") == 'succeeded' for entry in jobs)
+        return jsonify({"success": succeeded, "broadcast": True, "jobs": jobs}), 200 if succeeded else 500
+
+    queued = [entry for entry in jobs if "job_id" in entry]
+    return jsonify({
+        "success": bool(queued),
+        "status": "queued",
+        "broadcast": True,
+        "devices": devices,
+        "jobs": jobs
+    }), 202 if queued else 503
+
+
+jobs_blueprint = Blueprint('phone_jobs', __name__)
+
+
+@jobs_blueprint.route('/api/phone/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """State of one phone action job"""
+    state = job_queue.get(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(state)
+
+
+@jobs_blueprint.route('/api/phone/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events: one "data:" message per state change, then the stream ends"""
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    def stream():
+        for state in job_queue.events(job_id):
+            # Comment lines keep proxies from closing an idle stream
+            yield ': keepalive\n\n' if state is None else f'data: {json.dumps(state)}\n\n'
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
@@ -0,0 +1,65 @@
+"""Array-level post-processing of YOLO detections.
+
+The engine hands back one (N, 6) float32 array per frame: x1, y1, x2, y2,
+confidence, class id. Converting that box by box (int(), float() and a names
+lookup per row, then sorting a list of dicts) costs Python work per
+detection, which adds up in crowded scenes. Here the confidence filter,
+top-k selection, class-name lookup and box rounding each run once over the
+whole array. The only per-box Python work left is building the JSON dicts.
+
+to_arrays() gives the compact column form for clients that don't need one
+object per box (/detect?format=arrays), straight from the arrays, so no dicts
+are built at all. predictions_to_arrays() converts predictions that already
+exist as dicts (cached, reused or tracked results).
+"""
+import numpy as np
+
+
+def class_name_array(names):
+    """Class names indexed by class id, from the model's {id: name} dict (or a list)"""
+    if isinstance(names, dict):
+        size = max(names) + 1 if names else 0
+        return np.array([names.get(i, str(i)) for i in range(size)], dtype=object)
+    return np.array(list(names), dtype=object)
+
+
+def select(rows, conf=0.0, top_k=0):
+    """Indices of the rows scoring at least `conf`, highest first, at most `top_k` (0 = all)"""
+    scores = rows[:, 4]
+    keep = np.flatnonzero(scores >= conf)
+    if 0 < top_k < len(keep):
+        # Partial sort: only the top_k candidates get fully ordered below
+        keep = keep[np.argpartition(-scores[keep], top_k - 1)[:top_k]]
+    return keep[np.argsort(-scores[keep], kind='stable')]
+
+
+def to_predictions(class_names, class_ids, confidences, boxes):
+    """One {"class", "confidence", "box"} dict per detection, boxes rounded to 0.1 px"""
+    labels = class_names[class_ids].tolist()
+    return [
+        {"class": label, "confidence": confidence, "box": box}
+        for label, confidence, box in zip(labels, confidences.tolist(), np.round(boxes.astype(np.float64), 1).tolist())
+    ]
+
+
+def to_arrays(class_names, class_ids, confidences, boxes):
+    """Column form of the same detections as to_predictions(), without a dict per box"""
+    return {
+        "count": len(class_ids),
+        "classes": class_names[class_ids].tolist(),
+        "confidences": confidences.tolist(),
+        "boxes": np.round(boxes.astype(np.float64), 1).ravel().tolist()
+    }
+
+
+def predictions_to_arrays(predictions):
+    """Column form of a predictions list; boxes are flattened to x1, y1, x2, y2, x1, ..."""
+    arrays = {
+        "count": len(predictions),
+        "classes": [p["class"] for p in predictions],
+        "confidences": [p["confidence"] for p in predictions],
+        "boxes": [v for p in predictions for v in p["box"]]
+    }
+    if predictions and "track_id" in predictions[0]:
+        arrays["track_ids"] = [p["track_id"] for p in predictions]
+    return arrays
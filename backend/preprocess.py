@@ -0,0 +1,204 @@
+"""Decode + letterbox stage that runs before YOLO.
+
+The scanner captures 1280x720 frames but YOLOv8n runs at 640, so decoding at
+full resolution wastes CPU and memory. When the encoded image is at least 2x
+the model input size, it is decoded with cv2.IMREAD_REDUCED_COLOR_2/4/8,
+which lets libjpeg skip most of the work. The result is letterboxed into a
+preallocated square buffer, and the letterbox geometry is kept so boxes can
+be mapped back to the coordinates of the original upload.
+"""
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+from imaging import ImageInputError, decode_image_bytes
+
+# Same grey ultralytics uses for letterbox padding
+PAD_VALUE = 114
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# SOF markers carry the frame size; C4/C8/CC share the range but are not frames
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def peek_image_size(buf):
+    """Read (width, height) from a JPEG or PNG header without decoding, or None"""
+    mv = memoryview(buf)
+    if len(mv) >= 24 and bytes(mv[:8]) == _PNG_SIGNATURE:
+        width, height = struct.unpack('>II', mv[16:24])
+        return width, height
+
+    if len(mv) < 4 or bytes(mv[:2]) != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 < len(mv):
+        if mv[i] != 0xFF:
+            i += 1
+            continue
+        marker = mv[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Fill byte or marker without a length field
+            i += 1 if marker == 0xFF else 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', mv[i + 5:i + 9])
+            return width, height
+        segment_length = struct.unpack('>H', mv[i + 2:i + 4])[0]
+        i += 2 + segment_length
+    return None
+
+
+def pick_reduction(width, height, imgsz):
+    """Largest decode reduction that still leaves the long side >= imgsz"""
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side // factor >= imgsz:
+            return factor
+    return 1
+
+
+class PreparedFrame:
+    """A letterboxed frame plus what is needed to map boxes back onto the upload"""
+
+    __slots__ = ('image', 'orig_width', 'orig_height', 'gain_x', 'gain_y', 'pad_x', 'pad_y', 'reduction', 'pooled')
+
+    def __init__(self, image, orig_width, orig_height, gain_x, gain_y, pad_x, pad_y, reduction, pooled):
+        self.image = image
+        self.orig_width = orig_width
+        self.orig_height = orig_height
+        self.gain_x = gain_x
+        self.gain_y = gain_y
+        self.pad_x = pad_x
+        self.pad_y = pad_y
+        self.reduction = reduction
+        self.pooled = pooled
+
+    def to_original(self, xyxy):
+        """Map an (N, 4) array of letterbox xyxy boxes to original image pixels"""
+        boxes = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).copy()
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - self.pad_x) / self.gain_x
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - self.pad_y) / self.gain_y
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, self.orig_width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, self.orig_height)
+        return boxes
+
+
+class Preprocessor:
+    """Decodes uploads at reduced resolution and letterboxes them into pooled buffers"""
+
+    def __init__(self, imgsz=640, pool_size=16):
+        self.imgsz = int(imgsz)
+        self.pool_size = int(pool_size)
+        self._pool = []
+        self._pool_lock = threading.Lock()
+        self._allocated = 0
+        self._unpooled = 0
+        self._reductions = {factor: 0 for factor in _REDUCED_FLAGS}
+
+    def _acquire_buffer(self):
+        with self._pool_lock:
+            if self._pool:
+                return self._pool.pop(), True
+            if self._allocated < self.pool_size:
+                self._allocated += 1
+                pooled = True
+            else:
+                self._unpooled += 1
+                pooled = False
+        # Pool exhausted: hand out a one-off buffer that is dropped on release
+        return np.empty((self.imgsz, self.imgsz, 3), dtype=np.uint8), pooled
+
+    def reserve(self, pool_size):
+        """Let the pool grow to at least pool_size buffers (allocated as they are needed)"""
+        with self._pool_lock:
+            self.pool_size = max(self.pool_size, int(pool_size))
+
+    def release(self, frame):
+        """Return a frame's buffer to the pool once the model is done with it"""
+        if frame is None or not frame.pooled:
+            return
+        frame.pooled = False
+        with self._pool_lock:
+            self._pool.append(frame.image)
+
+    def discard(self, frame):
+        """Give up on a frame the model may still be reading (e.g. after a timeout)"""
+        if frame is None or not frame.pooled:
+            return
+        frame.pooled = False
+        with self._pool_lock:
+            # Let a fresh buffer take its place instead of reusing this one
+            self._allocated -= 1
+
+    def decode(self, buf):
+        """Decode an upload, skipping resolution the model would throw away
+
+        Returns (image, original_width, original_height, reduction).
+        """
+        size = peek_image_size(buf)
+        reduction = pick_reduction(size[0], size[1], self.imgsz) if size else 1
+        img = decode_image_bytes(buf, _REDUCED_FLAGS[reduction])
+        with self._pool_lock:
+            self._reductions[reduction] += 1
+
+        decoded_height, decoded_width = img.shape[:2]
+        if reduction == 1:
+            return img, decoded_width, decoded_height, 1
+        width, height = size
+        # EXIF orientation is applied while decoding, so the header size may be rotated
+        if (decoded_width > decoded_height) != (width > height):
+            width, height = height, width
+        return img, width, height, reduction
+
+    def letterbox(self, img, orig_width, orig_height, reduction=1):
+        """Resize img to fit imgsz x imgsz, keeping aspect ratio, padding the rest"""
+        height, width = img.shape[:2]
+        if height == 0 or width == 0:
+            raise ImageInputError("Empty image")
+        ratio = min(self.imgsz / width, self.imgsz / height)
+        new_width = max(1, min(self.imgsz, int(round(width * ratio))))
+        new_height = max(1, min(self.imgsz, int(round(height * ratio))))
+        pad_x = (self.imgsz - new_width) // 2
+        pad_y = (self.imgsz - new_height) // 2
+
+        canvas, pooled = self._acquire_buffer()
+        # Only the borders need the pad colour, the middle is overwritten by the resize
+        canvas[:pad_y] = PAD_VALUE
+        canvas[pad_y + new_height:] = PAD_VALUE
+        canvas[pad_y:pad_y + new_height, :pad_x] = PAD_VALUE
+        canvas[pad_y:pad_y + new_height, pad_x + new_width:] = PAD_VALUE
+        target = canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width]
+        interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR
+        cv2.resize(img, (new_width, new_height), dst=target, interpolation=interpolation)
+
+        return PreparedFrame(
+            canvas, orig_width, orig_height,
+            gain_x=new_width / orig_width, gain_y=new_height / orig_height,
+            pad_x=pad_x, pad_y=pad_y, reduction=reduction, pooled=pooled
+        )
+
+    def stats(self):
+        """Buffer pool usage and how often each decode reduction was picked"""
+        with self._pool_lock:
+            return {
+                "imgsz": self.imgsz,
+                "pool_size": self.pool_size,
+                "buffers_allocated": self._allocated,
+                "buffers_free": len(self._pool),
+                "buffers_unpooled": self._unpooled,
+                "decodes_by_reduction": {str(k): v for k, v in self._reductions.items()}
+            }
+
+    def __call__(self, buf):
+        """Decode and letterbox one encoded image"""
+        img, orig_width, orig_height, reduction = self.decode(buf)
+        return self.letterbox(img, orig_width, orig_height, reduction)
@@ -0,0 +1,146 @@
+"""Quantized ONNX variants of the YOLO model.
+
+Produces smaller / faster ONNX files from the FP32 export:
+
+  * int8 dynamic - weights stored as INT8, activations quantized on the fly
+                   (no calibration data needed)
+  * int8 static  - weights and activations INT8, activation ranges measured
+                   on a folder of sample frames (usually the faster option)
+  * fp16         - weights and activations in half precision, float32 inputs
+                   and outputs kept (needs `onnxconverter-common`)
+
+Usage:
+    python backend/quantize.py int8 [--calib path/to/frames]
+    python backend/quantize.py fp16
+
+Quantized models are opt-in: select them with DETECT_BACKEND=onnx-int8 or
+onnx-fp16 after checking the accuracy/latency trade-off with
+backend/benchmarks/quant_report.py.
+"""
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png')
+
+
+def list_images(directory):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+
+def to_model_input(frame):
+    """Letterboxed BGR uint8 frame -> 1x3xHxW float32 RGB tensor in [0, 1]"""
+    return np.ascontiguousarray(frame[:, :, ::-1].transpose(2, 0, 1))[None].astype(np.float32) / 255.0
+
+
+def _copy_metadata(source_path, target_path):
+    # ultralytics reads class names and image size from the ONNX metadata,
+    # which the quantizers don't carry over
+    import onnx
+    source = onnx.load(source_path, load_external_data=False)
+    target = onnx.load(target_path)
+    del target.metadata_props[:]
+    target.metadata_props.extend(source.metadata_props)
+    onnx.save(target, target_path)
+
+
+def _input_name(onnx_path):
+    import onnx
+    return onnx.load(onnx_path, load_external_data=False).graph.input[0].name
+
+
+def _calibration_reader(onnx_path, calibration_dir, imgsz, limit):
+    from onnxruntime.quantization import CalibrationDataReader
+    from preprocess import Preprocessor
+
+    class FolderCalibrationReader(CalibrationDataReader):
+        """Feeds letterboxed frames from a folder to the static quantizer"""
+
+        def __init__(self):
+            self.input_name = _input_name(onnx_path)
+            self.paths = iter(list_images(calibration_dir)[:limit])
+            self.preprocessor = Preprocessor(imgsz=imgsz, pool_size=0)
+
+        def get_next(self):
+            for path in self.paths:
+                with open(path, 'rb') as f:
+                    buf = f.read()
+                try:
+                    frame = self.preprocessor(buf)
+                except ValueError:
+                    print(f"⚠️ Skipping unreadable calibration image {path}")
+                    continue
+                return {self.input_name: to_model_input(frame.image)}
+            return None
+
+    return FolderCalibrationReader()
+
+
+def quantize_int8(onnx_path, output_path, calibration_dir=None, imgsz=640, calibration_limit=200):
+    """Write an INT8 model: static if a calibration folder is given, dynamic otherwise"""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if calibration_dir:
+        count = min(len(list_images(calibration_dir)), calibration_limit)
+        if count == 0:
+            raise ValueError(f"No calibration images found in {calibration_dir}")
+        print(f"📐 Static INT8 quantization, calibrating on {count} frames from {calibration_dir}...")
+        quantize_static(
+            onnx_path, output_path,
+            _calibration_reader(onnx_path, calibration_dir, imgsz, calibration_limit),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True
+        )
+    else:
+        print("📐 Dynamic INT8 quantization (no calibration folder given)...")
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+    _copy_metadata(onnx_path, output_path)
+    return output_path
+
+
+def convert_fp16(onnx_path, output_path):
+    """Write an FP16 model that still takes and returns float32 tensors"""
+    import onnx
+    from onnxconverter_common import float16
+
+    print("📐 Converting to FP16...")
+    model = float16.convert_float_to_float16(onnx.load(onnx_path), keep_io_types=True)
+    onnx.save(model, output_path)
+    _copy_metadata(onnx_path, output_path)
+    return output_path
+
+
+def main():
+    import config
+    from inference_backends import QuantizedOnnxBackend
+
+    parser = argparse.ArgumentParser(description="Build a quantized ONNX variant of the detection model")
+    parser.add_argument('mode', choices=['int8', 'fp16'])
+    parser.add_argument('--weights', default=config.DETECT_MODEL)
+    parser.add_argument('--imgsz', type=int, default=config.DETECT_IMGSZ)
+    parser.add_argument('--calib', default=config.DETECT_QUANT_CALIB_DIR or None,
+                        help="Folder of sample frames for static INT8 calibration")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the file exists")
+    args = parser.parse_args()
+
+    backend = QuantizedOnnxBackend.variant(args.mode)(args.weights, args.imgsz, calibration_dir=args.calib)
+    output_path = backend.artifact_path()
+    if args.force and os.path.exists(output_path):
+        os.remove(output_path)
+    if os.path.exists(output_path):
+        print(f"ℹ️ {output_path} already exists (use --force to rebuild)")
+        return 0
+    backend.prepare()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
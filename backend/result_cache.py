@@ -0,0 +1,106 @@
+"""Detection result cache keyed by the uploaded image bytes.
+
+Rescans of the same photo and frontend retries send byte-identical images.
+Hashing the encoded upload lets /detect answer those without decoding or
+running the model. Entries are evicted least-recently-used first, once they
+are older than the TTL, or when the cache grows past its entry / byte budget.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def image_digest(buf):
+    """Fast 128-bit digest of an encoded image"""
+    return hashlib.blake2b(buf, digest_size=16).digest()
+
+
+class DetectionCache:
+    """Thread-safe LRU + TTL cache of /detect predictions"""
+
+    def __init__(self, max_entries=512, max_bytes=8 * 1024 * 1024, ttl_s=300):
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl_s)
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expired = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def make_key(image_bytes, model_name, options, imgsz):
+        """Key for an upload; `options` is the request's (hashable) DetectOptions"""
+        return (image_digest(image_bytes), model_name, options, int(imgsz))
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at <= now:
+                self._drop(key, size)
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value (must be JSON-serialisable) under key"""
+        if not self.enabled:
+            return
+        size = len(json.dumps(value, separators=(',', ':')))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key, (_, oldest_size, _) = next(iter(self._entries.items()))
+                self._drop(oldest_key, oldest_size)
+                self._evictions += 1
+
+    def _drop(self, key, size):
+        del self._entries[key]
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expired": self._expired
+            }
@@ -0,0 +1,133 @@
+"""Production entry point: the same Flask app under waitress or gunicorn.
+
+`python app.py` runs Flask's development server: one process, the debugger
+and the reloader. This serves any of the backends under a real WSGI server
+instead:
+
+    python backend/serve.py [--app app] [--server auto|waitress|gunicorn]
+        [--workers 1] [--threads 8] [--port 5000] [--build-assets]
+
+    pip install waitress     # Windows and Linux
+    pip install gunicorn     # Linux / macOS, needed for --workers > 1
+
+Model sharing: the detection pipeline, result caches, phone job queues and
+adb sessions all live in the server process. Concurrent /detect requests
+only share a YOLO batch if they reach the same process. So the default is
+one process with SERVE_THREADS request threads and one model. For more
+inference throughput, set DETECT_WORKERS: the one server process then feeds
+a pool of model processes through shared memory. SERVE_WORKERS > 1 starts
+that many copies of everything, each loading its own YOLO. app.py refuses
+to do that unless SERVE_MODEL_PER_WORKER=1 is set as well.
+"""
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import config  # noqa: E402
+
+APPS = ('app', 'app_voice_only', 'app_clean', 'server')
+# Module-level singletons that do their work on background threads
+BACKGROUND_SERVICES = ('adb', 'model_loader', 'status_watcher')
+
+
+def pick_server(requested):
+    if requested != 'auto':
+        return requested
+    for name in ('waitress', 'gunicorn'):
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return None
+
+
+def start_background_services(module):
+    """Start the adb tracker, model loader and status watcher the app has (once per process)"""
+    for name in BACKGROUND_SERVICES:
+        service = getattr(module, name, None)
+        if service is not None:
+            service.start()
+
+
+def serve_waitress(module, args):
+    from waitress import serve
+    start_background_services(module)
+    if hasattr(module, 'stream_hub'):
+        print("⚠️ waitress can't upgrade to WebSocket: /ws/detect live streaming needs --server gunicorn")
+    print(f"🚀 waitress: {args.app} on http://{args.host}:{args.port} ({args.threads} threads)")
+    serve(module.app, host=args.host, port=args.port, threads=args.threads,
+          channel_timeout=args.keepalive, ident='smart-object-ai')
+
+
+def serve_gunicorn(module, args):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            settings = {
+                'bind': f'{args.host}:{args.port}',
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'keepalive': args.keepalive,
+                'timeout': args.timeout,
+                'graceful_timeout': args.timeout,
+                # Threads (model loader, adb tracker) must start after the fork, in each worker
+                'preload_app': False,
+                'post_worker_init': lambda worker: start_background_services(module),
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return module.app
+
+    print(f"🚀 gunicorn: {args.app} on http://{args.host}:{args.port} "
+          f"({args.workers} workers x {args.threads} threads)")
+    Application().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='app', choices=APPS, help="Backend module to serve")
+    parser.add_argument('--server', default=config.SERVE_SERVER, choices=['auto', 'waitress', 'gunicorn'])
+    parser.add_argument('--host', default=config.SERVE_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=config.SERVE_WORKERS)
+    parser.add_argument('--threads', type=int, default=config.SERVE_THREADS)
+    parser.add_argument('--keepalive', type=int, default=config.SERVE_KEEPALIVE_S, help="Idle keep-alive seconds")
+    parser.add_argument('--timeout', type=int, default=config.SERVE_TIMEOUT_S, help="gunicorn worker timeout")
+    parser.add_argument('--build-assets', action='store_true',
+                        help="Build the frontend bundles before serving (once, not in every worker)")
+    args = parser.parse_args()
+
+    server = pick_server(args.server)
+    if server is None or importlib.util.find_spec(server) is None:
+        print("❌ No production server installed: pip install waitress (or gunicorn on Linux)")
+        return 1
+    if args.workers > 1:
+        if server == 'waitress':
+            print("❌ waitress runs one process; use --threads, or --server gunicorn for several workers")
+            return 2
+        if args.app == 'app' and not config.SERVE_MODEL_PER_WORKER:
+            print(f"❌ {args.workers} workers would load {args.workers} YOLO copies and split /detect batches.\n"
+                  "   Use DETECT_WORKERS for parallel inference, or set SERVE_MODEL_PER_WORKER=1 to allow it.")
+            return 2
+        print("⚠️ Phone job IDs, per-device ordering and caches are per worker process")
+
+    if args.build_assets:
+        from asset_bundle import asset_builder
+        manifest = asset_builder.build()
+        print(f"📦 Bundled {len(manifest['files'])} CSS / JS files for {len(manifest['pages'])} pages")
+
+    module = importlib.import_module(args.app)
+    if server == 'waitress':
+        serve_waitress(module, args)
+    else:
+        serve_gunicorn(module, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
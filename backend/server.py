@@ -1,14 +1,24 @@
 #!/usr/bin/env python3
 import os
-import subprocess
-import time
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+import adb_commands
+import adb_shell
+import config
+from adb_client import adb
+from device_status import phone_status_response, status_blueprint, status_watcher
+from devices import DeviceNotFoundError, registry
+from phone_jobs import fan_out_response, jobs_blueprint
+from static_assets import static_blueprint
+
 # Setup
 os.environ['PATH'] += ';C:\\tools\\platform-tools'
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(jobs_blueprint)  # /api/phone/jobs/<id>
+app.register_blueprint(status_blueprint)  # /api/phone/status/events
+app.register_blueprint(static_blueprint)  # pages, css/ and js/ from memory
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
@@ -20,113 +30,93 @@ print(f"📁 Root: {ROOT_DIR}")
 def index():
     return jsonify({"ok": True})
 
-@app.route('/voice-control.html')
-def page():
-    try:
-        path = os.path.join(ROOT_DIR, 'voice-control.html')
-        with open(path, 'r', encoding='utf-8-sig') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        try:
-            with open(path, 'r', encoding='latin-1') as f:
-                return f.read()
-        except Exception as e:
-            print(f"❌ Error loading page: {e}")
-            return f"Error: {e}", 404
-    except Exception as e:
-        print(f"❌ Error loading page: {e}")
-        return f"Error: {e}", 404
-
-@app.route('/<path:file>')
-def files(file):
-    try:
-        path = os.path.join(ROOT_DIR, file)
-        # Use utf-8-sig to handle BOM
-        with open(path, 'r', encoding='utf-8-sig') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        # Fallback to latin-1 if utf-8 fails
-        try:
-            with open(path, 'r', encoding='latin-1') as f:
-                return f.read()
-        except Exception as e:
-            print(f"❌ Error loading {file}: {e}")
-            return f"File error: {e}", 404
-    except Exception as e:
-        print(f"❌ Error loading {file}: {e}")
-        return f"File not found: {file}", 404
-
 @app.route('/api/phone/status')
 def status():
-    try:
-        result = subprocess.run('adb devices', shell=True, capture_output=True, text=True, timeout=2)
-        # Check if 192.168.29.67 appears with "device" status (not "offline")
-        if '192.168.29.67' in result.stdout and 'device' in result.stdout and 'offline' not in result.stdout:
-            return jsonify({"connected": True})
-        return jsonify({"connected": False})
-    except:
-        return jsonify({"connected": False})
+    # ?device=<serial>, else PHONE_DEFAULT_DEVICE / the first online handset; served from memory
+    return phone_status_response(request.args.get('device'), disconnected_status=200)
 
 @app.route('/api/phone/connect', methods=['POST'])
 def connect():
+    data = request.get_json(silent=True) or {}
     try:
-        subprocess.run('adb connect 192.168.29.67:5555', shell=True, capture_output=True, timeout=5)
-        time.sleep(1)
-        return jsonify({"success": True, "device": "192.168.29.67:5555"})
-    except:
-        return jsonify({"success": False}), 400
+        device = registry.address(data.get('device'), data.get('ip'), data.get('port'))
+    except DeviceNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    success, message = adb.connect(device)
+    print(f"🔗 {message}")
+    return jsonify({"success": success, "device": device, "message": message}), 200 if success else 400
 
 @app.route('/api/phone/disconnect', methods=['POST'])
 def disconnect():
     try:
-        subprocess.run('adb disconnect 192.168.29.67:5555', shell=True, capture_output=True, timeout=5)
-        return jsonify({"success": True})
-    except:
-        return jsonify({"success": False}), 400
+        device = registry.resolve((request.get_json(silent=True) or {}).get('device'))
+    except DeviceNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    success, message = adb.disconnect(device)
+    return jsonify({"success": success, "message": message}), 200 if success else 400
+
+def devices_or_400(data):
+    # "device": serial, list of serials or "all"; omitted = PHONE_DEFAULT_DEVICE / first online handset
+    try:
+        return registry.resolve_many(data.get('device')), None
+    except DeviceNotFoundError as e:
+        return None, (jsonify({"success": False, "error": str(e)}), 400)
+
+def phone_number_or_400(data):
+    try:
+        return adb_commands.normalize_phone_number(data.get('phoneNumber', '')), None
+    except adb_commands.InvalidPhoneNumberError as e:
+        return None, (jsonify({"success": False, "error": str(e)}), 400)
 
 @app.route('/api/phone/call', methods=['POST'])
 def call():
     try:
-        data = request.json
-        num = data.get('phoneNumber', '')
-        subprocess.run(f'adb shell am start -a android.intent.action.CALL -d tel:{num}', shell=True, capture_output=True, timeout=2)
-        return jsonify({"success": True})
+        data = request.json or {}
+        devices, error = devices_or_400(data)
+        num, number_error = phone_number_or_400(data)
+        if error or number_error:
+            return error or number_error
+        def run(device):
+            success, stdout, stderr = adb.shell(device, adb_commands.CALL.shell_command(number=num))
+            return {"success": success, "device": device}
+        return fan_out_response(devices, 'call', run)
     except:
         return jsonify({"success": False}), 400
 
 @app.route('/api/phone/message', methods=['POST'])
 def message():
     try:
-        data = request.json
-        num = data.get('phoneNumber', '')
-        subprocess.run(f'adb shell am start -a android.intent.action.SENDTO -d sms:{num}', shell=True, capture_output=True, timeout=2)
-        return jsonify({"success": True})
+        data = request.json or {}
+        devices, error = devices_or_400(data)
+        num, number_error = phone_number_or_400(data)
+        if error or number_error:
+            return error or number_error
+        def run(device):
+            success, stdout, stderr = adb.shell(device, adb_commands.OPEN_SMS.shell_command(number=num))
+            return {"success": success, "device": device}
+        return fan_out_response(devices, 'message', run)
     except:
         return jsonify({"success": False}), 400
 
 @app.route('/api/phone/send-message', methods=['POST'])
 def send_msg():
     try:
-        data = request.json
-        num = data.get('phoneNumber', '')
+        data = request.json or {}
+        devices, error = devices_or_400(data)
+        num, number_error = phone_number_or_400(data)
+        if error or number_error:
+            return error or number_error
         msg = data.get('message', '')
         
-        subprocess.run(f'adb shell am start -a android.intent.action.SENDTO -d sms:{num}', shell=True, capture_output=True, timeout=2)
-        time.sleep(1)
-        subprocess.run('adb shell input keyevent 67', shell=True, capture_output=True, timeout=1)
-        time.sleep(0.3)
-        
-        escaped = msg.replace("'", "\\'").replace('"', '\\"')
-        subprocess.run(f'adb shell input text "{escaped}"', shell=True, capture_output=True, timeout=2)
-        time.sleep(0.3)
-        subprocess.run('adb shell input keyevent 9', shell=True, capture_output=True, timeout=1)
-        time.sleep(0.2)
-        subprocess.run('adb shell input keyevent 66', shell=True, capture_output=True, timeout=1)
-        
-        return jsonify({"success": True})
+        # Open compose, wait for focus, type and send in one pooled shell session
+        def run(device):
+            return {"success": adb_shell.send_sms(device, num, msg), "device": device}
+        return fan_out_response(devices, 'send_message', run)
     except:
         return jsonify({"success": False}), 400
 
 if __name__ == '__main__':
-    print("✅ Running on http://127.0.0.1:5000")
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    status_watcher.start()
+    print(f"✅ Running on http://127.0.0.1:{config.SERVER_PORT}")
+    # Development server; see serve.py for production
+    app.run(host='0.0.0.0', port=config.SERVER_PORT, debug=False)
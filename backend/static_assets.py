@@ -0,0 +1,330 @@
+"""In-memory static file serving for the frontend pages.
+
+The catch-all routes used to open and read every file as UTF-8 text on every
+request. That broke images and sent no caching headers. Here the HTML, CSS
+and JS in the repo root are loaded into memory once, together with gzip (and
+brotli, when the `brotli` package is installed) copies, and served with:
+
+  * a strong ETag and Last-Modified, so `If-None-Match` /
+    `If-Modified-Since` get an empty 304
+  * `Range: bytes=...` (single range) as 206, for media and resumed downloads
+  * `Cache-Control: immutable` for a year on versioned URLs (`?v=...` or a
+    content hash in the file name), `no-cache` (always revalidate) otherwise
+
+A file is re-read when its mtime or size changes (checked at most once per
+STATIC_RECHECK_S), so editing a page needs no restart. A file deleted in the
+meantime answers 404; a bundled page whose built copy is gone is served
+unbundled while the bundles are rebuilt. Files larger than
+STATIC_CACHE_MAX_FILE_BYTES are streamed from disk by Flask's send_file.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import Blueprint, Response, jsonify, request, send_file
+from werkzeug.security import safe_join
+
+import config
+from asset_bundle import asset_builder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded at startup; anything else is loaded on first request
+PRELOAD_EXTENSIONS = ('.html', '.css', '.js')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# The backend's own sources and dot-files are never served
+HIDDEN_DIRS = ('backend', 'node_modules')
+# name.<hash>.ext, as written by the asset build
+FINGERPRINT_PATTERN = re.compile(r'\.[0-9a-f]{8,}\.\w+$')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class StaticAsset:
+    """One file's bytes, validators and pre-compressed copies"""
+
+    def __init__(self, path, data, stat):
+        self.path = path
+        self.data = data
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.checked_at = time.monotonic()
+        self.etag = hashlib.blake2b(data, digest_size=12).hexdigest()
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.modified_s = int(stat.st_mtime)
+        # Flask adds "; charset=utf-8" to text types itself
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.mimetype = mimetype
+        # Content-Encoding -> bytes, only where compressing actually saves space
+        self.encoded = {}
+        if len(data) >= config.STATIC_COMPRESS_MIN_BYTES and mimetype.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self._add_encoding('br', brotli.compress(data, quality=11))
+            self._add_encoding('gzip', gzip.compress(data, compresslevel=9, mtime=0))
+
+    def _add_encoding(self, name, encoded):
+        if len(encoded) < len(self.data):
+            self.encoded[name] = encoded
+
+    @property
+    def memory(self):
+        return len(self.data) + sum(len(encoded) for encoded in self.encoded.values())
+
+
+def accepted_encoding(header, available):
+    """Best of `available` the client accepts ("br" before "gzip"), or None"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for name in ('br', 'gzip'):
+        if name in available and accepted.get(name, accepted.get('*', 0.0)) > 0:
+            return name
+    return None
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single "bytes=" range; None to ignore it, False if unsatisfiable"""
+    match = RANGE_PATTERN.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # "-N": the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+class StaticAssets:
+    """Thread-safe cache of the files under `root`, served as Flask responses"""
+
+    def __init__(self, root, max_bytes=32 * 1024 * 1024, max_file_bytes=2 * 1024 * 1024,
+                 recheck_s=1.0, max_age_s=31536000, builder=None):
+        self.root = root
+        # asset_bundle.AssetBuilder whose bundled page copies replace the originals
+        self.builder = builder
+        self.max_bytes = int(max_bytes)
+        self.max_file_bytes = int(max_file_bytes)
+        self.recheck_s = float(recheck_s)
+        self.max_age_s = int(max_age_s)
+        self._assets = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "loads": 0, "reloads": 0, "not_modified": 0,
+                        "ranges": 0, "compressed": 0, "from_disk": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def resolve(self, filename):
+        """Absolute path for a request path, or None if it's hidden or outside the root"""
+        parts = filename.replace('\\', '/').split('/')
+        if parts[0] in HIDDEN_DIRS or any(part.startswith('.') for part in parts):
+            return None
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def preload(self):
+        """Load every page, stylesheet and script so the first requests are served from memory"""
+        for directory, dirs, files in os.walk(self.root):
+            relative = os.path.relpath(directory, self.root)
+            dirs[:] = [d for d in dirs if not d.startswith('.') and not (relative == '.' and d in HIDDEN_DIRS)]
+            for name in files:
+                if name.endswith(PRELOAD_EXTENSIONS) and not name.startswith('.'):
+                    self.get(os.path.join(directory, name))
+        with self._lock:
+            return len(self._assets), self._bytes
+
+    def _load(self, path, stat):
+        with open(path, 'rb') as f:
+            data = f.read()
+        asset = StaticAsset(path, data, stat)
+        with self._lock:
+            old = self._assets.get(path)
+            if old is not None:
+                self._bytes -= old.memory
+                self._counts["reloads"] += 1
+            else:
+                self._counts["loads"] += 1
+            if self._bytes + asset.memory > self.max_bytes:
+                # Over budget: serve it this once without keeping it
+                self._assets.pop(path, None)
+                return asset
+            self._assets[path] = asset
+            self._bytes += asset.memory
+        return asset
+
+    def get(self, path):
+        """Cached asset for an absolute path (re-read if the file changed); None if too big to cache"""
+        with self._lock:
+            asset = self._assets.get(path)
+        now = time.monotonic()
+        if asset is not None and now - asset.checked_at < self.recheck_s:
+            return asset
+        stat = os.stat(path)
+        if stat.st_size > self.max_file_bytes:
+            return None
+        if asset is not None and asset.mtime_ns == stat.st_mtime_ns and asset.size == stat.st_size:
+            asset.checked_at = now
+            return asset
+        return self._load(path, stat)
+
+    def is_versioned(self, filename):
+        return 'v' in request.args or bool(FINGERPRINT_PATTERN.search(filename))
+
+    def _cache_headers(self, response, filename):
+        if self.is_versioned(filename):
+            response.headers['Cache-Control'] = f'public, max-age={self.max_age_s}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+
+    def _not_modified(self, asset, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or f'"{etag}"' in tags
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return asset.modified_s <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _forget(self, path):
+        with self._lock:
+            asset = self._assets.pop(path, None)
+            if asset is not None:
+                self._bytes -= asset.memory
+
+    def _find(self, filename):
+        """(path, asset) for a request path; path is None if there's nothing to serve"""
+        bundled = self.builder.page(filename) if self.builder else None
+        if bundled:
+            path = os.path.join(self.root, *bundled.split('/'))
+            try:
+                return path, self.get(path)
+            except FileNotFoundError:
+                # Deleted since the builder last looked: serve the page as-is, rebuild on the next request
+                self._forget(path)
+                self.builder.invalidate()
+        path = self.resolve(filename)
+        if path is None:
+            return None, None
+        try:
+            return path, self.get(path)
+        except FileNotFoundError:
+            # Deleted between resolve() and the stat
+            self._forget(path)
+            return None, None
+
+    def response(self, filename):
+        """Flask response for GET /<filename>"""
+        path, asset = self._find(filename)
+        if path is None:
+            return jsonify({"error": "File not found"}), 404
+        if asset is None:
+            # Too big to keep in memory: Flask streams it with its own ETag / Range handling
+            self._count("from_disk")
+            response = send_file(path, conditional=True, etag=True, max_age=None)
+            self._cache_headers(response, filename)
+            return response
+        self._count("hits")
+
+        # Byte ranges are served from the uncompressed bytes only
+        range_header = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if range_header and if_range and if_range not in (f'"{asset.etag}"', asset.last_modified):
+            range_header = None
+        encoding = None if range_header else accepted_encoding(request.headers.get('Accept-Encoding'), asset.encoded)
+        # Each encoding is a different representation, so it gets its own ETag
+        etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+
+        headers = {'ETag': f'"{etag}"', 'Last-Modified': asset.last_modified, 'Accept-Ranges': 'bytes'}
+        if asset.encoded:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if self._not_modified(asset, etag):
+            self._count("not_modified")
+            response = Response(status=304, headers=headers)
+            self._cache_headers(response, filename)
+            return response
+
+        body, status = asset.data, 200
+        if range_header:
+            byte_range = parse_range(range_header, len(asset.data))
+            if byte_range is False:
+                headers['Content-Range'] = f'bytes */{len(asset.data)}'
+                return Response(status=416, headers=headers)
+            if byte_range is not None:
+                self._count("ranges")
+                start, end = byte_range
+                body, status = asset.data[start:end + 1], 206
+                headers['Content-Range'] = f'bytes {start}-{end}/{len(asset.data)}'
+        elif encoding:
+            self._count("compressed")
+            body = asset.encoded[encoding]
+            headers['Content-Encoding'] = encoding
+
+        response = Response(body, status=status, mimetype=asset.mimetype, headers=headers)
+        self._cache_headers(response, filename)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._assets),
+                "bytes": self._bytes,
+                "brotli": brotli is not None,
+                **self._counts,
+                "bundles": self.builder.stats() if self.builder else {"enabled": False}
+            }
+
+
+static_assets = StaticAssets(
+    ROOT_DIR,
+    max_bytes=config.STATIC_CACHE_MAX_BYTES,
+    max_file_bytes=config.STATIC_CACHE_MAX_FILE_BYTES,
+    recheck_s=config.STATIC_RECHECK_S,
+    max_age_s=config.STATIC_MAX_AGE_S,
+    builder=asset_builder if config.ASSET_BUNDLE else None
+)
+
+static_blueprint = Blueprint('static_assets', __name__)
+
+
+@static_blueprint.record_once
+def _preload(state):
+    # Only reads files: bundles are built by asset_bundle.py or on the first page request
+    files, size = static_assets.preload()
+    print(f"📦 Static assets: {files} files ({size / 1024:.0f} KiB with compressed copies) in memory")
+
+
+@static_blueprint.route('/<path:filename>', methods=['GET'])
+def serve_static(filename):
+    """Serve a frontend file from memory (ETag / 304, Range, gzip / brotli)"""
+    return static_assets.response(filename)
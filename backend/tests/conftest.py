@@ -0,0 +1,35 @@
+"""Shared test setup: the backend modules import each other flat, so put backend/ on sys.path.
+
+Run from the repository root with:
+
+    python -m pytest -q backend/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Page requests in tests must not build bundles into the repo's dist/; tests that need them use a temp root
+os.environ.setdefault('ASSET_BUNDLE', '0')
+
+
+@pytest.fixture
+def fake_adb(monkeypatch):
+    """Fake adb server with two devices; every entry point's adb client pointed at it"""
+    import adb_shell
+    import app
+    import app_voice_only
+    from adb_client import AdbConnectionManager, AdbServer
+    from benchmarks.fake_adb_server import FakeAdbServer
+    from devices import registry
+
+    server = FakeAdbServer(port=0, devices=2, latency_ms=0).start()
+    manager = AdbConnectionManager(AdbServer('127.0.0.1', server.port, timeout=2.0), sync_timeout=2.0)
+    monkeypatch.setattr(registry, 'manager', manager)
+    monkeypatch.setattr(adb_shell, 'session_pool', adb_shell.ShellSessionPool(manager, timeout=2.0))
+    for module in (app, app_voice_only):
+        monkeypatch.setattr(module, 'adb', manager)
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+from adb_client import AdbConnectionManager, AdbError, AdbServer, parse_device_list
+from benchmarks.fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture
+def server():
+    server = FakeAdbServer(port=0, devices=2, latency_ms=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    return AdbServer('127.0.0.1', server.port, timeout=2.0)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition never became true"
+        time.sleep(0.01)
+
+
+def test_parse_device_list():
+    text = 'emulator-5554\tdevice\n192.168.1.20:5555\toffline\n\nbroken line\n\tno serial\n'
+    assert parse_device_list(text) == {'emulator-5554': 'device', '192.168.1.20:5555': 'offline'}
+
+
+# ===== AdbServer =====
+
+def test_devices_and_host_commands(client):
+    assert client.devices() == {'emulator-5554': 'device', 'emulator-5556': 'device'}
+    assert client.host_command('host:version') == '0029'
+    assert client.host_command('host:connect:10.0.0.5:5555') == 'connected to 10.0.0.5:5555'
+    assert client.devices()['10.0.0.5:5555'] == 'device'
+
+
+def test_shell_returns_the_exit_code_and_output(client, server):
+    assert client.shell('emulator-5554', 'getprop ro.product.model') == (0, 'Fake Phone\n')
+    assert client.shell('emulator-5556', 'input keyevent 4') == (0, '')
+    server.failure_rate = 1.0
+    assert client.shell('emulator-5554', 'input keyevent 4') == (1, 'Error: simulated failure\n')
+    assert [serial for serial, _ in server.history] == ['emulator-5554', 'emulator-5556', 'emulator-5554']
+
+
+def test_shell_without_an_exit_status_has_no_code(client, server):
+    # The connection is cut before the device answers
+    server.drop_rate = 1.0
+    assert client.shell('emulator-5554', 'input keyevent 4') == (None, '')
+
+
+def test_unknown_device_is_an_adb_error(client):
+    with pytest.raises(AdbError, match="device 'nope' not found"):
+        client.shell('nope', 'input keyevent 4')
+
+
+def test_unreachable_server_is_an_os_error(server):
+    port = server.port
+    server.shutdown()
+    server.server_close()
+    with pytest.raises(OSError):
+        AdbServer('127.0.0.1', port, timeout=1.0).devices()
+
+
+# ===== AdbConnectionManager =====
+
+@pytest.fixture
+def manager(client):
+    return AdbConnectionManager(client, sync_timeout=2.0, command_timeout=2.0)
+
+
+def test_shell_reports_success_and_counts_errors(manager, server):
+    assert manager.shell('emulator-5554', 'getprop ro.product.model') == (True, 'Fake Phone\n', '')
+    server.failure_rate = 1.0
+    assert manager.shell('emulator-5554', 'input keyevent 4') == (False, 'Error: simulated failure\n', '')
+    success, stdout, stderr = manager.shell('nope', 'input keyevent 4')
+    assert (success, stdout) == (False, '')
+    assert "not found" in stderr
+    stats = manager.stats()
+    assert (stats["commands"], stats["command_errors"]) == (3, 2)
+
+
+def test_device_list_follows_the_server(manager, server):
+    updates = []
+    manager.add_listener(lambda devices, tracking: updates.append((devices, tracking)))
+    assert manager.get_connected_device() == 'emulator-5554'
+
+    assert manager.connect('10.0.0.5:5555') == (True, 'connected to 10.0.0.5:5555')
+    wait_for(lambda: '10.0.0.5:5555' in manager.devices())
+    assert manager.disconnect('10.0.0.5:5555') == (True, 'disconnected 10.0.0.5:5555')
+    wait_for(lambda: '10.0.0.5:5555' not in manager.devices())
+    assert [set(devices) for devices, _ in updates] == [
+        {'emulator-5554', 'emulator-5556'},
+        {'emulator-5554', 'emulator-5556', '10.0.0.5:5555'},
+        {'emulator-5554', 'emulator-5556'}
+    ]
+    assert all(tracking for _, tracking in updates)
+
+
+def test_tracker_reconnects_after_the_server_drops_it(manager, server):
+    updates = []
+    manager.add_listener(lambda devices, tracking: updates.append((devices, tracking)))
+    assert len(manager.devices()) == 2
+
+    assert server.drop_connections() == 1
+    # Lost: no devices until the tracker is back, then the full list again
+    wait_for(lambda: len(updates) >= 3)
+    assert updates[1] == ({}, False)
+    assert updates[2] == ({'emulator-5554': 'device', 'emulator-5556': 'device'}, True)
+    assert manager.stats()["tracking"] is True
+    assert manager.shell('emulator-5556', 'input keyevent 4')[0]
+
+
+def test_manager_without_a_server_answers_straight_away(server):
+    port = server.port
+    server.shutdown()
+    server.server_close()
+    manager = AdbConnectionManager(AdbServer('127.0.0.1', port, timeout=1.0), sync_timeout=5.0)
+    manager._last_server_start = time.monotonic()  # don't run the real `adb start-server`
+    started = time.monotonic()
+    assert manager.devices() == {}
+    assert manager.get_connected_device() is None
+    assert time.monotonic() - started < 2.0
+    assert manager.connect('10.0.0.5:5555')[0] is False
@@ -0,0 +1,173 @@
+import importlib
+import json
+import os
+import shlex
+import sys
+import textwrap
+
+import pytest
+
+import adb_commands
+import adb_shell
+
+# Shell metacharacters that must reach the device as plain text
+NASTY_MESSAGE = "Hi; rm -rf / && echo $(id) `id` $HOME 'single' \"double\" | cat > x\\ & *"
+NASTY_NUMBERS = ['5551234; reboot', '$(reboot)', '`reboot`', '555|cat', '555&&id', "555'", '555"', '']
+
+
+# ===== TEMPLATES =====
+
+def test_argv_templates():
+    assert adb_commands.CALL.argv('R58M12ABC', number='+919876543210') == [
+        'adb', '-s', 'R58M12ABC', 'shell', 'am', 'start', '-a', 'android.intent.action.CALL', '-d', 'tel:+919876543210']
+    assert adb_commands.OPEN_SMS.argv('192.168.1.20:5555', number='5551234') == [
+        'adb', '-s', '192.168.1.20:5555', 'shell', 'am', 'start', '-a', 'android.intent.action.SENDTO',
+        '-d', 'sms:5551234']
+    assert adb_commands.OPEN_SMS_WITH_BODY.argv('R58M12ABC', number='5551234', body=NASTY_MESSAGE) == [
+        'adb', '-s', 'R58M12ABC', 'shell', 'am', 'start', '-a', 'android.intent.action.SENDTO',
+        '-d', 'sms:5551234', '--es', 'sms_body', NASTY_MESSAGE]
+
+
+def test_shell_command_quoting():
+    assert adb_commands.CALL.shell_command(number='+919876543210') == \
+        'am start -a android.intent.action.CALL -d tel:+919876543210'
+    assert adb_commands.INPUT_TEXT.shell_command(text="it's $5") == "input text 'it'\"'\"'s $5'"
+    assert adb_commands.OPEN_SMS_WITH_BODY.shell_command(number='5551234', body='a; b') == \
+        "am start -a android.intent.action.SENDTO -d sms:5551234 --es sms_body 'a; b'"
+
+
+@pytest.mark.parametrize('body', [NASTY_MESSAGE, '', ' ', "'", '"', '\\', '\n', '{braces} {0}', 'émoji 📱'])
+def test_shell_command_round_trips_through_a_posix_shell(body):
+    command = adb_commands.OPEN_SMS_WITH_BODY.shell_command(number='5551234', body=body)
+    assert shlex.split(command) == adb_commands.OPEN_SMS_WITH_BODY.fill(number='5551234', body=body)
+
+
+@pytest.mark.parametrize('raw, number', [
+    ('+91 98765-43210', '+919876543210'),
+    ('(555) 123.4567', '5551234567'),
+    ('555\n1234', '5551234')  # whitespace, newlines included, is dropped rather than passed on
+])
+def test_phone_numbers_are_normalized(raw, number):
+    assert adb_commands.normalize_phone_number(raw) == number
+
+
+@pytest.mark.parametrize('raw', NASTY_NUMBERS)
+def test_phone_numbers_with_shell_metacharacters_are_rejected(raw):
+    with pytest.raises(adb_commands.InvalidPhoneNumberError):
+        adb_commands.normalize_phone_number(raw)
+
+
+# ===== STUB adb ON PATH =====
+
+@pytest.fixture
+def stub_adb(tmp_path, monkeypatch):
+    """An `adb` executable that records its argv as JSON, first on PATH"""
+    if os.name == 'nt':
+        pytest.skip("stub adb is a POSIX script")
+    log = tmp_path / 'argv.jsonl'
+    script = tmp_path / 'adb'
+    script.write_text(textwrap.dedent(f'''\
+        #!{sys.executable}
+        import json, sys
+        with open({str(log)!r}, 'a') as f:
+            f.write(json.dumps(sys.argv[1:]) + '\\n')
+    '''))
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{tmp_path}{os.pathsep}{os.environ.get("PATH", "")}')
+    return lambda: [json.loads(line) for line in log.read_text().splitlines()]
+
+
+def test_run_argv_passes_arguments_without_a_shell(stub_adb):
+    assert adb_commands.run_argv('R58M12ABC', adb_commands.CALL, number='5551234')[0]
+    assert adb_commands.run_argv('R58M12ABC', adb_commands.OPEN_SMS_WITH_BODY, number='5551234', body=NASTY_MESSAGE)[0]
+    assert adb_commands.run_argv('R58M12ABC', adb_commands.INPUT_TEXT, text=adb_commands.input_text(NASTY_MESSAGE))[0]
+    assert stub_adb() == [
+        ['-s', 'R58M12ABC', 'shell', 'am', 'start', '-a', 'android.intent.action.CALL', '-d', 'tel:5551234'],
+        ['-s', 'R58M12ABC', 'shell', 'am', 'start', '-a', 'android.intent.action.SENDTO', '-d', 'sms:5551234',
+         '--es', 'sms_body', NASTY_MESSAGE],
+        ['-s', 'R58M12ABC', 'shell', 'input', 'text', NASTY_MESSAGE.replace(' ', '%s')]
+    ]
+
+
+def test_sms_benchmark_baseline_uses_the_command_templates(stub_adb, monkeypatch):
+    from benchmarks import bench_sms
+    monkeypatch.setattr(bench_sms.time, 'sleep', lambda seconds: None)
+    assert bench_sms.legacy_send('R58M12ABC', '5551234', NASTY_MESSAGE)
+    # adb joins the arguments after "shell" into one line, which the device's shell splits again
+    assert [shlex.split(' '.join(argv[3:])) for argv in stub_adb()] == [
+        adb_commands.OPEN_SMS.fill(number='5551234'),
+        ['input', 'keyevent', str(adb_commands.KEY_DEL)],
+        ['input', 'text', NASTY_MESSAGE.replace(' ', '%s')],
+        ['input', 'keyevent', str(adb_commands.KEY_TAB)],
+        ['input', 'keyevent', str(adb_commands.KEY_ENTER)]
+    ]
+    assert all(argv[:3] == ['-s', 'R58M12ABC', 'shell'] for argv in stub_adb())
+
+
+# ===== ROUTES, AGAINST THE FAKE adb SERVER =====
+
+def device_argv(server, serial=None):
+    """Each command the fake server ran, split the way the device's shell splits it (one list per command)"""
+    commands = []
+    for device, line in server.history:
+        if serial and device != serial:
+            continue
+        lexer = shlex.shlex(line, posix=True, punctuation_chars=';')
+        lexer.whitespace_split = True
+        command = []
+        for token in lexer:
+            if token == ';':
+                commands.append(command)
+                command = []
+            else:
+                command.append(token)
+        commands.append(command)
+    return commands
+
+
+def post(module, path, body):
+    client = importlib.import_module(module).app.test_client()
+    return client.post(path + '?wait=1', json=body)
+
+
+def test_call_route_sends_exact_argv(fake_adb):
+    response = post('app', '/api/phone/call', {"phoneNumber": "+91 98765-43210", "device": "emulator-5556"})
+    assert response.status_code == 200, response.get_json()
+    assert device_argv(fake_adb) == [['am', 'start', '-a', 'android.intent.action.CALL', '-d', 'tel:+919876543210']]
+    assert [serial for serial, _ in fake_adb.history] == ['emulator-5556']
+
+
+def test_message_route_sends_exact_argv_to_every_device(fake_adb):
+    response = post('app_voice_only', '/api/phone/message', {"phoneNumber": "5551234", "device": "all"})
+    assert response.status_code == 200, response.get_json()
+    expected = [['am', 'start', '-a', 'android.intent.action.SENDTO', '-d', 'sms:5551234']]
+    assert device_argv(fake_adb, 'emulator-5554') == expected
+    assert device_argv(fake_adb, 'emulator-5556') == expected
+
+
+def test_send_message_route_passes_the_body_as_one_argument(fake_adb):
+    response = post('app', '/api/phone/send-message', {"phoneNumber": "5551234", "message": NASTY_MESSAGE})
+    assert response.status_code == 200, response.get_json()
+    assert device_argv(fake_adb) == [['am', 'start', '-a', 'android.intent.action.SENDTO', '-d', 'sms:5551234',
+                                      '--es', 'sms_body', NASTY_MESSAGE]]
+
+
+def test_send_message_session_types_the_body_as_one_argument(fake_adb):
+    response = post('app_voice_only', '/api/phone/send-message', {"phoneNumber": "5551234", "message": NASTY_MESSAGE})
+    assert response.get_json()["message"] == "Message sent"
+    commands = [argv for argv in device_argv(fake_adb) if argv[:1] in (['am'], ['input'])]
+    assert commands == [
+        ['am', 'start', '-W', '-a', 'android.intent.action.SENDTO', '-d', 'sms:5551234'],
+        ['input', 'keyevent', str(adb_commands.KEY_DEL)],
+        ['input', 'text', NASTY_MESSAGE.replace(' ', '%s')],
+        ['input', 'keyevent', str(adb_commands.KEY_TAB)],
+        ['input', 'keyevent', str(adb_commands.KEY_ENTER)]
+    ]
+
+
+@pytest.mark.parametrize('number', NASTY_NUMBERS[:5])
+@pytest.mark.parametrize('path', ['/api/phone/call', '/api/phone/message', '/api/phone/send-message'])
+def test_routes_reject_numbers_with_shell_metacharacters(fake_adb, path, number):
+    response = post('app', path, {"phoneNumber": number, "message": "hi"})
+    assert response.status_code == 400
+    assert list(fake_adb.history) == []
@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+import adb_shell
+from adb_client import AdbConnectionManager, AdbError, AdbServer
+from adb_shell import ShellSession, ShellSessionPool, wait_for_focus
+from benchmarks.fake_adb_server import SMS_ACTIVITY, FakeAdbServer
+
+SERIAL = 'emulator-5554'
+
+
+@pytest.fixture
+def server():
+    server = FakeAdbServer(port=0, devices=2, latency_ms=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pool(server):
+    manager = AdbConnectionManager(AdbServer('127.0.0.1', server.port, timeout=2.0))
+    return ShellSessionPool(manager, per_device=2, idle_s=60.0, timeout=2.0)
+
+
+# ===== ShellSession =====
+
+def test_session_runs_commands_and_reads_their_exit_codes(pool, server):
+    session = ShellSession(pool.manager.server, SERIAL, timeout=2.0)
+    try:
+        assert session.run('getprop ro.product.model') == (0, 'Fake Phone\n')
+        assert session.run('input keyevent 4; input keyevent 66') == (0, '')
+        server.failure_rate = 1.0
+        assert session.run('input keyevent 4') == (1, 'Error: simulated failure\n')
+        assert session.commands == 3
+    finally:
+        session.close()
+    # Every command went over the one connection
+    assert server.stats()["connections"] == 1
+    assert [command for _, command in server.history] == [
+        'getprop ro.product.model', 'input keyevent 4; input keyevent 66', 'input keyevent 4']
+
+
+def test_session_on_an_unknown_device_is_an_adb_error(pool):
+    with pytest.raises(AdbError, match="not found"):
+        ShellSession(pool.manager.server, 'nope')
+
+
+def test_dropped_session_raises(pool, server):
+    session = ShellSession(pool.manager.server, SERIAL, timeout=2.0)
+    server.drop_rate = 1.0
+    with pytest.raises(AdbError, match="closed"):
+        session.run('input keyevent 4')
+    session.close()
+
+
+# ===== ShellSessionPool =====
+
+def test_sessions_are_returned_and_reused(pool, server):
+    for _ in range(3):
+        with pool.session(SERIAL) as session:
+            assert session.run('input keyevent 4')[0] == 0
+    stats = pool.stats()
+    assert (stats["opened"], stats["reused"], stats["idle"]) == (1, 2, {SERIAL: 1})
+    assert server.stats()["connections"] == 1
+
+
+def test_concurrent_checkouts_get_their_own_sessions_and_extra_ones_are_closed(pool):
+    inside = threading.Barrier(3, timeout=5)
+    sessions = []
+
+    def use():
+        with pool.session(SERIAL) as session:
+            sessions.append(session)
+            inside.wait()
+
+    threads = [threading.Thread(target=use) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len({id(session) for session in sessions}) == 3
+    # Only per_device of them are kept for later
+    assert pool.stats()["idle"] == {SERIAL: 2}
+    with pool.session('emulator-5556'):
+        pass
+    assert pool.stats()["idle"] == {SERIAL: 2, 'emulator-5556': 1}
+
+
+def test_idle_sessions_past_idle_s_are_replaced(pool):
+    pool.idle_s = 0.0
+    with pool.session(SERIAL) as first:
+        pass
+    with pool.session(SERIAL) as second:
+        assert second is not first
+    assert (pool.stats()["opened"], pool.stats()["reused"]) == (2, 0)
+
+
+def test_dropped_session_is_discarded_and_the_next_checkout_reconnects(pool, server):
+    with pool.session(SERIAL) as session:
+        session.run('input keyevent 4')
+    # The adb server restarts: the pooled session's connection is gone
+    server.drop_connections()
+    with pytest.raises(AdbError):
+        with pool.session(SERIAL) as session:
+            session.run('input keyevent 4')
+    assert pool.stats()["broken"] == 1
+    assert pool.stats()["idle"] == {SERIAL: 0}
+
+    with pool.session(SERIAL) as session:
+        assert session.run('input keyevent 4') == (0, '')
+    assert pool.stats()["opened"] == 2
+
+
+def test_sms_package_is_resolved_once_per_device(pool, server):
+    with pool.session(SERIAL) as session:
+        assert pool.sms_package(SERIAL, session) == SMS_ACTIVITY.split('/')[0]
+        assert pool.sms_package(SERIAL, session) == SMS_ACTIVITY.split('/')[0]
+    assert sum('resolve-activity' in command for _, command in server.history) == 1
+
+
+def test_wait_for_focus_polls_until_the_sms_app_is_in_front(pool):
+    package = SMS_ACTIVITY.split('/')[0]
+    with pool.session(SERIAL) as session:
+        assert wait_for_focus(session, package, timeout=0.05, interval=0.01) is False
+        session.run('am start -W -a android.intent.action.SENDTO -d sms:5551234')
+        assert wait_for_focus(session, package, timeout=1.0, interval=0.01) is True
+        # Without a known package any messaging app counts
+        assert wait_for_focus(session, None, timeout=0.05, interval=0.01) is True
+
+
+def test_send_sms_uses_one_pooled_session(pool, server, monkeypatch):
+    monkeypatch.setattr(adb_shell, 'session_pool', pool)
+    assert adb_shell.send_sms(SERIAL, '5551234', 'hello there', ready_timeout=1.0) is True
+    assert adb_shell.send_sms(SERIAL, '5551234', 'again', ready_timeout=1.0) is True
+    assert server.stats()["connections"] == 1
+    assert pool.stats()["reused"] == 1
+
+    server.failure_rate = 1.0
+    assert adb_shell.send_sms(SERIAL, '5551234', 'fails', ready_timeout=1.0) is False
@@ -0,0 +1,194 @@
+import glob
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import asset_bundle
+from asset_bundle import AssetBuilder, minify_css, minify_js, rebase_css_urls
+
+
+@pytest.fixture(autouse=True)
+def builtin_minifiers(monkeypatch):
+    """Test the minifiers in this module, not rjsmin / rcssmin when they happen to be installed"""
+    monkeypatch.setattr(asset_bundle, 'rjsmin', None)
+    monkeypatch.setattr(asset_bundle, 'rcssmin', None)
+
+
+# ===== minify_js =====
+
+@pytest.mark.parametrize('source, minified', [
+    # Division after a value, a postfix operator, ")" or "]"
+    ("x = a / b / c;", "x=a/b/c;"),
+    ("x = a++ / 2 / b;", "x=a++/2/b;"),
+    ("x = a-- / 2 / b;", "x=a--/2/b;"),
+    ("z = (a) / 2 / (b); w = [1] / 2;", "z=(a)/2/(b);w=[1]/2;"),
+    # Regex after an operator, "(" or a keyword; its contents are kept as written
+    ("var r = /\\/\\*  x  *\\//g;", "var r=/\\/\\*  x  *\\//g;"),
+    ("s = x.replace(/\"/g, '')", "s=x.replace(/\"/g,'')"),
+    ("if (ok) return /a b+c/i.test(s)", "if(ok)return/a b+c/i.test(s)"),
+    ("q = typeof /x/", "q=typeof/x/"),
+    ("m = s.match(/[/]/)", "m=s.match(/[/]/)"),
+])
+def test_regex_or_division(source, minified):
+    assert minify_js(source) == minified + '\n'
+
+
+def test_template_literals_are_kept_verbatim():
+    source = "const t = `a   // not a comment ${ x /* nor this */ }   b`;  // dropped\n"
+    assert minify_js(source) == "const t=`a   // not a comment ${ x /* nor this */ }   b`;\n"
+
+
+def test_comment_markers_inside_strings_are_kept():
+    source = "u = \"http://x.com/*\" + '/* no */' + \"it's\" // comment\n"
+    assert minify_js(source) == "u=\"http://x.com/*\"+'/* no */'+\"it's\"\n"
+
+
+@pytest.mark.parametrize('source, minified', [
+    # Line breaks stay, so automatic semicolon insertion works as before
+    ("let a = 1\nlet b = 2\n(a)\n", "let a=1\nlet b=2\n(a)"),
+    ("function f() {\n  return\n    value\n}\n", "function f(){\nreturn\nvalue\n}"),
+    ("a = b\n/* block\ncomment */++c\n", "a=b\n++c"),
+    ("i\n++\nj\n", "i\n++\nj"),
+])
+def test_line_breaks_survive_for_semicolon_insertion(source, minified):
+    assert minify_js(source) == minified + '\n'
+
+
+def test_spaces_that_matter_are_kept():
+    assert minify_js("y = a + +b - -c; var  x = new  Foo; return  x") == "y=a+ +b- -c;var x=new Foo;return x\n"
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="needs node to parse the output")
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(asset_bundle.ROOT_DIR, 'js', '*.js'))),
+                         ids=os.path.basename)
+def test_minified_frontend_scripts_still_parse(path, tmp_path):
+    with open(path, encoding='utf-8-sig') as f:
+        source = f.read()
+    minified = tmp_path / os.path.basename(path)
+    minified.write_text(minify_js(source), encoding='utf-8')
+    check = subprocess.run(['node', '--check', str(minified)], capture_output=True, text=True)
+    assert check.returncode == 0, check.stderr
+
+
+# ===== minify_css / rebase_css_urls =====
+
+def test_minify_css():
+    source = "a :hover {\n  color: red ;\n}\n/* gone */\nb > i { content: '  /* kept */  '; }\n"
+    assert minify_css(source) == "a :hover{color: red}b>i{content: '  /* kept */  '}\n"
+
+
+@pytest.mark.parametrize('url, rebased', [
+    ("url(../img/logo.png)", "url(../img/logo.png)"),
+    ("url('fonts/a.woff2')", "url('../css/fonts/a.woff2')"),
+    ('url( "bg.svg" )', 'url("../css/bg.svg")'),
+    ("url(data:image/png;base64,AAAA)", "url(data:image/png;base64,AAAA)"),
+    ("url(https://cdn.example.com/a.css)", "url(https://cdn.example.com/a.css)"),
+    ("url(/img/root.png)", "url(/img/root.png)"),
+    ("url(#gradient)", "url(#gradient)"),
+])
+def test_css_urls_are_rebased_onto_the_dist_folder(url, rebased):
+    assert rebase_css_urls(f"a{{background:{url}}}", 'css', 'dist') == f"a{{background:{rebased}}}"
+
+
+# ===== build: manifest and page rewrite =====
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+    <link rel="stylesheet" href="css/style.css">
+    <link rel="stylesheet" href="https://cdn.example.com/font.css">
+</head><body>
+    <script src="js/config.js"></script>
+    <!-- shared by every page -->
+    <script src="js/auth.js"></script>
+    <script src="https://cdn.example.com/lib.js"></script>
+    <script src="js/page.js"></script>
+    <script src="https://cdn.example.com/analytics.js"></script>
+    <script src="js/missing.js"></script>
+</body></html>
+"""
+
+
+@pytest.fixture
+def site(tmp_path):
+    for name, text in {
+        'index.html': PAGE,
+        'plain.html': '<html><body>no assets</body></html>',
+        'css/style.css': "body { background: url(img/bg.png); }\n",
+        'js/config.js': "const API = 'http://localhost:5000' // base\n",
+        'js/auth.js': "function token() {\n  return localStorage.token\n}\n",
+        'js/page.js': "console.log(API, token())\n",
+    }.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return tmp_path
+
+
+def read(root, relative):
+    return (root / relative).read_text()
+
+
+def test_build_writes_bundles_manifest_and_rewritten_pages(site):
+    builder = AssetBuilder(str(site), 'dist', recheck_s=0)
+    manifest = builder.build()
+
+    assert list(manifest["pages"]) == ['index.html']
+    entry = manifest["pages"]["index.html"]
+    assert entry["built"] == 'dist/pages/index.html'
+    assert (entry["requests_before"], entry["requests_after"]) == (4, 3)
+    assert json.loads(read(site, 'dist/manifest.json')) == manifest
+
+    bundles = {os.path.splitext(name)[0].split('.')[0]: name for name in manifest["files"]}
+    assert set(bundles) == {'dist/style', 'dist/config-auth', 'dist/page'}
+    assert manifest["files"][bundles['dist/config-auth']]["sources"] == ['js/config.js', 'js/auth.js']
+    assert read(site, bundles['dist/style']) == "body{background: url(../css/img/bg.png)}\n"
+    assert read(site, bundles['dist/config-auth']) == \
+        "const API='http://localhost:5000';\nfunction token(){\nreturn localStorage.token\n}\n"
+
+    html = read(site, 'dist/pages/index.html')
+    assert f'<link rel="stylesheet" href="{bundles["dist/style"]}">' in html
+    assert f'<script src="{bundles["dist/config-auth"]}"></script>' in html
+    assert f'<script src="{bundles["dist/page"]}"></script>' in html
+    # External and missing files are left as they were, in the same order
+    assert html.index('cdn.example.com/lib.js') < html.index(bundles['dist/page']) < html.index('js/missing.js')
+    assert 'js/config.js' not in html
+
+
+def test_page_lookup_and_rebuild_on_change(site):
+    builder = AssetBuilder(str(site), 'dist', recheck_s=0)
+    assert builder.page('index.html') == 'dist/pages/index.html'
+    assert builder.page('plain.html') is None
+    old = set(builder.build()["files"])
+
+    (site / 'js' / 'auth.js').write_text("function token() { return null }\n")
+    os.utime(site / 'js' / 'auth.js', ns=(1, 1))
+    builder.page('index.html')
+    new = set(json.loads(read(site, 'dist/manifest.json'))["files"])
+    assert new != old
+    # The replaced bundle is deleted, the unchanged ones are kept
+    assert sorted(old - new)[0].startswith('dist/config-auth.')
+    assert not (site / sorted(old - new)[0]).exists()
+    assert all((site / name).exists() for name in new)
+
+
+def test_first_request_reuses_a_current_build_without_writing(site):
+    AssetBuilder(str(site), 'dist').build()
+    written = {path: os.stat(path).st_mtime_ns for path in glob.glob(str(site / 'dist' / '**'), recursive=True)}
+
+    builder = AssetBuilder(str(site), 'dist')
+    assert builder.page('index.html') == 'dist/pages/index.html'
+    assert builder.stats()["builds"] == 0
+    assert {path: os.stat(path).st_mtime_ns for path in written} == written
+
+
+def test_first_request_builds_when_a_built_file_is_missing(site):
+    manifest = AssetBuilder(str(site), 'dist').build()
+    os.remove(site / next(iter(manifest["files"])))
+
+    builder = AssetBuilder(str(site), 'dist')
+    assert builder.page('index.html') == 'dist/pages/index.html'
+    assert builder.stats()["builds"] == 1
+    assert all((site / name).exists() for name in manifest["files"])
@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import deque
+
+import pytest
+
+import app
+from batching import BatchScheduler, QueueFullError, _PendingFrame
+
+
+class Model:
+    """run_batch stand-in: records every batch and can be held closed"""
+
+    def __init__(self):
+        self.batches = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, images, group):
+        self.batches.append((group, list(images)))
+        self.entered.set()
+        assert self.gate.wait(5)
+        return [(group, image * 10) for image in images]
+
+
+def submit_all(scheduler, frames, timeout=5):
+    """Submit (image, group) pairs from one thread each, all at once"""
+    results = [None] * len(frames)
+    start = threading.Barrier(len(frames))
+
+    def worker(index, image, group):
+        start.wait()
+        results[index] = scheduler.submit(image, timeout=timeout, group=group)
+
+    threads = [threading.Thread(target=worker, args=(i, *frame)) for i, frame in enumerate(frames)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition never became true"
+        time.sleep(0.005)
+
+
+def test_concurrent_submits_share_batches():
+    model = Model()
+    scheduler = BatchScheduler(model, max_batch_size=4, max_wait_ms=500)
+    results = submit_all(scheduler, [(i, None) for i in range(8)])
+
+    # Every caller gets the result for its own frame
+    assert results == [(None, i * 10) for i in range(8)]
+    assert sorted(len(images) for _, images in model.batches) == [4, 4]
+    stats = scheduler.stats()
+    assert (stats["batches"], stats["frames"], stats["max_batch_size_seen"]) == (2, 8, 4)
+    assert stats["queue_depth"] == 0
+
+
+def test_frames_with_different_options_never_share_a_batch():
+    model = Model()
+    scheduler = BatchScheduler(model, max_batch_size=8, max_wait_ms=50)
+    frames = [(i, 'conf=0.5' if i % 2 else 'conf=0.25') for i in range(12)]
+    results = submit_all(scheduler, frames)
+
+    assert results == [(group, image * 10) for image, group in frames]
+    for group, images in model.batches:
+        assert {frames[image][1] for image in images} == {group}
+    assert sum(len(images) for _, images in model.batches) == 12
+
+
+def test_the_group_that_waited_longest_runs_first():
+    model = Model()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch_size=8, max_wait_ms=0)
+    threads = [threading.Thread(target=scheduler.submit, args=(0,), kwargs={'group': 'busy'})]
+    threads[0].start()
+    assert model.entered.wait(5)
+
+    # The dispatcher is busy: 'late' is queued after 'early' but has more frames
+    for image, group in [(1, 'early'), (2, 'late'), (3, 'late')]:
+        threads.append(threading.Thread(target=scheduler.submit, args=(image,), kwargs={'group': group}))
+        threads[-1].start()
+        wait_for(lambda: scheduler.stats()["queue_depth"] == image)
+    model.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert [group for group, _ in model.batches] == ['busy', 'early', 'late']
+
+
+def test_dispatchers_run_batches_in_parallel():
+    both_running = threading.Barrier(2, timeout=5)
+
+    def model(images, group):
+        both_running.wait()
+        return images
+
+    scheduler = BatchScheduler(model, max_batch_size=1, max_wait_ms=0, concurrency=2)
+    assert submit_all(scheduler, [(1, None), (2, None)]) == [1, 2]
+
+
+def test_model_errors_reach_every_caller_in_the_batch():
+    def model(images, group):
+        raise RuntimeError("CUDA out of memory")
+
+    scheduler = BatchScheduler(model, max_batch_size=4, max_wait_ms=200)
+    errors = []
+
+    def worker(image):
+        with pytest.raises(RuntimeError, match="out of memory") as raised:
+            scheduler.submit(image, timeout=5)
+        errors.append(raised.value)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 3
+    assert scheduler.stats()["errors"] >= 1
+
+
+def test_wrong_number_of_results_is_an_error():
+    scheduler = BatchScheduler(lambda images, group: [], max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="0 results for 1 frames"):
+        scheduler.submit(1, timeout=5)
+
+
+def test_full_queue_rejects_new_frames():
+    model = Model()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch_size=1, max_wait_ms=0, max_queue_depth=1)
+    running = threading.Thread(target=scheduler.submit, args=(1,))
+    running.start()
+    assert model.entered.wait(5)
+    queued = threading.Thread(target=scheduler.submit, args=(2,))
+    queued.start()
+    wait_for(lambda: scheduler.stats()["queue_depth"] == 1)
+
+    with pytest.raises(QueueFullError):
+        scheduler.submit(3, timeout=5)
+    assert scheduler.stats()["rejected"] == 1
+
+    model.gate.set()
+    running.join(5)
+    queued.join(5)
+    assert [images for _, images in model.batches] == [[1], [2]]
+
+
+def test_timed_out_frames_are_never_sent_to_the_model():
+    model = Model()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch_size=4, max_wait_ms=0)
+    running = threading.Thread(target=scheduler.submit, args=(1,))
+    running.start()
+    assert model.entered.wait(5)
+
+    with pytest.raises(TimeoutError):
+        scheduler.submit(2, timeout=0.05)
+    assert scheduler.stats()["queue_depth"] == 0
+
+    model.gate.set()
+    running.join(5)
+    assert scheduler.submit(3, timeout=5) == (None, 30)
+    assert [images for _, images in model.batches] == [[1], [3]]
+    assert scheduler.stats()["expired"] == 1
+
+
+def test_expired_frames_are_dropped_when_the_batch_is_collected():
+    model = Model()
+    scheduler = BatchScheduler(model, max_batch_size=4, max_wait_ms=0)
+    # Past its deadline but still queued: its caller hasn't woken up to withdraw it yet
+    stale = _PendingFrame(1, None, timeout=0.0)
+    with scheduler._changed:
+        scheduler._groups[None] = deque([stale])
+        scheduler._depth = 1
+
+    assert scheduler.submit(2, timeout=5) == (None, 20)
+    assert [images for _, images in model.batches] == [[2]]
+    assert not stale.done.is_set()
+    assert scheduler.stats()["expired"] == 1
+
+
+# ===== /detect status codes =====
+
+class SchedulerPipeline:
+    """/detect in front of a real scheduler and a model that can be held"""
+
+    def __init__(self, scheduler, timeout):
+        self.scheduler = scheduler
+        self.timeout = timeout
+
+    def parse_options(self, values):
+        return None
+
+    def detect(self, image_bytes, client_id=None, options=None, columns=False):
+        self.scheduler.submit(len(image_bytes), timeout=self.timeout, group=options)
+        return {"predictions": []}
+
+
+@pytest.fixture
+def busy(monkeypatch):
+    """App whose model is stuck on one request until busy.model.gate is set"""
+    model = Model()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch_size=1, max_wait_ms=0, max_queue_depth=1)
+    pipeline = SchedulerPipeline(scheduler, timeout=5)
+    monkeypatch.setattr(app.model_loader, 'start', lambda: None)
+    monkeypatch.setattr(app.model_loader, 'get', lambda: pipeline)
+
+    statuses = []
+
+    def post():
+        statuses.append(app.app.test_client().post('/detect', data=b'\xff\xd8', content_type='image/jpeg').status_code)
+
+    running = threading.Thread(target=post)
+    running.start()
+    assert model.entered.wait(5)
+    pipeline.model, pipeline.statuses, pipeline.post = model, statuses, post
+    yield pipeline
+    model.gate.set()
+    running.join(5)
+
+
+def test_full_queue_is_a_503_with_retry_after(busy):
+    queued = threading.Thread(target=busy.post)
+    queued.start()
+    wait_for(lambda: busy.scheduler.stats()["queue_depth"] == 1)
+
+    response = app.app.test_client().post('/detect', data=b'\xff\xd8', content_type='image/jpeg')
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert response.get_json() == {"error": "Server busy, try again"}
+
+    busy.model.gate.set()
+    queued.join(5)
+    wait_for(lambda: len(busy.statuses) == 2)
+    assert busy.statuses == [200, 200]
+
+
+def test_timeout_is_a_504(busy):
+    busy.timeout = 0.05
+    response = app.app.test_client().post('/detect', data=b'\xff\xd8', content_type='image/jpeg')
+    assert response.status_code == 504
+    assert response.get_json() == {"error": "Detection timed out"}
+    assert busy.scheduler.stats()["expired"] == 1
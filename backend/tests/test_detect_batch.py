@@ -0,0 +1,147 @@
+import json
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+import config
+import detect_batch
+import detection
+from preprocess import Preprocessor
+
+
+class StubEngine:
+    concurrency = 1
+
+
+class StubPipeline:
+    """Real decode + letterbox, one fixed detection per frame instead of a model"""
+
+    frames_detected = 0
+    last = None
+
+    def __init__(self, progress=None):
+        self.preprocessor = Preprocessor(imgsz=64, pool_size=16)
+        self.engine = StubEngine()
+        StubPipeline.last = self
+
+    def parse_options(self, values):
+        return values
+
+    def detect_prepared(self, frames, options=None):
+        StubPipeline.frames_detected += len(frames)
+        return [[{"class": "cup", "confidence": 0.9, "box": [0.0, 0.0, 8.0, 8.0]}] for _ in frames]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def scans(tmp_path, monkeypatch):
+    """Folder with two images, an undecodable one, a 5-frame video and a broken video"""
+    monkeypatch.setattr(detection, 'DetectionPipeline', StubPipeline)
+    monkeypatch.setenv('DETECT_BATCH_SIZE', '2')
+    StubPipeline.frames_detected = 0
+    folder = tmp_path / 'scans'
+    (folder / 'nested').mkdir(parents=True)
+    cv2.imwrite(str(folder / 'a.jpg'), np.full((48, 64, 3), 200, np.uint8))
+    cv2.imwrite(str(folder / 'nested' / 'b.png'), np.full((32, 32, 3), 100, np.uint8))
+    (folder / 'broken.jpg').write_bytes(b'not an image')
+    (folder / 'broken.mp4').write_bytes(b'not a video')
+    video = cv2.VideoWriter(str(folder / 'clip.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), 5, (64, 48))
+    if not video.isOpened():
+        pytest.skip("OpenCV can't write mp4 here")
+    for i in range(5):
+        video.write(np.full((48, 64, 3), i * 40, np.uint8))
+    video.release()
+    return folder
+
+
+def run_cli(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['detect_batch.py', *map(str, args), '--progress-s', '60'])
+    assert detect_batch.main() == 0
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def keys(records):
+    return sorted(((r["source"].rsplit('/', 1)[-1], r["frame"]) for r in records), key=str)
+
+
+def test_second_run_resumes_without_repeating_records(scans, tmp_path, monkeypatch):
+    output = tmp_path / 'out' / 'results.jsonl'
+    run_cli(monkeypatch, scans, '-o', output, '--stride', 2, '--batch-size', 2)
+    records = read_records(output)
+    assert keys(records) == keys([
+        {"source": "a.jpg", "frame": None}, {"source": "b.png", "frame": None},
+        {"source": "broken.jpg", "frame": None}, {"source": "broken.mp4", "frame": None},
+        {"source": "clip.mp4", "frame": 0}, {"source": "clip.mp4", "frame": 2}, {"source": "clip.mp4", "frame": 4}
+    ])
+    errors = {r["source"].rsplit('/', 1)[-1]: r["error"] for r in records if "error" in r}
+    assert set(errors) == {"broken.jpg", "broken.mp4"}
+    assert errors["broken.mp4"] == "Could not open video"
+    assert StubPipeline.frames_detected == 5
+
+    before = output.read_text()
+    run_cli(monkeypatch, scans, '-o', output, '--stride', 2, '--batch-size', 2)
+    assert output.read_text() == before
+    assert StubPipeline.frames_detected == 5
+
+
+def test_resume_redoes_only_missing_and_partially_written_records(scans, tmp_path, monkeypatch):
+    output = tmp_path / 'results.jsonl'
+    run_cli(monkeypatch, scans, '-o', output)
+    complete = read_records(output)
+    lines = output.read_text().splitlines(keepends=True)
+    # Killed mid-run: two records lost and the last one cut off halfway through
+    output.write_text(''.join(lines[:-3]) + lines[-3][:10])
+
+    StubPipeline.frames_detected = 0
+    run_cli(monkeypatch, scans, '-o', output)
+    resumed = read_records(output)
+    assert keys(resumed) == keys(complete)
+    assert len(resumed) == len(complete)
+    assert StubPipeline.frames_detected <= 3
+
+
+def test_no_resume_starts_over(scans, tmp_path, monkeypatch):
+    output = tmp_path / 'results.jsonl'
+    run_cli(monkeypatch, scans, '-o', output)
+    first = read_records(output)
+    run_cli(monkeypatch, scans, '-o', output, '--no-resume')
+    assert keys(read_records(output)) == keys(first)
+    assert StubPipeline.frames_detected == 2 * 7
+
+
+def test_iter_items_skips_done_frames_and_errors(scans):
+    files = detect_batch.find_inputs([str(scans)])
+    video = next(f for f in files if f.endswith('clip.mp4'))
+    broken = next(f for f in files if f.endswith('broken.mp4'))
+    done = {(video, 0), (video, 1), (broken, None)}
+    items = list(detect_batch.iter_items(files, Preprocessor(imgsz=64), done, stride=1))
+    assert [(item.source, item.frame) for item in items if item.source in (video, broken)] == \
+        [(video, 2), (video, 3), (video, 4)]
+
+
+def test_buffer_pool_fits_batches_larger_than_the_server_batch_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(detection, 'DetectionPipeline', StubPipeline)
+    monkeypatch.setenv('DETECT_BATCH_SIZE', '2')
+    batch_size, prefetch = 2 * config.DETECT_BATCH_SIZE, 8
+    video = cv2.VideoWriter(str(tmp_path / 'long.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), 5, (64, 48))
+    if not video.isOpened():
+        pytest.skip("OpenCV can't write mp4 here")
+    for i in range(batch_size * 4):
+        video.write(np.full((48, 64, 3), i % 250, np.uint8))
+    video.release()
+
+    output = tmp_path / 'results.jsonl'
+    run_cli(monkeypatch, tmp_path / 'long.mp4', '-o', output, '--batch-size', batch_size, '--prefetch', prefetch)
+    assert len(read_records(output)) == batch_size * 4
+    stats = StubPipeline.last.preprocessor.stats()
+    assert stats["pool_size"] == prefetch + batch_size * (StubEngine.concurrency + 1)
+    # Every frame got a pooled letterbox buffer
+    assert stats["buffers_unpooled"] == 0
+    assert stats["buffers_allocated"] <= stats["pool_size"]
@@ -0,0 +1,129 @@
+import io
+
+import pytest
+
+import app
+import config
+from detect_options import DetectOptions, DetectOptionsError, default_options, parse_options
+
+NAMES = {0: 'person', 39: 'bottle', 41: 'cup', 67: 'cell phone'}
+
+
+@pytest.fixture
+def defaults():
+    return DetectOptions(0.25, 0.7, None, 300, 0)
+
+
+def test_missing_or_empty_values_use_the_defaults(defaults):
+    assert parse_options({}, NAMES, defaults) == defaults
+    assert parse_options({'conf': '', 'iou': None, 'classes': '', 'max_det': '', 'top_k': ''}, NAMES, defaults) == defaults
+
+
+def test_values_from_query_strings_and_json(defaults):
+    options = parse_options({'conf': '0.5', 'iou': 0.45, 'classes': 'cup, Cell Phone', 'max_det': '10', 'top_k': 3},
+                            NAMES, defaults)
+    assert options == DetectOptions(0.5, 0.45, (41, 67), 10, 3)
+    assert options.model_kwargs() == {"conf": 0.5, "iou": 0.45, "max_det": 10, "classes": [41, 67]}
+    assert defaults.model_kwargs() == {"conf": 0.25, "iou": 0.7, "max_det": 300}
+
+
+@pytest.mark.parametrize('classes, ids', [
+    ('0,41', (0, 41)),
+    ([41, 'person', '41'], (0, 41)),
+    (39, (39,)),
+    ('bottle,,', (39,)),
+    (' , ', None)
+])
+def test_classes_by_id_or_name(defaults, classes, ids):
+    assert parse_options({'classes': classes}, NAMES, defaults).classes == ids
+
+
+@pytest.mark.parametrize('values, message', [
+    ({'conf': '1.5'}, "conf must be between 0.0 and 1.0"),
+    ({'conf': '-0.1'}, "conf must be between 0.0 and 1.0"),
+    ({'conf': 'high'}, "conf must be a number"),
+    ({'conf': 'nan'}, "conf must be between 0.0 and 1.0"),
+    ({'conf': [0.5]}, "conf must be a number"),
+    ({'iou': '0'}, "iou must be between 0.01 and 1.0"),
+    ({'iou': '2'}, "iou must be between 0.01 and 1.0"),
+    ({'max_det': '0'}, "max_det must be between 1 and"),
+    ({'max_det': '2.5'}, "max_det must be a number"),
+    ({'max_det': str(config.DETECT_MAX_DET_LIMIT + 1)}, "max_det must be between 1 and"),
+    ({'top_k': '-1'}, "top_k must be between 0 and"),
+    ({'classes': 'cup,sofa'}, "Unknown class: sofa"),
+    ({'classes': '80'}, "Unknown class: 80"),
+    ({'classes': 12}, "Unknown class: 12")
+])
+def test_invalid_values_are_rejected(defaults, values, message):
+    with pytest.raises(DetectOptionsError, match=message.replace('.', r'\.')):
+        parse_options(values, NAMES, defaults)
+
+
+def test_deployment_defaults_come_from_config(monkeypatch):
+    monkeypatch.setattr(config, 'DETECT_CLASSES', 'cup,0')
+    monkeypatch.setattr(config, 'DETECT_TOP_K', 5)
+    options = default_options(NAMES)
+    assert options.classes == (0, 41)
+    assert options.top_k == 5
+
+
+# ===== /detect =====
+
+class StubPipeline:
+    """Real option parsing, no model: records the options each request ran with"""
+
+    def __init__(self):
+        self.options = []
+
+    def parse_options(self, values):
+        return parse_options(values, NAMES, DetectOptions(0.25, 0.7, None, 300, 0))
+
+    def detect(self, image_bytes, client_id=None, options=None, columns=False):
+        self.options.append(options)
+        return {"predictions": []}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pipeline = StubPipeline()
+    monkeypatch.setattr(app.model_loader, 'start', lambda: None)
+    monkeypatch.setattr(app.model_loader, 'get', lambda: pipeline)
+    client = app.app.test_client()
+    client.pipeline = pipeline
+    return client
+
+
+IMAGE = b'\xff\xd8 not decoded by the stub'
+
+
+def test_options_from_the_query_string(client):
+    response = client.post('/detect?conf=0.6&classes=cup&top_k=1', data=IMAGE, content_type='image/jpeg')
+    assert response.status_code == 200
+    assert client.pipeline.options == [DetectOptions(0.6, 0.7, (41,), 300, 1)]
+
+
+def test_options_from_form_fields_and_json_body(client):
+    client.post('/detect', data={'image': (io.BytesIO(IMAGE), 'a.jpg'), 'max_det': '5'},
+                content_type='multipart/form-data')
+    client.post('/detect', json={'image': 'data:image/jpeg;base64,/9g=', 'iou': 0.5, 'classes': ['person', 67]})
+    assert client.pipeline.options == [DetectOptions(0.25, 0.7, None, 5, 0), DetectOptions(0.25, 0.5, (0, 67), 300, 0)]
+
+
+@pytest.mark.parametrize('query, body', [
+    ('conf=2', None),
+    ('iou=abc', None),
+    ('max_det=0', None),
+    ('top_k=-3', None),
+    ('classes=sofa', None),
+    ('', {'image': 'data:image/jpeg;base64,/9g=', 'conf': -1}),
+    ('', {'image': 'data:image/jpeg;base64,/9g=', 'classes': 99}),
+    ('', {'image': 'data:image/jpeg;base64,/9g=', 'max_det': [1]})
+])
+def test_invalid_options_are_a_400(client, query, body):
+    if body is None:
+        response = client.post(f'/detect?{query}', data=IMAGE, content_type='image/jpeg')
+    else:
+        response = client.post('/detect', json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    assert client.pipeline.options == []
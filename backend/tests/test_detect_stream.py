@@ -0,0 +1,170 @@
+import json
+import queue
+import threading
+
+import pytest
+
+import config
+import detect_stream
+from detect_options import DetectOptionsError
+from detect_stream import ConnectionClosed, DetectStreamHub
+
+TIMEOUT_S = 5.0
+
+
+class FakeWebSocket:
+    """Frames queued by the test go to serve(); what serve() sends is collected as JSON"""
+
+    def __init__(self):
+        self.inbound = queue.Queue()
+        self.sent = []
+        self._changed = threading.Condition()
+
+    def receive(self, timeout=None):
+        try:
+            data = self.inbound.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if data is ConnectionClosed:
+            raise ConnectionClosed()
+        return data
+
+    def send(self, text):
+        with self._changed:
+            self.sent.append(json.loads(text))
+            self._changed.notify_all()
+
+    def wait_for(self, count):
+        """The first `count` messages sent, failing the test if they don't arrive"""
+        with self._changed:
+            assert self._changed.wait_for(lambda: len(self.sent) >= count, TIMEOUT_S), self.sent
+            return self.sent[:count]
+
+    def close(self):
+        self.inbound.put(ConnectionClosed)
+
+
+class StubPipeline:
+    """Echoes each frame back as a prediction; b'boom' raises like a broken model"""
+
+    def __init__(self):
+        self.calls = []
+
+    def parse_options(self, values):
+        if 'conf' in values and not 0 <= float(values['conf']) <= 1:
+            raise DetectOptionsError("conf must be between 0 and 1")
+        return dict(values)
+
+    def detect(self, data, client_id=None, options=None):
+        self.calls.append((data, client_id, options))
+        if data == b'boom':
+            raise RuntimeError("CUDA error: device-side assert triggered")
+        return {"success": True, "predictions": [{"class": data.decode(), "confidence": 0.9}]}
+
+
+@pytest.fixture
+def hub():
+    hub = DetectStreamHub(max_clients=1)
+    hub.pipeline = StubPipeline()
+    hub.get_pipeline = lambda: hub.pipeline
+    return hub
+
+
+@pytest.fixture
+def open_stream(hub):
+    """Start serve() on a fake socket in the background; closes every stream at the end"""
+    streams = []
+
+    def open_stream(option_values=None):
+        ws = FakeWebSocket()
+        thread = threading.Thread(target=hub.serve, args=(ws, option_values or {}), daemon=True)
+        thread.start()
+        streams.append((ws, thread))
+        return ws
+
+    yield open_stream
+    for ws, thread in streams:
+        ws.close()
+        thread.join(TIMEOUT_S)
+        assert not thread.is_alive()
+
+
+def test_hello_then_one_detections_message_per_frame(hub, open_stream):
+    ws = open_stream({'top_k': '1'})
+    assert ws.wait_for(1) == [{"type": "hello", "client_id": "ws-1"}]
+
+    ws.inbound.put(b'person')
+    message = ws.wait_for(2)[1]
+    assert message["type"] == "detections"
+    assert message["seq"] == 1
+    assert message["predictions"] == [{"class": "person", "confidence": 0.9}]
+    assert message["dropped"] == 0
+    assert {"server_ms", "fps"} <= set(message)
+    assert hub.pipeline.calls == [(b'person', 'ws-1', {'top_k': '1'})]
+
+    ws.inbound.put(b'dog')
+    assert ws.wait_for(3)[2]["seq"] == 2
+
+
+def test_model_exception_sends_an_error_frame_and_keeps_streaming(hub, open_stream):
+    ws = open_stream()
+    ws.wait_for(1)
+
+    ws.inbound.put(b'boom')
+    assert ws.wait_for(2)[1] == {"type": "error", "seq": 1, "error": "CUDA error: device-side assert triggered"}
+
+    ws.inbound.put(b'cat')
+    message = ws.wait_for(3)[2]
+    assert message["type"] == "detections"
+    assert message["seq"] == 2
+    assert message["predictions"][0]["class"] == "cat"
+    client_stats = hub.stats()["clients"]["ws-1"]
+    assert client_stats["errors"] == 1
+    assert client_stats["processed"] == 1
+
+
+def test_status_while_the_model_is_warming_up(hub, open_stream):
+    hub.get_pipeline = lambda: None
+    ws = open_stream()
+    ws.wait_for(1)
+    ws.inbound.put(b'person')
+    assert ws.wait_for(2)[1] == {"type": "status", "status": "warming_up", "seq": 1}
+
+
+def test_invalid_options_end_the_stream(hub, open_stream):
+    ws = open_stream({'conf': '7'})
+    ws.wait_for(1)
+    ws.inbound.put(b'person')
+    assert ws.wait_for(2)[1] == {"type": "error", "error": "conf must be between 0 and 1"}
+    assert hub.pipeline.calls == []
+
+
+def test_frames_over_the_size_limit_are_refused(hub, open_stream, monkeypatch):
+    monkeypatch.setattr(config, 'DETECT_STREAM_MAX_FRAME_BYTES', 4)
+    ws = open_stream()
+    ws.wait_for(1)
+    ws.inbound.put(b'elephant')
+    assert ws.wait_for(2)[1] == {"type": "error", "error": "Frame too large"}
+    ws.inbound.put(b'cat')
+    assert ws.wait_for(3)[2]["seq"] == 1
+    assert hub.pipeline.calls[0][0] == b'cat'
+
+
+def test_clients_over_the_limit_are_rejected(hub, open_stream):
+    ws = open_stream()
+    ws.wait_for(1)
+
+    extra = FakeWebSocket()
+    hub.serve(extra, {})
+    assert extra.sent == [{"type": "error", "error": "Too many live streams, try again later"}]
+    assert hub.stats()["rejected"] == 1
+
+
+def test_newest_frame_replaces_one_still_waiting():
+    client = detect_stream.StreamClient('ws-1')
+    client.push(b'a')
+    client.push(b'b')
+    seq, _, data = client.take(timeout=0)
+    assert (seq, data) == (2, b'b')
+    assert client.dropped == 1
+    assert client.take(timeout=0) is None
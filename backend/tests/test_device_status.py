@@ -0,0 +1,67 @@
+import importlib
+
+import pytest
+
+import device_status
+
+ENTRY_POINTS = ['app', 'app_voice_only', 'app_clean', 'server']
+# Status code each entry point has always answered "no device" with
+DISCONNECTED_STATUS = {'app': 500, 'app_voice_only': 500, 'app_clean': 200, 'server': 200}
+
+
+class FakeWatcher:
+    def __init__(self, online, default=''):
+        self.online = online
+        self.default = default
+        self.snapshots = 0
+
+    def snapshot(self):
+        self.snapshots += 1
+        return {
+            "connected": bool(self.online),
+            "device": self.default if self.default in self.online else (self.online[0] if self.online else None),
+            "online": list(self.online)
+        }
+
+
+@pytest.fixture
+def watcher(monkeypatch):
+    fake = FakeWatcher(['R58M12ABC', '192.168.1.20:5555'])
+    monkeypatch.setattr(device_status, 'status_watcher', fake)
+    return fake
+
+
+@pytest.mark.parametrize('module', ENTRY_POINTS)
+def test_phone_status_is_served_from_the_watcher(module, watcher):
+    client = importlib.import_module(module).app.test_client()
+
+    response = client.get('/api/phone/status')
+    assert response.status_code == 200
+    assert response.get_json()["connected"] is True
+    assert response.get_json()["device"] == 'R58M12ABC'
+
+    response = client.get('/api/phone/status?device=192.168.1.20:5555')
+    assert response.get_json()["device"] == '192.168.1.20:5555'
+
+    response = client.get('/api/phone/status?device=other')
+    assert response.status_code == DISCONNECTED_STATUS[module]
+    assert response.get_json()["connected"] is False
+    assert watcher.snapshots == 3
+
+
+@pytest.mark.parametrize('module', ENTRY_POINTS)
+def test_disconnected_status_has_the_same_shape(module, monkeypatch):
+    monkeypatch.setattr(device_status, 'status_watcher', FakeWatcher([]))
+    response = importlib.import_module(module).app.test_client().get('/api/phone/status')
+    assert response.status_code == DISCONNECTED_STATUS[module]
+    data = response.get_json()
+    assert data["status"] == 'disconnected' and data["connected"] is False
+    assert data["device"] is None
+
+
+@pytest.mark.parametrize('module', ['app', 'app_voice_only'])
+def test_voice_status_is_served_from_the_watcher(module, watcher):
+    data = importlib.import_module(module).app.test_client().get('/api/voice/status').get_json()
+    assert data["phone_connected"] is True
+    assert data["devices"] == ['R58M12ABC', '192.168.1.20:5555']
+    assert watcher.snapshots == 1
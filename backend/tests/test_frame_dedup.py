@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import pytest
+
+import frame_dedup
+from frame_dedup import NearDuplicateCache, dhash, hamming
+
+OPTIONS = ('conf', 0.25)
+DETECTIONS = [{"class": "cup", "confidence": 0.9, "box": [100.0, 120.0, 220.0, 300.0]}]
+
+
+def scene(seed=0):
+    """Smooth 640x480 texture, like a camera pointed at a desk"""
+    noise = np.random.default_rng(seed).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    return cv2.normalize(cv2.GaussianBlur(noise, (0, 0), 24.0), None, 0, 255, cv2.NORM_MINMAX)
+
+
+def jpeg(image, quality=90):
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+@pytest.fixture
+def cache():
+    return NearDuplicateCache(max_distance=4, max_age_s=1.0)
+
+
+def test_reencoded_frame_of_the_same_scene_is_a_near_duplicate(cache):
+    first, again = jpeg(scene()), jpeg(scene(), quality=70)
+    assert first != again
+    assert hamming(dhash(first), dhash(again)) <= cache.max_distance
+
+    cache.record('cam', dhash(first), OPTIONS, DETECTIONS)
+    assert cache.lookup('cam', dhash(again), OPTIONS) is DETECTIONS
+    assert cache.stats()["skipped"] == 1
+
+
+def test_frame_that_actually_changed_is_not_a_duplicate(cache):
+    image = scene()
+    changed = image.copy()
+    # Something new in a quarter of the frame, e.g. a hand reaching in
+    cv2.rectangle(changed, (320, 0), (640, 240), (20, 20, 20), -1)
+    distance = hamming(dhash(jpeg(image)), dhash(jpeg(changed)))
+    assert distance > cache.max_distance
+
+    cache.record('cam', dhash(jpeg(image)), OPTIONS, DETECTIONS)
+    assert cache.lookup('cam', dhash(jpeg(changed)), OPTIONS) is None
+    assert cache.lookup('cam', dhash(jpeg(scene(seed=1))), OPTIONS) is None
+    assert cache.stats()["skipped"] == 0
+
+
+def test_other_clients_options_and_stale_results_are_not_reused(cache, monkeypatch):
+    frame_hash = dhash(jpeg(scene()))
+    cache.record('cam', frame_hash, OPTIONS, DETECTIONS)
+    assert cache.lookup('other', frame_hash, OPTIONS) is None
+    assert cache.lookup('cam', frame_hash, ('conf', 0.5)) is None
+
+    now = frame_dedup.time.monotonic()
+    monkeypatch.setattr(frame_dedup.time, 'monotonic', lambda: now + 1.5)
+    assert cache.lookup('cam', frame_hash, OPTIONS) is None
+
+
+def test_least_recent_clients_are_forgotten():
+    cache = NearDuplicateCache(max_clients=2)
+    for client in ('a', 'b', 'c'):
+        cache.record(client, 1, OPTIONS, DETECTIONS)
+    assert cache.lookup('a', 1, OPTIONS) is None
+    assert cache.lookup('c', 1, OPTIONS) is DETECTIONS
+
+
+def test_undecodable_frames_are_never_matched(cache):
+    assert dhash(b'') is None
+    assert dhash(b'not an image') is None
+    cache.record('cam', None, OPTIONS, DETECTIONS)
+    assert cache.lookup('cam', None, OPTIONS) is None
+    assert cache.stats()["clients"] == 0
@@ -0,0 +1,128 @@
+import cv2
+import numpy as np
+import pytest
+
+import frame_tracker
+from frame_dedup import THUMBNAIL_SCALE, thumbnail
+from frame_tracker import FrameTracker
+
+SIZE = 80  # thumbnail side, i.e. a 640x640 camera frame
+OPTIONS = ('conf', 0.25)
+DETECTIONS = [
+    {"class": "bottle", "confidence": 0.9, "box": [100.0, 120.0, 220.0, 400.0]},
+    {"class": "cup", "confidence": 0.7, "box": [300.0, 300.0, 380.0, 380.0]}
+]
+
+
+def scene(seed, size=SIZE * 2):
+    """Smooth random texture, large enough to crop shifted views from"""
+    noise = np.random.default_rng(seed).integers(0, 255, (size, size), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 2.0)
+
+
+def view(world, dx=0, dy=0):
+    """Thumbnail of the camera moved so the content appears shifted by (dx, dy) pixels"""
+    x, y = SIZE // 2 - dx, SIZE // 2 - dy
+    return np.ascontiguousarray(world[y:y + SIZE, x:x + SIZE])
+
+
+@pytest.fixture
+def tracker():
+    return FrameTracker(every=4, motion_threshold=8.0, max_shift=0.25, max_age_s=10.0)
+
+
+def test_first_frame_is_a_keyframe(tracker):
+    thumb = view(scene(0))
+    assert tracker.predict('cam', thumb, OPTIONS) is None
+    tracks = tracker.record('cam', thumb, OPTIONS, DETECTIONS)
+    assert [t["track_id"] for t in tracks] == [1, 2]
+    assert tracker.stats()["keyframes"]["new"] == 1
+
+
+def test_shifted_frames_reuse_the_keyframe_boxes_moved_by_the_shift(tracker):
+    world = scene(0)
+    tracker.predict('cam', view(world), OPTIONS)
+    tracker.record('cam', view(world), OPTIONS, DETECTIONS)
+
+    tracked = tracker.predict('cam', view(world, dx=3, dy=-2), OPTIONS)
+    assert tracked is not None
+    assert [t["track_id"] for t in tracked] == [1, 2]
+    assert all(t["tracked"] for t in tracked)
+    ox, oy = 3 * THUMBNAIL_SCALE, -2 * THUMBNAIL_SCALE
+    for moved, original in zip(tracked, DETECTIONS):
+        expected = [v + o for v, o in zip(original["box"], (ox, oy, ox, oy))]
+        # Phase correlation is sub-pixel accurate on the thumbnail, i.e. within THUMBNAIL_SCALE here
+        assert moved["box"] == pytest.approx(expected, abs=THUMBNAIL_SCALE)
+    assert tracker.stats()["tracked"] == 1
+
+
+def test_every_nth_frame_is_a_keyframe(tracker):
+    world = scene(0)
+    tracker.predict('cam', view(world), OPTIONS)
+    tracker.record('cam', view(world), OPTIONS, DETECTIONS)
+
+    decisions = [tracker.predict('cam', view(world, dx=i), OPTIONS) is not None for i in range(1, 5)]
+    # every=4: the keyframe plus three tracked frames, then YOLO runs again
+    assert decisions == [True, True, True, False]
+    assert tracker.stats()["keyframes"]["interval"] == 1
+
+
+def test_scene_cut_forces_a_keyframe(tracker):
+    tracker.predict('cam', view(scene(0)), OPTIONS)
+    tracker.record('cam', view(scene(0)), OPTIONS, DETECTIONS)
+    assert tracker.predict('cam', view(scene(1)), OPTIONS) is None
+    assert tracker.stats()["keyframes"]["motion"] == 1
+
+
+def test_large_shift_forces_a_keyframe(tracker):
+    world = scene(0)
+    tracker.record('cam', view(world), OPTIONS, DETECTIONS)
+    # 30% of the frame width, over max_shift
+    assert tracker.predict('cam', view(world, dx=int(SIZE * 0.3)), OPTIONS) is None
+
+
+def test_changed_options_or_stale_keyframe_force_a_keyframe(tracker, monkeypatch):
+    world = scene(0)
+    tracker.record('cam', view(world), OPTIONS, DETECTIONS)
+    assert tracker.predict('cam', view(world, dx=1), ('conf', 0.5)) is None
+    assert tracker.predict('other', view(world, dx=1), OPTIONS) is None
+
+    now = frame_tracker.time.monotonic()
+    monkeypatch.setattr(frame_tracker.time, 'monotonic', lambda: now + 11.0)
+    assert tracker.predict('cam', view(world, dx=1), OPTIONS) is None
+    assert tracker.stats()["keyframes"] == {"new": 2, "interval": 0, "motion": 0, "stale": 1}
+
+
+def test_track_ids_follow_objects_across_keyframes(tracker):
+    world = scene(0)
+    tracker.record('cam', view(world), OPTIONS, DETECTIONS)
+    moved = [
+        {"class": "cup", "confidence": 0.7, "box": [310.0, 300.0, 390.0, 380.0]},
+        {"class": "bottle", "confidence": 0.8, "box": [104.0, 120.0, 224.0, 400.0]},
+        {"class": "bottle", "confidence": 0.6, "box": [500.0, 10.0, 600.0, 200.0]}
+    ]
+    tracks = tracker.record('cam', view(world, dx=1), OPTIONS, moved)
+    assert [t["track_id"] for t in tracks] == [2, 1, 3]
+
+
+def test_tracking_from_decoded_jpeg_thumbnails(tracker):
+    world = cv2.resize(scene(0), None, fx=THUMBNAIL_SCALE, fy=THUMBNAIL_SCALE, interpolation=cv2.INTER_LINEAR)
+
+    def camera(dx):
+        x = SIZE // 2 * THUMBNAIL_SCALE - dx
+        frame = cv2.cvtColor(world[320:320 + SIZE * THUMBNAIL_SCALE, x:x + SIZE * THUMBNAIL_SCALE],
+                             cv2.COLOR_GRAY2BGR)
+        return thumbnail(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+
+    tracker.record('cam', camera(0), OPTIONS, DETECTIONS)
+    tracked = tracker.predict('cam', camera(32), OPTIONS)
+    assert tracked is not None
+    assert tracked[0]["box"][0] == pytest.approx(DETECTIONS[0]["box"][0] + 32, abs=THUMBNAIL_SCALE)
+
+
+def test_disabled_tracker_always_runs_yolo():
+    tracker = FrameTracker(every=0)
+    thumb = view(scene(0))
+    assert tracker.record('cam', thumb, OPTIONS, DETECTIONS) is DETECTIONS
+    assert tracker.predict('cam', thumb, OPTIONS) is None
+    assert tracker.stats()["checks"] == 0
@@ -0,0 +1,41 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask, request
+
+from imaging import ImageInputError, read_request_image_bytes
+
+app = Flask(__name__)
+
+
+def jpeg_bytes():
+    return cv2.imencode('.jpg', np.zeros((8, 8, 3), np.uint8))[1].tobytes()
+
+
+def read(**kwargs):
+    with app.test_request_context('/detect', method='POST', **kwargs):
+        return bytes(read_request_image_bytes(request))
+
+
+def test_raw_jpeg_body():
+    data = jpeg_bytes()
+    assert read(data=data, content_type='image/jpeg') == data
+
+
+def test_json_data_url():
+    data = jpeg_bytes()
+    url = 'data:image/jpeg;base64,' + base64.b64encode(data).decode()
+    assert read(json={"image": url}) == data
+
+
+@pytest.mark.parametrize('body', [[1, 2], "image", 42, None, {}, {"image": 5}, {"image": ["x"]}])
+def test_json_body_without_an_image_is_rejected(body):
+    with pytest.raises(ImageInputError):
+        read(json=body)
+
+
+def test_multipart_without_image_field():
+    with pytest.raises(ImageInputError):
+        read(data={"other": "x"}, content_type='multipart/form-data')
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+import inference_backends
+from inference_backends import InferenceBackend, compare_results
+
+
+class _Array:
+    """Stands in for a torch tensor: .cpu().numpy()"""
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class _Boxes:
+    def __init__(self, detections):
+        detections = list(detections)
+        self.cls = _Array([d[0] for d in detections])
+        self.conf = _Array([d[1] for d in detections])
+        self.xyxy = _Array(np.array([d[2] for d in detections], dtype=float).reshape(-1, 4))
+
+
+class _Result:
+    def __init__(self, *detections):
+        self.boxes = _Boxes(detections)
+
+
+REFERENCE = [
+    _Result((0, 0.90, [10, 10, 110, 210]), (41, 0.75, [300, 200, 380, 300])),
+    _Result((2, 0.60, [50, 60, 250, 160]))
+]
+
+
+def test_identical_results_are_in_parity():
+    assert compare_results(REFERENCE, REFERENCE) == []
+
+
+def test_small_drift_is_within_tolerance():
+    candidate = [
+        _Result((0, 0.88, [11, 10, 111, 209]), (41, 0.77, [301, 201, 380, 300])),
+        _Result((2, 0.62, [51, 60, 250, 161]))
+    ]
+    assert compare_results(REFERENCE, candidate) == []
+
+
+def test_boxes_near_the_threshold_may_differ():
+    candidate = [REFERENCE[0], _Result((2, 0.60, [50, 60, 250, 160]), (5, 0.27, [0, 0, 20, 20]))]
+    assert compare_results(REFERENCE, candidate, conf_threshold=0.25) == []
+
+
+@pytest.mark.parametrize('candidate, expected', [
+    # missing box
+    ([_Result((0, 0.90, [10, 10, 110, 210])), REFERENCE[1]], ["frame 0: missing class 41 conf 0.750"]),
+    # wrong class
+    ([REFERENCE[0], _Result((3, 0.60, [50, 60, 250, 160]))],
+     ["frame 1: missing class 2 conf 0.600", "frame 1: extra class 3 conf 0.600"]),
+    # confidence drifted too far
+    ([REFERENCE[0], _Result((2, 0.40, [50, 60, 250, 160]))],
+     ["frame 1: missing class 2 conf 0.600", "frame 1: extra class 2 conf 0.400"]),
+    # box moved
+    ([REFERENCE[0], _Result((2, 0.60, [120, 60, 320, 160]))],
+     ["frame 1: missing class 2 conf 0.600", "frame 1: extra class 2 conf 0.600"]),
+])
+def test_divergent_results_are_reported(candidate, expected):
+    assert compare_results(REFERENCE, candidate) == expected
+
+
+class _FakeBackend(InferenceBackend):
+    """Loads a placeholder model; speed and output are set per class"""
+
+    ms = 10.0
+    results = REFERENCE
+    loaded = []
+
+    def load(self):
+        self.model = object()
+        _FakeBackend.loaded.append(self)
+        return self
+
+    def __call__(self, images, **kwargs):
+        return self.results
+
+
+def _fake(name, ms, results=REFERENCE):
+    return type(name, (_FakeBackend,), {"name": name, "ms": ms, "results": results})
+
+
+def test_auto_keeps_only_the_fastest_backend_loaded(monkeypatch):
+    torch = _fake('torch', 30.0)
+    backends = {
+        'torch': torch,
+        'onnx': _fake('onnx', 10.0),
+        'openvino': _fake('openvino', 20.0),
+        'divergent': _fake('divergent', 1.0, [_Result(), _Result()])
+    }
+    _FakeBackend.loaded = []
+    monkeypatch.setattr(inference_backends, 'BACKENDS', backends)
+    monkeypatch.setattr(inference_backends, 'TorchBackend', torch)
+    monkeypatch.setattr(inference_backends, 'sample_frames', lambda imgsz: [None, None])
+    monkeypatch.setattr(inference_backends, 'benchmark', lambda backend, *args, **kwargs: backend.ms)
+
+    chosen = inference_backends.load_backend('yolov8n.pt')
+
+    assert chosen.name == 'onnx'
+    assert set(chosen.startup_benchmark_ms) == {'torch', 'onnx', 'openvino'}
+    assert [b.name for b in _FakeBackend.loaded] == ['torch', 'onnx', 'openvino', 'divergent']
+    assert [b.name for b in _FakeBackend.loaded if b.model is not None] == ['onnx']
@@ -0,0 +1,116 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import app
+import config
+import detection
+from inference_engine import ProcessPoolEngine, WorkerError
+
+# Stands in for ultralytics in the worker processes: one fixed box per frame
+FAKE_ULTRALYTICS = '''\
+import numpy as np
+
+
+class _Data:
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.array([[4.0, 4.0, 20.0, 20.0, 0.9, 1.0]], np.float32)
+
+
+class _Boxes:
+    data = _Data()
+
+
+class _Result:
+    boxes = _Boxes()
+
+
+class YOLO:
+    def __init__(self, path, task=None):
+        self.names = {0: 'cup', 1: 'bottle'}
+
+    def __call__(self, images, **kwargs):
+        return [_Result() for _ in images]
+'''
+
+
+@pytest.fixture
+def stub_model(tmp_path, monkeypatch):
+    """Worker processes load the stub model above instead of YOLO weights"""
+    package = tmp_path / 'ultralytics'
+    package.mkdir()
+    (package / '__init__.py').write_text(FAKE_ULTRALYTICS)
+    # Worker processes inherit the parent's environment
+    monkeypatch.setenv('PYTHONPATH', str(tmp_path))
+    return {"weights": 'stub.pt', "imgsz": 64, "preference": 'torch'}
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition never became true"
+        time.sleep(0.05)
+
+
+def back_in_pool(engine, restarts):
+    stats = engine.stats()
+    return stats["restarts"] == restarts and stats["idle_workers"] == engine.concurrency
+
+
+def test_killed_worker_fails_its_batch_and_is_restarted(stub_model):
+    engine = ProcessPoolEngine(1, stub_model, max_batch_size=2, start_timeout_s=60)
+    try:
+        frames = [np.zeros((64, 64, 3), np.uint8)] * 2
+        assert engine.names == {0: 'cup', 1: 'bottle'}
+        results = engine.run_batch(frames)
+        assert [r.shape for r in results] == [(1, 6), (1, 6)]
+        assert results[0][0].tolist() == pytest.approx([4.0, 4.0, 20.0, 20.0, 0.9, 1.0])
+
+        engine._workers[0].process.kill()
+        engine._workers[0].process.wait()
+        with pytest.raises(WorkerError, match="worker 0 died"):
+            engine.run_batch(frames)
+        assert engine.stats()["failures"] == 1
+
+        wait_for(lambda: back_in_pool(engine, 1))
+        assert len(engine.run_batch(frames)) == 2
+        assert engine.stats()["dead_workers"] == 0
+    finally:
+        engine.close()
+
+
+def test_detect_answers_503_while_a_worker_restarts(stub_model, monkeypatch):
+    for name, value in {'DETECT_WORKERS': 1, 'DETECT_MODEL': stub_model["weights"], 'DETECT_IMGSZ': 64,
+                        'DETECT_BACKEND': 'torch', 'DETECT_WARMUP_RUNS': 0, 'DETECT_BATCH_WAIT_MS': 0,
+                        'DETECT_DEDUP_MAX_AGE_S': 0, 'DETECT_TRACK_EVERY': 0}.items():
+        monkeypatch.setattr(config, name, value)
+    pipeline = detection.DetectionPipeline()
+    monkeypatch.setattr(app.model_loader, 'start', lambda: None)
+    monkeypatch.setattr(app.model_loader, 'get', lambda: pipeline)
+    client = app.app.test_client()
+
+    def detect(shade):
+        # A different image each time, so the result cache can't answer
+        image = cv2.imencode('.jpg', np.full((48, 64, 3), shade, np.uint8))[1].tobytes()
+        return client.post('/detect', data=image, content_type='image/jpeg')
+
+    try:
+        response = detect(10)
+        assert response.status_code == 200
+        assert [p["class"] for p in response.get_json()["predictions"]] == ['bottle']
+
+        pipeline.engine._workers[0].process.kill()
+        pipeline.engine._workers[0].process.wait()
+        response = detect(20)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(config.DETECT_RETRY_AFTER_S)
+
+        wait_for(lambda: back_in_pool(pipeline.engine, 1))
+        assert detect(30).status_code == 200
+    finally:
+        pipeline.close()
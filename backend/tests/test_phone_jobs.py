@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+
+import pytest
+
+import app
+from phone_jobs import DeviceBusyError, PhoneJobQueue, job_queue
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition never became true"
+        time.sleep(0.005)
+
+
+def worker_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('phone-jobs-')]
+
+
+# ===== PhoneJobQueue =====
+
+def test_jobs_for_one_device_run_in_order_one_at_a_time():
+    jobs = PhoneJobQueue()
+    log = []
+
+    def action(name):
+        def run():
+            log.append(('start', name))
+            time.sleep(0.01)
+            log.append(('end', name))
+            return {"success": True}
+        return run
+
+    submitted = [jobs.submit('phone', 'call', action(i)) for i in range(5)]
+    for job in submitted:
+        assert jobs.wait(job.id, 5)["state"] == 'succeeded'
+    assert log == [(event, i) for i in range(5) for event in ('start', 'end')]
+
+
+def test_jobs_for_different_devices_run_in_parallel():
+    jobs = PhoneJobQueue()
+    both_running = threading.Barrier(2, timeout=5)
+
+    def run():
+        both_running.wait()
+        return {"success": True}
+
+    submitted = [jobs.submit(device, 'call', run) for device in ('a', 'b')]
+    assert [jobs.wait(job.id, 5)["state"] for job in submitted] == ['succeeded', 'succeeded']
+
+
+def test_failed_and_raising_jobs_are_failed():
+    jobs = PhoneJobQueue()
+
+    def boom():
+        raise RuntimeError("adb went away")
+
+    failed = jobs.submit('phone', 'call', lambda: {"success": False, "error": "no signal"})
+    raised = jobs.submit('phone', 'call', boom)
+    assert jobs.wait(failed.id, 5)["error"] == "no signal"
+    assert jobs.wait(raised.id, 5)["error"] == "adb went away"
+    assert jobs.stats()["failed"] == 2
+
+
+def test_full_device_queue_rejects_new_jobs():
+    jobs = PhoneJobQueue(max_queue_depth=1)
+    release = threading.Event()
+    running = jobs.submit('phone', 'call', lambda: {"success": release.wait(5)})
+    wait_for(lambda: jobs.get(running.id)["state"] == 'running')
+    jobs.submit('phone', 'call', lambda: {"success": True})
+
+    with pytest.raises(DeviceBusyError):
+        jobs.submit('phone', 'call', lambda: {"success": True})
+    # Other devices have their own queue
+    other = jobs.submit('other', 'call', lambda: {"success": True})
+    release.set()
+    assert jobs.wait(other.id, 5)["state"] == 'succeeded'
+    assert jobs.stats()["rejected"] == 1
+
+
+def test_idle_device_workers_exit_and_come_back():
+    before = len(worker_threads())
+    jobs = PhoneJobQueue(idle_s=0.05)
+    for device in ('a', 'b', 'c'):
+        jobs.submit(device, 'call', lambda: {"success": True})
+    assert jobs.stats()["workers"] == 3
+
+    wait_for(lambda: jobs.stats()["workers"] == 0)
+    wait_for(lambda: len(worker_threads()) == before)
+
+    # A device seen again gets a fresh worker
+    job = jobs.submit('a', 'call', lambda: {"success": True})
+    assert jobs.wait(job.id, 5)["state"] == 'succeeded'
+
+
+def test_events_follow_the_job_until_it_finishes():
+    jobs = PhoneJobQueue()
+    release = threading.Event()
+    job = jobs.submit('phone', 'call', lambda: {"success": release.wait(5)})
+    events = jobs.events(job.id, keepalive_s=0.01)
+
+    first = next(events)
+    assert first is None or first["state"] in ('queued', 'running')
+    release.set()
+    states = [state["state"] for state in events if state is not None]
+    assert states[-1] == 'succeeded'
+    assert list(jobs.events('missing')) == []
+
+
+def test_finished_jobs_are_pruned_past_the_history_limit():
+    jobs = PhoneJobQueue(history=2)
+    submitted = [jobs.submit('phone', 'call', lambda: {"success": True}) for _ in range(4)]
+    for job in submitted:
+        jobs.wait(job.id, 5)
+    jobs.submit('phone', 'call', lambda: {"success": True})
+    assert jobs.get(submitted[0].id) is None
+    assert jobs.stats()["kept"] <= 3
+
+
+# ===== ROUTES, AGAINST THE FAKE adb SERVER =====
+
+def call(number, device, wait=False):
+    return app.app.test_client().post('/api/phone/call' + ('?wait=1' if wait else ''),
+                                      json={"phoneNumber": number, "device": device})
+
+
+def calls_sent(server, serial):
+    return [command.split('tel:')[1].split(';')[0] for device, command in server.history
+            if device == serial and 'CALL' in command]
+
+
+def test_queued_call_answers_202_with_status_urls(fake_adb):
+    response = call('5551234', 'emulator-5554')
+    assert response.status_code == 202
+    body = response.get_json()
+    assert (body["status"], body["device"]) == ('queued', 'emulator-5554')
+    assert body["status_url"] == f'/api/phone/jobs/{body["job_id"]}'
+
+    client = app.app.test_client()
+    wait_for(lambda: client.get(body["status_url"]).get_json()["state"] == 'succeeded')
+    state = client.get(body["status_url"]).get_json()
+    assert state["result"]["phone_number"] == '5551234'
+    assert calls_sent(fake_adb, 'emulator-5554') == ['5551234']
+
+
+def test_one_device_runs_its_jobs_in_submission_order(fake_adb):
+    numbers = [f'55500{i:02d}' for i in range(8)]
+    job_ids = [call(number, 'emulator-5556').get_json()["job_id"] for number in numbers]
+    for job_id in job_ids:
+        assert job_queue.wait(job_id, 5)["state"] == 'succeeded'
+    assert calls_sent(fake_adb, 'emulator-5556') == numbers
+
+
+def test_wait_returns_the_result(fake_adb):
+    response = call('5551234', 'emulator-5554', wait=True)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["success"] is True
+    assert body["message"] == "Calling Unknown"
+    assert job_queue.get(body["job_id"])["state"] == 'succeeded'
+
+    fake_adb.failure_rate = 1.0
+    failed = call('5551234', 'emulator-5554', wait=True)
+    assert failed.status_code == 500
+    assert failed.get_json()["success"] is False
+
+
+def test_broadcast_answers_202_with_a_job_per_device(fake_adb):
+    response = call('5551234', 'all')
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body["broadcast"] is True
+    assert [job["device"] for job in body["jobs"]] == ['emulator-5554', 'emulator-5556']
+    for job in body["jobs"]:
+        assert job_queue.wait(job["job_id"], 5)["state"] == 'succeeded'
+    assert calls_sent(fake_adb, 'emulator-5554') == calls_sent(fake_adb, 'emulator-5556') == ['5551234']
+
+
+def test_broadcast_with_wait_reports_every_device(fake_adb):
+    response = call('5551234', 'all', wait=True)
+    assert response.status_code == 200
+    assert [(job["device"], job["state"]) for job in response.get_json()["jobs"]] == \
+        [('emulator-5554', 'succeeded'), ('emulator-5556', 'succeeded')]
+
+
+def test_event_stream_ends_with_the_finished_job(fake_adb):
+    job_id = call('5551234', 'emulator-5554').get_json()["job_id"]
+    response = app.app.test_client().get(f'/api/phone/jobs/{job_id}/events')
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    messages = [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).splitlines()
+                if line.startswith('data: ')]
+    assert messages[-1]["state"] == 'succeeded'
+    assert messages[-1]["result"]["device"] == 'emulator-5554'
+    assert all(message["job_id"] == job_id for message in messages)
+
+
+def test_unknown_job_is_a_404(fake_adb):
+    client = app.app.test_client()
+    assert client.get('/api/phone/jobs/nope').status_code == 404
+    assert client.get('/api/phone/jobs/nope/events').status_code == 404
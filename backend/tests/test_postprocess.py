@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+import pytest
+
+from detect_options import default_options
+from detection import DetectionPipeline
+from frame_dedup import NearDuplicateCache
+from frame_tracker import FrameTracker
+from postprocess import class_name_array, predictions_to_arrays, select, to_arrays, to_predictions
+from preprocess import Preprocessor
+from result_cache import DetectionCache
+
+NAMES = {i: f'class_{i}' for i in range(80)}
+
+
+def crowded_result(count, imgsz=640, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, imgsz - 40, (count, 2))
+    wh = rng.uniform(8, 120, (count, 2))
+    boxes = np.clip(np.hstack([xy, xy + wh]), 0, imgsz)
+    conf = rng.uniform(0.1, 1.0, (count, 1))
+    cls = rng.integers(0, len(NAMES), (count, 1))
+    return np.hstack([boxes, conf, cls]).astype(np.float32)
+
+
+def row_loop(result, frame, names, conf, top_k=0):
+    """The per-box loop /detect used before post-processing was vectorized"""
+    detections = []
+    original_boxes = frame.to_original(result[:, :4])
+    for row, xyxy in zip(result, original_boxes):
+        confidence = float(row[4])
+        if confidence < conf:
+            continue
+        detections.append({
+            "class": names[int(row[5])],
+            "confidence": confidence,
+            "box": [round(float(v), 1) for v in xyxy]
+        })
+    detections.sort(key=lambda x: x['confidence'], reverse=True)
+    return detections[:top_k] if top_k else detections
+
+
+def vectorized(result, frame, class_names, conf, top_k=0):
+    rows = result[select(result, conf, top_k)]
+    return rows[:, 5].astype(np.intp), rows[:, 4], frame.to_original(rows[:, :4])
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return Preprocessor(imgsz=640).letterbox(np.zeros((720, 1280, 3), np.uint8), 1280, 720)
+
+
+@pytest.mark.parametrize('count', [0, 1, 10, 300, 1000])
+@pytest.mark.parametrize('conf, top_k', [(0.25, 0), (0.0, 0), (0.5, 5), (0.25, 2000)])
+def test_vectorized_matches_the_per_box_loop(frame, count, conf, top_k):
+    result = crowded_result(count, seed=count)
+    class_names = class_name_array(NAMES)
+    expected = row_loop(result, frame, NAMES, conf, top_k)
+    selected = vectorized(result, frame, class_names, conf, top_k)
+    assert to_predictions(class_names, *selected) == expected
+    assert to_arrays(class_names, *selected) == predictions_to_arrays(expected)
+
+
+def test_arrays_are_flat_columns(frame):
+    result = np.array([[10, 20, 30, 40, 0.5, 2], [50, 60, 70, 80, 0.9, 0]], np.float32)
+    class_names = class_name_array(['cup', 'bottle', 'book'])
+    arrays = to_arrays(class_names, *vectorized(result, frame, class_names, 0.25))
+    assert arrays["count"] == 2
+    assert arrays["classes"] == ['cup', 'book']
+    assert arrays["confidences"] == pytest.approx([0.9, 0.5])
+    assert len(arrays["boxes"]) == 8
+    assert all(isinstance(v, float) for v in arrays["boxes"])
+
+
+def test_class_names_fill_gaps_in_the_id_map():
+    assert class_name_array({0: 'cup', 2: 'book'}).tolist() == ['cup', '1', 'book']
+    assert class_name_array([]).tolist() == []
+
+
+# ===== DetectionPipeline.detect(columns=True) =====
+
+class StubScheduler:
+    """Returns a fixed (N, 6) result for every frame, counting model runs"""
+
+    def __init__(self, result):
+        self.result = result
+        self.runs = 0
+
+    def submit(self, image, timeout=None, group=None):
+        self.runs += 1
+        return self.result
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = DetectionPipeline.__new__(DetectionPipeline)
+    pipeline.class_names = class_name_array(NAMES)
+    pipeline.default_options = default_options(NAMES)
+    pipeline.preprocessor = Preprocessor(imgsz=640, pool_size=4)
+    pipeline.result_cache = DetectionCache()
+    pipeline.frame_dedup = NearDuplicateCache(max_age_s=0)
+    pipeline.tracker = FrameTracker(every=0)
+    pipeline.scheduler = StubScheduler(crowded_result(50))
+    return pipeline
+
+
+@pytest.fixture(scope='module')
+def image():
+    noise = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 8.0)
+
+
+@pytest.fixture(scope='module')
+def jpeg(image):
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def test_columns_match_the_default_format(pipeline, jpeg):
+    columns = pipeline.detect(jpeg, columns=True)
+    predictions = pipeline.detect(jpeg)["predictions"]
+    assert columns == predictions_to_arrays(predictions)
+    # Each format has its own cache entry, so both ran the model once
+    assert pipeline.scheduler.runs == 2
+    assert pipeline.detect(jpeg, columns=True) == {**columns, "cached": True}
+    assert pipeline.scheduler.runs == 2
+
+
+def test_columns_with_frame_tracking_keep_track_ids(pipeline, image, jpeg):
+    pipeline.tracker = FrameTracker(every=5, max_age_s=10.0)
+    columns = pipeline.detect(jpeg, 'cam', columns=True)
+    assert columns["track_ids"] == list(range(1, columns["count"] + 1))
+    # Same scene, different bytes: a cache miss the tracker answers
+    next_frame = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+    tracked = pipeline.detect(next_frame, 'cam', columns=True)
+    assert tracked["tracked"] is True
+    assert tracked["track_ids"] == columns["track_ids"]
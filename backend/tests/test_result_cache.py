@@ -0,0 +1,91 @@
+import pytest
+
+import result_cache
+from detect_options import DetectOptions
+from result_cache import DetectionCache
+
+DEFAULTS = DetectOptions(0.25, 0.7, None, 300, 0)
+PREDICTIONS = {"predictions": [{"class": "cup", "confidence": 0.9, "box": [1.0, 2.0, 3.0, 4.0]}]}
+
+
+def key(image=b'jpeg bytes', options=DEFAULTS, model='yolov8n.pt', imgsz=640):
+    return DetectionCache.make_key(image, model, options, imgsz)
+
+
+def test_hit_and_miss():
+    cache = DetectionCache()
+    assert cache.get(key()) is None
+    cache.put(key(), PREDICTIONS)
+    assert cache.get(key()) == PREDICTIONS
+    assert cache.get(key(b'other bytes')) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+@pytest.mark.parametrize('other', [
+    key(options=DetectOptions(0.5, 0.7, None, 300, 0)),
+    key(options=DetectOptions(0.25, 0.7, (41,), 300, 0)),
+    key(options=DetectOptions(0.25, 0.7, None, 300, 5)),
+    key(model='yolov8s.pt'),
+    key(imgsz=320)
+])
+def test_different_options_model_or_size_never_share_an_entry(other):
+    cache = DetectionCache()
+    cache.put(key(), PREDICTIONS)
+    assert other != key()
+    assert cache.get(other) is None
+    cache.put(other, {"predictions": []})
+    assert cache.get(key()) == PREDICTIONS
+    assert cache.get(other) == {"predictions": []}
+
+
+def test_eviction_at_the_byte_limit_drops_least_recently_used_first():
+    size = len('{"predictions":[{"class":"cup","confidence":0.9,"box":[1.0,2.0,3.0,4.0]}]}')
+    cache = DetectionCache(max_bytes=3 * size)
+    for name in (b'a', b'b', b'c'):
+        cache.put(key(name), PREDICTIONS)
+    assert cache.stats()["bytes"] == 3 * size
+    # 'a' was used last, so 'b' is the oldest when 'd' needs room
+    assert cache.get(key(b'a')) == PREDICTIONS
+    cache.put(key(b'd'), PREDICTIONS)
+
+    assert cache.get(key(b'b')) is None
+    assert all(cache.get(key(name)) == PREDICTIONS for name in (b'a', b'c', b'd'))
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 3 * size, 1)
+
+
+def test_eviction_at_the_entry_limit_and_replacing_an_entry():
+    cache = DetectionCache(max_entries=2)
+    cache.put(key(b'a'), PREDICTIONS)
+    cache.put(key(b'a'), {"predictions": []})
+    cache.put(key(b'b'), PREDICTIONS)
+    assert cache.stats()["entries"] == 2
+    assert cache.get(key(b'a')) == {"predictions": []}
+    cache.put(key(b'c'), PREDICTIONS)
+    assert cache.get(key(b'b')) is None
+
+
+def test_values_larger_than_the_whole_cache_are_not_stored():
+    cache = DetectionCache(max_bytes=10)
+    cache.put(key(), PREDICTIONS)
+    assert cache.get(key()) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache = DetectionCache(ttl_s=5)
+    cache.put(key(), PREDICTIONS)
+    now = result_cache.time.monotonic()
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now + 6)
+    assert cache.get(key()) is None
+    assert (cache.stats()["expired"], cache.stats()["entries"]) == (1, 0)
+
+
+@pytest.mark.parametrize('limits', [{"max_entries": 0}, {"max_bytes": 0}])
+def test_zero_limits_disable_the_cache(limits):
+    cache = DetectionCache(**limits)
+    cache.put(key(), PREDICTIONS)
+    assert cache.get(key()) is None
+    assert cache.stats()["enabled"] is False
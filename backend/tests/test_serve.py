@@ -0,0 +1,54 @@
+import importlib.util
+import sys
+
+import pytest
+
+import serve
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    """Pretend waitress and gunicorn are installed; record what would be served"""
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec',
+                        lambda name, *args: object() if name in ('waitress', 'gunicorn') else find_spec(name, *args))
+    served = []
+    monkeypatch.setattr(serve, 'serve_waitress', lambda module, args: served.append(('waitress', module.__name__)))
+    monkeypatch.setattr(serve, 'serve_gunicorn', lambda module, args: served.append(('gunicorn', module.__name__)))
+    return served
+
+
+def run_serve(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['serve.py', *args])
+    return serve.main()
+
+
+def test_serve_refuses_several_waitress_workers(servers, monkeypatch, capsys):
+    assert run_serve(monkeypatch, '--server', 'waitress', '--workers', '2') == 2
+    assert "waitress runs one process" in capsys.readouterr().out
+    assert servers == []
+
+
+def test_serve_refuses_a_model_per_worker_unless_allowed(servers, monkeypatch, capsys):
+    monkeypatch.setattr(serve.config, 'SERVE_MODEL_PER_WORKER', False)
+    assert run_serve(monkeypatch, '--server', 'gunicorn', '--workers', '2') == 2
+    assert "would load 2 YOLO copies" in capsys.readouterr().out
+    assert servers == []
+
+    monkeypatch.setattr(serve.config, 'SERVE_MODEL_PER_WORKER', True)
+    assert run_serve(monkeypatch, '--server', 'gunicorn', '--workers', '2') == 0
+    assert servers == [('gunicorn', 'app')]
+
+
+def test_serve_allows_several_workers_for_backends_without_a_model(servers, monkeypatch):
+    assert run_serve(monkeypatch, '--server', 'gunicorn', '--workers', '3', '--app', 'app_voice_only') == 0
+    assert run_serve(monkeypatch, '--server', 'waitress', '--app', 'server') == 0
+    assert servers == [('gunicorn', 'app_voice_only'), ('waitress', 'server')]
+
+
+def test_serve_without_a_server_installed(monkeypatch, capsys):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec',
+                        lambda name, *args: None if name in ('waitress', 'gunicorn') else find_spec(name, *args))
+    assert run_serve(monkeypatch) == 1
+    assert "No production server installed" in capsys.readouterr().out
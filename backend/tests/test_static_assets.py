@@ -0,0 +1,226 @@
+import gzip
+import os
+import zlib
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import app
+import static_assets
+from asset_bundle import AssetBuilder
+from static_assets import StaticAssets
+
+SCRIPT = "function greet(name) {\n  return 'hello ' + name\n}\n" * 40
+PAGE = '<html><head><link rel="stylesheet" href="css/site.css"></head><body><script src="js/a.js"></script></body></html>'
+
+
+@pytest.fixture
+def site(tmp_path):
+    for name, data in {
+        'index.html': PAGE,
+        'css/site.css': "body { color: red; }\n",
+        'js/a.js': SCRIPT,
+        'js/app.1a2b3c4d5e.js': SCRIPT,
+        'img/logo.bin': bytes(range(256)) * 4,
+        'backend/app.py': "SECRET = 1\n",
+        'node_modules/x/index.js': "module.exports = 1\n",
+        '.env': "TOKEN=1\n",
+        'css/.hidden.css': "a {}\n",
+    }.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, bytes):
+            path.write_bytes(data)
+        else:
+            path.write_text(data)
+    return tmp_path
+
+
+def client_for(assets):
+    flask_app = Flask(__name__)
+    flask_app.add_url_rule('/<path:filename>', 'asset', assets.response)
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def assets(site):
+    return StaticAssets(str(site), recheck_s=0)
+
+
+@pytest.fixture
+def client(assets):
+    return client_for(assets)
+
+
+# ===== validators and caching headers =====
+
+def test_etag_and_last_modified_give_304(client):
+    first = client.get('/js/a.js')
+    assert first.status_code == 200
+    assert first.data == SCRIPT.encode()
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    again = client.get('/js/a.js', headers={'If-None-Match': etag})
+    assert (again.status_code, again.data) == (304, b'')
+    assert again.headers['ETag'] == etag
+    assert client.get('/js/a.js', headers={'If-None-Match': f'"other", W/{etag}'}).status_code == 304
+    assert client.get('/js/a.js', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert client.get('/js/a.js', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    assert client.get('/js/a.js', headers={'If-Modified-Since': 'Thu, 01 Jan 1970 00:00:00 GMT'}).status_code == 200
+
+
+def test_versioned_urls_are_immutable(client):
+    immutable = 'public, max-age=31536000, immutable'
+    assert client.get('/js/app.1a2b3c4d5e.js').headers['Cache-Control'] == immutable
+    assert client.get('/js/a.js?v=3').headers['Cache-Control'] == immutable
+
+
+def test_changed_file_is_reread(client, site):
+    etag = client.get('/css/site.css').headers['ETag']
+    (site / 'css' / 'site.css').write_text("body { color: blue; }\n")
+    response = client.get('/css/site.css')
+    assert response.data == b"body { color: blue; }\n"
+    assert response.headers['ETag'] != etag
+
+
+# ===== Range =====
+
+@pytest.mark.parametrize('header, status, content_range, body', [
+    ('bytes=0-9', 206, 'bytes 0-9/1024', bytes(range(10))),
+    ('bytes=1020-', 206, 'bytes 1020-1023/1024', bytes(range(252, 256))),
+    ('bytes=-2', 206, 'bytes 1022-1023/1024', bytes([254, 255])),
+    ('bytes=1000-5000', 206, 'bytes 1000-1023/1024', (bytes(range(256)) * 4)[1000:]),
+    ('bytes=1024-', 416, 'bytes */1024', b''),
+    ('bytes=-0', 416, 'bytes */1024', b''),
+    ('bytes=0-1,5-6', 200, None, bytes(range(256)) * 4),
+])
+def test_ranges(client, header, status, content_range, body):
+    response = client.get('/img/logo.bin', headers={'Range': header})
+    assert response.status_code == status
+    assert response.headers.get('Content-Range') == content_range
+    assert response.data == body
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_if_range_with_an_old_etag_sends_the_whole_file(client):
+    response = client.get('/img/logo.bin', headers={'Range': 'bytes=0-9', 'If-Range': '"old"'})
+    assert (response.status_code, len(response.data)) == (200, 1024)
+    etag = response.headers['ETag']
+    assert client.get('/img/logo.bin', headers={'Range': 'bytes=0-9', 'If-Range': etag}).status_code == 206
+
+
+# ===== compression =====
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    """A stand-in "brotli" module, so negotiation is tested without the package"""
+    monkeypatch.setattr(static_assets, 'brotli', SimpleNamespace(compress=lambda data, quality: zlib.compress(data)))
+
+
+def test_gzip_is_negotiated_with_vary_and_its_own_etag(client):
+    plain = client.get('/js/a.js')
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in plain.headers
+
+    zipped = client.get('/js/a.js', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert zipped.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(zipped.data) == SCRIPT.encode()
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+    assert client.get('/js/a.js', headers={'Accept-Encoding': 'gzip',
+                                           'If-None-Match': zipped.headers['ETag']}).status_code == 304
+    # A range is always taken from the uncompressed bytes
+    ranged = client.get('/js/a.js', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-7'})
+    assert (ranged.data, ranged.headers.get('Content-Encoding')) == (SCRIPT.encode()[:8], None)
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('br, gzip', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('*', 'br'),
+    ('identity', None),
+])
+def test_brotli_is_preferred_when_accepted(with_brotli, site, accept, encoding):
+    response = client_for(StaticAssets(str(site))).get('/js/a.js', headers={'Accept-Encoding': accept})
+    assert response.headers.get('Content-Encoding') == encoding
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_small_and_binary_files_are_not_compressed(client):
+    for path in ('/css/site.css', '/img/logo.bin'):
+        response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        assert 'Vary' not in response.headers
+
+
+# ===== what is served =====
+
+@pytest.mark.parametrize('path', [
+    '/backend/app.py', '/node_modules/x/index.js', '/.env', '/css/.hidden.css', '/js/../backend/app.py',
+    '/../etc/passwd', '/missing.js', '/js'
+])
+def test_hidden_and_missing_paths_are_404(client, path):
+    assert client.get(path).status_code == 404
+
+
+def test_preload_skips_hidden_files(assets, site):
+    files, _ = assets.preload()
+    assert files == 4
+    assert not any('backend' in path or '.hidden' in path or 'node_modules' in path for path in assets._assets)
+
+
+def test_the_real_app_hides_the_backend():
+    client = app.app.test_client()
+    assert client.get('/index.html').status_code == 200
+    assert client.get('/backend/app.py').status_code == 404
+    assert client.get('/backend/config.py').status_code == 404
+    assert client.get('/.gitignore').status_code == 404
+
+
+def test_large_files_are_streamed_from_disk(site):
+    assets = StaticAssets(str(site), max_file_bytes=100)
+    response = client_for(assets).get('/img/logo.bin')
+    assert response.status_code == 200
+    assert response.data == bytes(range(256)) * 4
+    assert assets.stats()["from_disk"] == 1
+
+
+def test_file_deleted_after_it_was_cached_is_a_404(client, site):
+    assert client.get('/css/site.css').status_code == 200
+    os.remove(site / 'css' / 'site.css')
+    response = client.get('/css/site.css')
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "File not found"}
+
+
+def test_file_deleted_between_lookup_and_read_is_a_404(assets, site, monkeypatch):
+    resolve = assets.resolve
+
+    def resolve_then_delete(filename):
+        path = resolve(filename)
+        os.remove(path)
+        return path
+
+    monkeypatch.setattr(assets, 'resolve', resolve_then_delete)
+    assert client_for(assets).get('/js/a.js').status_code == 404
+    assert assets.stats()["files"] == 0
+
+
+def test_deleted_bundled_page_is_served_unbundled_then_rebuilt(site):
+    builder = AssetBuilder(str(site), 'dist', recheck_s=60)
+    client = client_for(StaticAssets(str(site), recheck_s=0, builder=builder))
+    bundled = client.get('/index.html')
+    assert b'dist/' in bundled.data
+
+    # Within the builder's recheck window, so it still believes its build is current
+    os.remove(site / 'dist' / 'pages' / 'index.html')
+    response = client.get('/index.html')
+    assert response.status_code == 200
+    assert response.data == PAGE.encode()
+
+    rebuilt = client.get('/index.html')
+    assert rebuilt.data == bundled.data
+    assert builder.stats()["builds"] == 2
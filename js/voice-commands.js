@@ -37,6 +37,45 @@ class VoiceCommandHandler {
             });
     }
 
+    watchPhoneConnection() {
+        // Status is pushed by the backend on every change; fall back to polling without it
+        const events = new EventSource('/api/phone/status/events');
+        let received = false;
+        events.onmessage = event => {
+            received = true;
+            const data = JSON.parse(event.data);
+            this.phoneConnected = data.connected === true;
+            this.updateConnectionStatus();
+        };
+        events.onerror = () => {
+            if (!received) {
+                events.close();
+                setInterval(() => this.checkPhoneConnection(), 5000);
+            }
+        };
+    }
+
+    followJob(data) {
+        // Phone actions are queued on the backend; wait for the job to finish
+        if (!data.job_id || !data.events_url) {
+            return Promise.resolve(data);
+        }
+        return new Promise(resolve => {
+            const events = new EventSource(data.events_url);
+            events.onmessage = event => {
+                const job = JSON.parse(event.data);
+                if (job.state === 'succeeded' || job.state === 'failed') {
+                    events.close();
+                    resolve(job.result || { success: false, error: job.error || 'Phone action failed' });
+                }
+            };
+            events.onerror = () => {
+                events.close();
+                resolve({ success: false, error: 'Lost connection while waiting for the phone' });
+            };
+        });
+    }
+
     updateConnectionStatus() {
         const statusElement = document.getElementById('phone-connection-status');
         if (statusElement) {
@@ -168,6 +207,7 @@ class VoiceCommandHandler {
             })
         })
         .then(response => response.json())
+        .then(data => this.followJob(data))
         .then(data => {
             if (data.success) {
                 console.log('Call initiated:', data);
@@ -204,6 +244,7 @@ class VoiceCommandHandler {
             })
         })
         .then(response => response.json())
+        .then(data => this.followJob(data))
         .then(data => {
             if (data.success) {
                 console.log('Message opened:', data);
@@ -249,6 +290,7 @@ class VoiceCommandHandler {
                 })
             })
             .then(response => response.json())
+            .then(data => this.followJob(data))
             .then(data => {
                 if (data.success) {
                     console.log('Message sent:', data);
@@ -305,12 +347,8 @@ document.addEventListener('DOMContentLoaded', () => {
         voiceHandler = new VoiceCommandHandler();
         console.log('✅ Voice handler initialized');
         
-        // Refresh phone connection status every 5 seconds
-        setInterval(() => {
-            if (voiceHandler) {
-                voiceHandler.checkPhoneConnection();
-            }
-        }, 5000);
+        // Keep the phone connection status up to date (pushed, or polled every 5 seconds)
+        voiceHandler.watchPhoneConnection();
     } catch (e) {
         console.error('❌ Initialization error:', e);
     }